@@ -0,0 +1 @@
+"""Script principal del renombrado de facturas"""
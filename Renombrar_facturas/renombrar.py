@@ -10,14 +10,12 @@ Métodos de extracción (en orden de prioridad):
 2. Regex + OCR (fallback) - Precisión 60-85%
 """
 
+import re
 import sys
 import os
+import sqlite3
 from pathlib import Path
 from loguru import logger
-from dotenv import load_dotenv
-
-# Cargar variables de entorno
-load_dotenv()
 
 # Agregar carpetas al path para imports
 BASE_DIR = Path(__file__).parent.parent
@@ -25,13 +23,38 @@ sys.path.insert(0, str(BASE_DIR))
 
 from config.settings import (
     INPUT_FOLDER, OUTPUT_FOLDER, ERROR_FOLDER, LOG_FOLDER,
-    ENVIRONMENT, DRY_RUN, is_safe_to_run,
-    ALLOWED_EXTENSIONS
+    ENVIRONMENT, DRY_RUN, is_safe_to_run, check_config,
+    ALLOWED_EXTENSIONS, IMAGE_EXTENSIONS, MAX_WORKERS, PROCESSING_TIMEOUT, AZURE_CONCURRENCIA,
+    AZURE_SOLO_ESCANEADOS, CLASIFICAR_PDF, TEXTO_PARADA_TEMPRANA, OCR_CABECERA, OCR_PARADA_TEMPRANA,
+    FILENAME_TEMPLATE, FILENAME_SEPARATOR, JOURNAL_FOLDER, MOVER_LOTE,
+    VIGILAR_INTERVALO, VIGILAR_ESTABILIDAD, VIGILAR_COLA_MAX, METRICAS_INTERVALO
+)
+from src.azure_extractor import (
+    extraer_con_azure, esta_azure_disponible, sesion_azure, cerrar_cliente
 )
+from src.documento import DocumentoFactura, abrir_pdf
+from src.texto_nativo import extraer_texto_nativo
+from src.clasificador import clasificar_pdf, RUTA_NATIVO, RUTA_OCR
+from src.ocr import regiones_cabecera, reconocer_pagina, ocr_paginas
+from src.imagenes import ocr_imagen
+from src.parser_regex import extraer_campo
+from src.aprendizaje import corregir_ocr, buscar_proveedor_por_cif, version_proveedores, guardar_pendientes
+from src.cache import hash_archivo, obtener_cache
+from src.registro import obtener_registro, cerrar_registro, firma
+from src.movimientos import LoteMovimientos, reanudar_pendientes, deshacer_lote
+from src.metricas import contar, recoger_metricas, combinar_metricas, escribir_metricas
+from src.tiempos import medir, anotar_cache
+
+FORMATO_LOG = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {message}"
 
 
 def configurar_logs():
-    """Configura el sistema de logging."""
+    """
+    Configura el sistema de logging.
+    
+    Returns:
+        Path: Ruta del archivo de log de esta ejecución
+    """
     
     # Crear carpeta de logs si no existe
     LOG_FOLDER.mkdir(parents=True, exist_ok=True)
@@ -46,7 +69,7 @@ def configurar_logs():
         rotation="100 MB",
         retention="30 days",
         level="DEBUG",
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {message}"
+        format=FORMATO_LOG
     )
     
     logger.info("="*70)
@@ -55,12 +78,42 @@ def configurar_logs():
     logger.info(f"   Modo DRY RUN: {DRY_RUN}")
     logger.info(f"   Carpeta entrada: {INPUT_FOLDER}")
     logger.info(f"   Carpeta salida: {OUTPUT_FOLDER}")
+    logger.info(f"   Workers: {MAX_WORKERS} (timeout {PROCESSING_TIMEOUT}s por factura)")
     logger.info("="*70)
+    
+    return log_file
 
 
-def obtener_facturas_pendientes():
+def configurar_logs_worker(log_file):
+    """
+    Configura el logging dentro de un proceso worker del pool.
+    Escribe en el mismo archivo de log que el proceso principal.
+    
+    Args:
+        log_file (Path): Archivo de log de la ejecución
+    """
+    
+    logger.remove()
+    logger.add(sys.stderr, level="INFO", format=FORMATO_LOG)
+    logger.add(log_file, level="DEBUG", format=FORMATO_LOG)
+
+
+def finalizar_worker():
+    """Guarda los aprendizajes pendientes y cierra la sesión de Azure y el registro de un worker."""
+    
+    guardar_pendientes()
+    cerrar_cliente()
+    cerrar_registro()
+
+
+def obtener_facturas_pendientes(todas=False):
     """
     Obtiene la lista de facturas pendientes de procesar.
+    Las que ya están en el registro de procesadas (misma ruta, tamaño y
+    mtime, o mismo contenido) se saltan sin abrirlas.
+    
+    Args:
+        todas (bool): Incluir también las facturas ya procesadas
     
     Returns:
         list: Lista de rutas Path a archivos de facturas
@@ -72,52 +125,161 @@ def obtener_facturas_pendientes():
         logger.error(f"❌ Carpeta no encontrada: {INPUT_FOLDER}")
         return []
     
+    registro = None if todas else obtener_registro()
+    procesadas = registro.procesadas_en(INPUT_FOLDER) if registro else {}
+    
     facturas = []
+    ya_procesadas = 0
     
-    for archivo in INPUT_FOLDER.iterdir():
-        if archivo.is_file():
+    with medir("listado"), os.scandir(INPUT_FOLDER) as entradas:
+        for entrada in entradas:
+            if not entrada.is_file():
+                continue
+            
+            archivo = Path(entrada.path)
             extension = archivo.suffix.lower()
             
-            if extension in ALLOWED_EXTENSIONS:
-                facturas.append(archivo)
-                logger.debug(f"   ✓ {archivo.name}")
-            else:
+            if extension not in ALLOWED_EXTENSIONS:
                 logger.warning(f"   ⚠️ Ignorando archivo con extensión no permitida: {archivo.name}")
+                continue
+            
+            registrada = procesadas.get(str(archivo))
+            if registrada and registro.es_procesada(archivo, firma(entrada.stat()), registrada):
+                ya_procesadas += 1
+                continue
+            
+            facturas.append(archivo)
+            logger.debug(f"   ✓ {archivo.name}")
     
+    if ya_procesadas:
+        logger.info(f"   ⏭️ {ya_procesadas} facturas ya procesadas (sin cambios)")
     logger.info(f"✅ Encontradas {len(facturas)} facturas para procesar")
     return facturas
 
 
-def extraer_texto_pdf(ruta_pdf):
+def registrar_procesada(ruta_factura, destino, info):
+    """
+    Anota la factura en el registro de procesadas para no volver a
+    procesarla mientras no cambie. Se llama desde el lote de movimientos,
+    cuando la factura ya está en OUTPUT_FOLDER (o se ha simulado en DRY RUN).
+    
+    Args:
+        ruta_factura (Path): Ruta a la factura en la carpeta de entrada
+        destino (Path): Ruta final
+        info (dict): Información extraída (con su firma y su hash), o None
+            en los movimientos a ERROR_FOLDER
+    """
+    
+    registro = obtener_registro()
+    if not registro or not info:
+        return
+    
+    try:
+        hash_contenido = info.get('hash') or hash_archivo(destino if destino.exists() else ruta_factura)
+        registro.registrar(ruta_factura, info['firma'], hash_contenido, destino.name, info.get('etapa'))
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"   ⚠️ No se pudo anotar en el registro de procesadas: {e}")
+
+
+def extraer_texto_nativo_pdf(ruta_pdf, documento=None, parada_temprana=None):
+    """
+    Extrae el texto nativo (sin OCR) de un archivo PDF con el motor
+    configurado en TEXTO_MOTOR (ver src/texto_nativo.py), página a página
+    y como mucho TEXTO_MAX_PAGINAS páginas.
+    
+    Args:
+        ruta_pdf (Path): Ruta al archivo PDF
+        documento (DocumentoFactura, optional): Contenido ya leído del PDF
+        parada_temprana (bool, optional): Dejar de leer páginas cuando el
+            texto ya tiene fecha, proveedor y número (por defecto TEXTO_PARADA_TEMPRANA)
+        
+    Returns:
+        str: Texto extraído (vacío si el PDF no tiene capa de texto)
+    """
+    
+    def completo(texto):
+        return not campos_faltantes(parsear_con_regex(texto, ruta_pdf.name))
+    
+    if parada_temprana is None:
+        parada_temprana = TEXTO_PARADA_TEMPRANA
+    
+    return extraer_texto_nativo(documento or ruta_pdf, completo=completo if parada_temprana else None)
+
+
+def clasificar(ruta_pdf, documento=None):
+    """
+    Clasifica un PDF (src/clasificador.py) para decidir qué etapas necesita
+    y registra la decisión en el log.
+    
+    Args:
+        ruta_pdf (Path): Ruta al archivo PDF
+        documento (DocumentoFactura, optional): Contenido ya leído del PDF
+        
+    Returns:
+        dict: Clasificación (ruta, escaneado, motivo) o None si está
+            desactivada (CLASIFICAR_PDF) o el PDF no se pudo inspeccionar
+    """
+    
+    if not CLASIFICAR_PDF:
+        return None
+    
+    try:
+        with abrir_pdf(documento or ruta_pdf) as doc:
+            clasificacion = clasificar_pdf(doc)
+    except Exception as e:
+        logger.debug(f"   ⚠️ No se pudo clasificar el PDF: {e}")
+        return None
+    
+    logger.debug(f"   🧭 Ruta: {clasificacion['ruta']} ({clasificacion['motivo']})")
+    contar("rutas_total", ruta=clasificacion['ruta'])
+    return clasificacion
+
+
+def usar_azure_con(clasificacion):
+    """
+    Indica si un documento debe pasar por Azure: todos o, con
+    AZURE_SOLO_ESCANEADOS, solo los escaneados (y los que no se pudieron clasificar).
+    
+    Args:
+        clasificacion (dict): Resultado de clasificar() o None
+        
+    Returns:
+        bool: True si se debe intentar Azure
+    """
+    return not AZURE_SOLO_ESCANEADOS or clasificacion is None or clasificacion['escaneado']
+
+
+def extraer_texto_pdf(ruta_pdf, clasificacion=None):
     """
     Extrae texto de un archivo PDF.
-    Combina extracción directa + OCR para capturar logos/imágenes con texto.
+    Combina extracción directa + OCR para capturar logos/imágenes con texto,
+    con solo las etapas que necesita el PDF según su clasificación.
     
     Args:
         ruta_pdf (Path): Ruta al archivo PDF
+        clasificacion (dict, optional): Resultado de clasificar() ya calculado
+            por el llamador (se clasifica aquí si no se pasa)
         
     Returns:
         str: Texto extraído o None si falla
     """
     
     try:
-        import pdfplumber
-        
         logger.debug(f"📄 Extrayendo texto de: {ruta_pdf.name}")
+        if clasificacion is None:
+            clasificacion = clasificar(ruta_pdf)
+        ruta = clasificacion['ruta'] if clasificacion else None
         
-        # Paso 1: Extracción directa de texto
-        texto_nativo = ""
-        with pdfplumber.open(ruta_pdf) as pdf:
-            for pagina in pdf.pages:
-                texto_pagina = pagina.extract_text()
-                if texto_pagina:
-                    texto_nativo += texto_pagina + "\n"
+        # Paso 1: Extracción directa de texto (los escaneados van directos al OCR)
+        texto_nativo = extraer_texto_nativo_pdf(ruta_pdf) if ruta != RUTA_OCR else ""
         
         if texto_nativo.strip():
             logger.debug(f"   ✓ Extraídos {len(texto_nativo)} caracteres (texto nativo)")
             
             # Paso 2: Intentar OCR para capturar logos/imágenes (solo primera página)
             # Esto es útil para nombres de proveedores en logos
+            if ruta == RUTA_NATIVO:
+                return texto_nativo
             try:
                 texto_ocr = extraer_texto_pdf_con_ocr_pagina(ruta_pdf, pagina_num=0)
                 if texto_ocr:
@@ -131,7 +293,8 @@ def extraer_texto_pdf(ruta_pdf):
             
             return texto_nativo
         else:
-            logger.warning(f"   ⚠️ PDF sin texto extraíble - intentando OCR...")
+            if ruta != RUTA_OCR:
+                logger.warning(f"   ⚠️ PDF sin texto extraíble - intentando OCR...")
             # Si no hay texto nativo, usar solo OCR
             return extraer_texto_pdf_con_ocr(ruta_pdf)
                 
@@ -140,7 +303,7 @@ def extraer_texto_pdf(ruta_pdf):
         return None
 
 
-def extraer_texto_pdf_con_ocr_pagina(ruta_pdf, pagina_num=0):
+def extraer_texto_pdf_con_ocr_pagina(ruta_pdf, pagina_num=0, solo_cabecera=None, documento=None):
     """
     Extrae texto de UNA página específica de un PDF usando OCR.
     Útil para extraer logos/cabeceras sin procesar todo el documento.
@@ -148,88 +311,73 @@ def extraer_texto_pdf_con_ocr_pagina(ruta_pdf, pagina_num=0):
     Args:
         ruta_pdf (Path): Ruta al archivo PDF
         pagina_num (int): Número de página (0-indexed)
+        solo_cabecera (bool, optional): OCR solo de la banda superior y de las
+            imágenes de la página, no de la página entera (por defecto OCR_CABECERA)
+        documento (DocumentoFactura, optional): Contenido ya leído del PDF
         
     Returns:
         str: Texto extraído o None si falla
     """
     try:
-        import fitz
-        import pytesseract
-        from PIL import Image
-        import io
-        from config.settings import TESSERACT_PATH
-        
-        if Path(TESSERACT_PATH).exists():
-            pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
-        
-        doc = fitz.open(ruta_pdf)
-        if pagina_num >= len(doc):
-            doc.close()
-            return None
-        
-        pagina = doc[pagina_num]
-        pix = pagina.get_pixmap(dpi=300)
-        img_data = pix.tobytes("png")
-        imagen = Image.open(io.BytesIO(img_data))
-        
-        texto = pytesseract.image_to_string(imagen, lang='spa')
-        doc.close()
+        with abrir_pdf(documento or ruta_pdf) as doc:
+            if pagina_num >= len(doc):
+                return None
+            
+            pagina = doc[pagina_num]
+            if OCR_CABECERA if solo_cabecera is None else solo_cabecera:
+                regiones = regiones_cabecera(pagina)
+                logger.debug(f"   🔍 OCR de {len(regiones)} regiones de cabecera/logos")
+            else:
+                regiones = [None]  # Página entera
+            
+            textos = [reconocer_pagina(pagina, clip=region)["texto"] for region in regiones]
         
+        texto = "\n".join(textos)
         return texto if texto.strip() else None
         
     except:
         return None
 
 
-def extraer_texto_pdf_con_ocr(ruta_pdf):
+def extraer_texto_pdf_con_ocr(ruta_pdf, parada_temprana=None, documento=None):
     """
     Extrae texto de un PDF escaneado usando OCR.
-    Convierte el PDF a imágenes con PyMuPDF y aplica Tesseract.
+    Convierte el PDF a imágenes con PyMuPDF y aplica Tesseract, con varias
+    páginas a la vez en el pool de hilos de OCR (manteniendo el orden) y
+    resolución adaptativa (OCR_ADAPTATIVO).
     
     Args:
         ruta_pdf (Path): Ruta al archivo PDF
+        parada_temprana (bool, optional): Dejar de procesar páginas cuando el
+            texto ya tiene fecha, proveedor y número (por defecto OCR_PARADA_TEMPRANA)
+        documento (DocumentoFactura, optional): Contenido ya leído del PDF
         
     Returns:
         str: Texto extraído o None si falla
     """
     
     try:
-        import fitz  # PyMuPDF
-        import pytesseract
-        from PIL import Image
-        import io
-        from config.settings import TESSERACT_PATH
+        logger.debug(f"   🔍 Aplicando OCR al PDF...")
         
-        # Configurar Tesseract
-        if Path(TESSERACT_PATH).exists():
-            pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+        origen = documento or ruta_pdf
+        with abrir_pdf(origen) as doc:
+            num_paginas = len(doc)
         
-        logger.debug(f"   🔍 Aplicando OCR al PDF...")
+        def completo(texto):
+            return not campos_faltantes(parsear_con_regex(texto, ruta_pdf.name))
         
-        # Abrir PDF con PyMuPDF
-        doc = fitz.open(ruta_pdf)
-        num_paginas = len(doc)
-        texto_completo = ""
+        if parada_temprana is None:
+            parada_temprana = OCR_PARADA_TEMPRANA
         
-        for num_pagina in range(num_paginas):
-            logger.debug(f"   📄 OCR en página {num_pagina + 1}/{num_paginas}")
-            
-            # Convertir página a imagen
-            pagina = doc[num_pagina]
-            pix = pagina.get_pixmap(dpi=300)  # Alta resolución para mejor OCR
-            
-            # Convertir a PIL Image
-            img_data = pix.tobytes("png")
-            imagen = Image.open(io.BytesIO(img_data))
-            
-            # Aplicar OCR
-            texto_pagina = pytesseract.image_to_string(imagen, lang='spa')
-            texto_completo += texto_pagina + "\n"
+        resultados = ocr_paginas(origen, num_paginas, completo, parada_temprana)
+        texto_completo = "".join(resultado["texto"] + "\n" for resultado in resultados)
         
-        doc.close()
+        if len(resultados) < num_paginas:
+            logger.debug(f"   ⏭️ Datos completos tras {len(resultados)}/{num_paginas} páginas - OCR detenido")
         
         if texto_completo.strip():
-            logger.success(f"   ✓ OCR extrajo {len(texto_completo)} caracteres de {num_paginas} páginas")
+            dpis = "/".join(str(resultado["dpi"]) for resultado in resultados)
+            logger.success(f"   ✓ OCR extrajo {len(texto_completo)} caracteres de {len(resultados)} páginas ({dpis} DPI)")
             return texto_completo
         else:
             logger.error(f"   ❌ OCR no pudo extraer texto")
@@ -237,7 +385,7 @@ def extraer_texto_pdf_con_ocr(ruta_pdf):
             
     except ImportError as e:
         logger.error(f"   ❌ Librería no instalada: {e}")
-        logger.error(f"   💡 Instala con: pip install PyMuPDF pytesseract")
+        logger.error(f"   💡 Instala con: pip install PyMuPDF tesserocr (o pytesseract)")
         return None
     except Exception as e:
         logger.error(f"   ❌ Error en OCR: {e}")
@@ -247,6 +395,9 @@ def extraer_texto_pdf_con_ocr(ruta_pdf):
 def extraer_texto_imagen(ruta_imagen):
     """
     Extrae texto de una imagen usando OCR.
+    Cada página (una, o varias en un TIFF multipágina) se prepara antes del
+    OCR (reducción, enderezado y binarizado) y se reconoce en el pool de
+    hilos de OCR, parando como en los PDF cuando ya están los datos.
     
     Args:
         ruta_imagen (Path): Ruta a la imagen
@@ -256,57 +407,58 @@ def extraer_texto_imagen(ruta_imagen):
     """
     
     try:
-        import pytesseract
-        from PIL import Image
-        from config.settings import TESSERACT_PATH
-        
-        # Configurar Tesseract
-        if Path(TESSERACT_PATH).exists():
-            pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
-        
         logger.debug(f"🖼️ Aplicando OCR a: {ruta_imagen.name}")
         
-        imagen = Image.open(ruta_imagen)
-        texto = pytesseract.image_to_string(imagen, lang='spa')
+        def completo(texto):
+            return not campos_faltantes(parsear_con_regex(texto, ruta_imagen.name))
+        
+        resultados = ocr_imagen(ruta_imagen, completo, OCR_PARADA_TEMPRANA)
+        texto = "".join(resultado["texto"] + "\n" for resultado in resultados)
         
         if texto.strip():
-            logger.debug(f"   ✓ OCR extraído {len(texto)} caracteres")
+            logger.debug(f"   ✓ OCR extraído {len(texto)} caracteres de {len(resultados)} páginas")
             return texto
         else:
             logger.warning(f"   ⚠️ OCR no pudo extraer texto")
             return None
             
     except ImportError:
-        logger.error("   ❌ pytesseract no está instalado. Instala con: pip install pytesseract")
+        logger.error("   ❌ No hay motor de OCR instalado. Instala con: pip install tesserocr (o pytesseract)")
         return None
     except Exception as e:
         logger.error(f"   ❌ Error en OCR: {e}")
         return None
 
 
-def extraer_texto(ruta_archivo):
+def extraer_texto(ruta_archivo, clasificacion=None):
     """
     Extrae texto de un archivo (PDF o imagen).
     
     Args:
         ruta_archivo (Path): Ruta al archivo
+        clasificacion (dict, optional): Resultado de clasificar() (solo PDF)
         
     Returns:
         str: Texto extraído o None si falla
+    
+    Ejemplo (un PDF se clasifica una sola vez para las dos llamadas):
+        clasificacion = clasificar(ruta)
+        texto = extraer_texto(ruta, clasificacion)
+        info = parsear_factura(texto, ruta.name, ruta, clasificacion)
     """
     
     extension = ruta_archivo.suffix.lower()
     
     if extension == '.pdf':
-        return extraer_texto_pdf(ruta_archivo)
-    elif extension in ['.jpg', '.jpeg', '.png']:
+        return extraer_texto_pdf(ruta_archivo, clasificacion)
+    elif extension in IMAGE_EXTENSIONS:
         return extraer_texto_imagen(ruta_archivo)
     else:
         logger.error(f"❌ Tipo de archivo no soportado: {extension}")
         return None
 
 
-def parsear_factura(texto, nombre_archivo, ruta_pdf=None):
+def parsear_factura(texto, nombre_archivo, ruta_pdf=None, clasificacion=None):
     """
     Extrae información de la factura (fecha, proveedor, número).
     Usa Azure Document Intelligence si está disponible, sino usa regex.
@@ -315,48 +467,83 @@ def parsear_factura(texto, nombre_archivo, ruta_pdf=None):
         texto (str): Texto extraído de la factura
         nombre_archivo (str): Nombre del archivo original
         ruta_pdf (Path, optional): Ruta al PDF (para Azure)
+        clasificacion (dict, optional): Resultado de clasificar() ya calculado
+            por el llamador (se clasifica aquí si no se pasa)
         
     Returns:
         dict: Diccionario con fecha, proveedor, numero o None si falla
     """
     
-    import re
-    from datetime import datetime
-    
     logger.debug(f"🔍 Parseando información de la factura...")
     
-    # ESTRATEGIA 1: Intentar Azure Document Intelligence primero (si está configurado)
-    if ruta_pdf:
-        try:
-            import sys
-            sys.path.insert(0, str(Path(__file__).parent.parent))
-            from src.azure_extractor import extraer_con_azure, esta_azure_disponible
-            
-            logger.debug("   🔍 Verificando si Azure está disponible...")
-            if esta_azure_disponible():
-                logger.info("   🔷 Azure disponible - intentando extracción...")
-                info_azure = extraer_con_azure(ruta_pdf)
-                if info_azure:
-                    logger.success("   ✅ Datos extraídos con Azure Document Intelligence")
-                    return info_azure
-                else:
-                    logger.warning("   ⚠️ Azure no pudo extraer datos - usando fallback regex")
-            else:
-                logger.debug("   ℹ️ Azure no configurado - usando regex")
-        except Exception as e:
-            logger.warning(f"   ⚠️ Error al intentar Azure: {e}")
-            import traceback
-            logger.debug(traceback.format_exc())
+    if ruta_pdf and clasificacion is None and ruta_pdf.suffix.lower() == '.pdf':
+        clasificacion = clasificar(ruta_pdf)
+    
+    # ESTRATEGIA 1: Intentar Azure Document Intelligence primero (si está
+    # configurado y el documento lo necesita)
+    if ruta_pdf and usar_azure_con(clasificacion):
+        info_azure = parsear_con_azure(ruta_pdf)
+        if info_azure:
+            return info_azure
     
     # ESTRATEGIA 2: Fallback a regex (método actual)
+    info = parsear_con_regex(texto, nombre_archivo)
+    return info if validar_campos(info) else None
+
+
+def parsear_con_azure(ruta_pdf, documento=None):
+    """
+    Intenta extraer la información con Azure Document Intelligence.
+    
+    Args:
+        ruta_pdf (Path): Ruta al PDF
+        documento (DocumentoFactura, optional): Contenido ya leído del PDF
+        
+    Returns:
+        dict: Información extraída o None si Azure no está disponible o falla
+    """
+    
+    try:
+        logger.debug("   🔍 Verificando si Azure está disponible...")
+        if esta_azure_disponible():
+            logger.info("   🔷 Azure disponible - intentando extracción...")
+            info_azure = extraer_con_azure(ruta_pdf, documento)
+            if info_azure:
+                logger.success("   ✅ Datos extraídos con Azure Document Intelligence")
+                return info_azure
+            else:
+                logger.warning("   ⚠️ Azure no pudo extraer datos - usando fallback regex")
+        else:
+            logger.debug("   ℹ️ Azure no configurado - usando regex")
+    except Exception as e:
+        logger.warning(f"   ⚠️ Error al intentar Azure: {e}")
+        import traceback
+        logger.debug(traceback.format_exc())
+    
+    return None
+
+
+def parsear_con_regex(texto, nombre_archivo):
+    """
+    Extrae fecha, proveedor, número y CIF del texto usando regex.
+    A diferencia de parsear_factura, devuelve siempre el diccionario
+    (con None en los campos no encontrados) para poder decidir si hace
+    falta una etapa de extracción adicional.
+    
+    Args:
+        texto (str): Texto extraído de la factura
+        nombre_archivo (str): Nombre del archivo original
+        
+    Returns:
+        dict: Diccionario con fecha, proveedor, numero, cif
+    """
+    
     logger.debug("   🔍 Usando extracción por regex...")
     
     # Aplicar correcciones de OCR conocidas
     try:
-        import sys
-        sys.path.insert(0, str(Path(__file__).parent.parent))
-        from src.aprendizaje import corregir_ocr
-        texto = corregir_ocr(texto)
+        with medir("proveedores"):
+            texto = corregir_ocr(texto)
     except:
         pass  # Si no funciona, continuar sin correcciones
     
@@ -368,28 +555,19 @@ def parsear_factura(texto, nombre_archivo, ruta_pdf=None):
         'original': nombre_archivo
     }
     
-    # Normalizar texto (remover saltos de línea múltiples, espacios extra)
-    texto_limpio = re.sub(r'\s+', ' ', texto)
+    # Minúsculas una sola vez para los filtros rápidos de todas las reglas
+    texto_min = texto.lower()
     
     # Extraer CIF/NIF primero (útil para búsqueda en base de datos)
-    # Variaciones: CIF, C.I.F., C.LF., NIF, N.I.F.
-    # Patrón más flexible para puntos y espacios
-    # También buscar formato: 34864979-S (NIF de persona física)
-    match_cif = re.search(r'(?:C\.?I\.?F\.?|C\.?L\.?F\.?|N\.?I\.?F\.?)\s*[:.\s]*\s*([A-Z0-9][-\s.]*\d{7,8}[-\s]*[A-Z]?)', texto, re.IGNORECASE)
-    if not match_cif:
-        # Buscar NIF sin prefijo: 12345678-A
-        match_cif = re.search(r'(\d{8}[-\s]*[A-Z])', texto)
-    if match_cif:
-        cif = match_cif.group(1).replace('-', '').replace('.', '').replace(' ', '')
+    cif, _, _ = extraer_campo('cif', texto, texto_min)
+    if cif:
         info['cif'] = cif
         logger.debug(f"   ✓ CIF encontrado: {cif}")
         
         # Intentar buscar proveedor por CIF en base de datos
         try:
-            import sys
-            sys.path.insert(0, str(Path(__file__).parent.parent))
-            from src.aprendizaje import buscar_proveedor_por_cif
-            proveedor_conocido = buscar_proveedor_por_cif(cif)
+            with medir("proveedores"):
+                proveedor_conocido = buscar_proveedor_por_cif(cif)
             if proveedor_conocido:
                 info['proveedor'] = proveedor_conocido
                 logger.success(f"   ✓ Proveedor encontrado en BD (CIF): {proveedor_conocido}")
@@ -397,195 +575,69 @@ def parsear_factura(texto, nombre_archivo, ruta_pdf=None):
             logger.debug(f"   ⚠️ No se pudo buscar en BD: {e}")
             pass
     
-    # 1. EXTRAER FECHA
-    # Estrategia: Priorizar fechas cerca de "Factura" o número de factura, evitar fechas de albarán
-    
-    # Buscar primero fechas explícitas de factura/emisión
-    patrones_fecha_prioritarios = [
-        r'Fecha\s+(?:de\s+)?(?:emisi[oó]n|factura)[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-        r'Fecha[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-        r'Date[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-    ]
-    
-    for patron in patrones_fecha_prioritarios:
-        match = re.search(patron, texto, re.IGNORECASE)
-        if match:
-            # Asegurarse de que no sea fecha de albarán
-            contexto = texto[max(0, match.start()-50):match.end()+50]
-            if 'albaran' not in contexto.lower() and 'albar' not in contexto.lower():
-                fecha_str = match.group(1)
-                try:
-                    for formato in ['%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%d-%m-%y']:
-                        try:
-                            fecha_obj = datetime.strptime(fecha_str, formato)
-                            info['fecha'] = fecha_obj.strftime('%Y%m%d')
-                            logger.debug(f"   ✓ Fecha encontrada (explícita): {fecha_str} → {info['fecha']}")
-                            break
-                        except:
-                            continue
-                    if info['fecha']:
-                        break
-                except Exception as e:
-                    logger.debug(f"   ⚠️ Error parseando fecha: {e}")
-    
-    # Si no se encontró, buscar fecha cerca del número de factura
-    if not info['fecha']:
-        # Buscar formato: número/año fecha (ej: 511890/25 18-09-2025)
-        patron_numero_fecha = r'(\d{5,7}/\d{2})\s+(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})'
-        match = re.search(patron_numero_fecha, texto)
-        if match:
-            fecha_str = match.group(2)
-            try:
-                for formato in ['%d-%m-%Y', '%d/%m/%Y', '%d-%m-%y', '%d/%m/%y']:
-                    try:
-                        fecha_obj = datetime.strptime(fecha_str, formato)
-                        info['fecha'] = fecha_obj.strftime('%Y%m%d')
-                        logger.debug(f"   ✓ Fecha encontrada (junto a número): {fecha_str} → {info['fecha']}")
-                        break
-                    except:
-                        continue
-            except Exception as e:
-                logger.debug(f"   ⚠️ Error parseando fecha: {e}")
-    
-    # Si aún no se encontró, buscar cualquier fecha (pero evitar albaranes)
-    if not info['fecha']:
-        fechas_encontradas = re.findall(r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', texto)
-        for fecha_str in fechas_encontradas[:5]:  # Revisar primeras 5 fechas
-            # Buscar contexto de esta fecha
-            idx = texto.find(fecha_str)
-            if idx != -1:
-                contexto = texto[max(0, idx-50):idx+50]
-                if 'albaran' not in contexto.lower() and 'albar' not in contexto.lower():
-                    try:
-                        for formato in ['%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%d-%m-%y']:
-                            try:
-                                fecha_obj = datetime.strptime(fecha_str, formato)
-                                info['fecha'] = fecha_obj.strftime('%Y%m%d')
-                                logger.debug(f"   ✓ Fecha encontrada (genérica): {fecha_str} → {info['fecha']}")
-                                break
-                            except:
-                                continue
-                        if info['fecha']:
-                            break
-                    except Exception as e:
-                        logger.debug(f"   ⚠️ Error parseando fecha: {e}")
+    # 1. EXTRAER FECHA (reglas en config/patrones.py)
+    fecha, fecha_str, regla = extraer_campo('fecha', texto, texto_min)
+    if fecha:
+        info['fecha'] = fecha
+        logger.debug(f"   ✓ Fecha encontrada ({regla}): {fecha_str} → {fecha}")
     
     # 2. EXTRAER PROVEEDOR
     # Si ya se encontró por CIF, no buscar de nuevo
     if info['proveedor']:
         logger.debug(f"   → Usando proveedor de BD: {info['proveedor']}")
-    
-    # Estrategia 1: Buscar "Proveedor:" explícito
-    if not info['proveedor']:
-        patrones_proveedor_explicito = [
-            r'Proveedor[:\s]+([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?:\n|Número|N[úu]mero|Fecha|Importe)',
-            r'Supplier[:\s]+([A-Za-z\s]+?)(?:\n|Number|Date|Amount)',
-            r'Razón Social[:\s]+([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?:\n|NIF|CIF)',
-        ]
-    
-        for patron in patrones_proveedor_explicito:
-            match = re.search(patron, texto, re.IGNORECASE)
-            if match:
-                proveedor = match.group(1).strip()
-                # Limpiar nombre del proveedor
-                proveedor = re.sub(r'\s+', '_', proveedor)
-                proveedor = re.sub(r'[^\w\s-]', '', proveedor)
-                info['proveedor'] = proveedor
-                logger.debug(f"   ✓ Proveedor encontrado (explícito): {proveedor}")
-                break
-    
-    # Estrategia 2: Si no se encontró, buscar empresas con sufijos legales (S.A., S.L., etc.)
-    if not info['proveedor']:
-        # Buscar nombres con sufijos de empresa en TODO el texto (no solo primeras líneas)
-        # pero filtrar empresas conocidas que son clientes (HAFESA, etc.)
-        patrones_empresa = [
-            r'([A-ZÁÉÍÓÚÑ&][A-ZÁÉÍÓÚÑa-záéíóúñ\s\-\.,&]+?(?:S\.A\.U\.|S\.L\.U\.|S\.A\.|S\.L\.|S\.C\.|S\.COOP\.))',
-            r'([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑa-záéíóúñ\s\-]+BY\s+[A-ZÁÉÍÓÚÑa-záéíóúñ\s\-]+)',  # Ej: "Q-SAFETY BY QUIRÓN"
-        ]
-        
-        empresas_cliente = ['HAFESA', 'HAFESA OIL', 'HAFESA OLI']  # Empresas que son clientes, no proveedores
-        
-        # Buscar en todo el texto
-        for patron in patrones_empresa:
-            matches = re.finditer(patron, texto)
-            for match in matches:
-                proveedor = match.group(1).strip()
-                
-                # Verificar que no sea una empresa cliente conocida
-                es_cliente = any(cliente.lower() in proveedor.lower() for cliente in empresas_cliente)
-                
-                if not es_cliente:
-                    # Limpiar
-                    proveedor = re.sub(r'\s+', '_', proveedor)
-                    proveedor = re.sub(r'[^\w\s-]', '', proveedor)
-                    # Limitar longitud (evitar nombres muy largos)
-                    if len(proveedor) > 50:
-                        proveedor = proveedor[:50]
-                    info['proveedor'] = proveedor
-                    logger.debug(f"   ✓ Proveedor encontrado (sufijo legal): {proveedor}")
-                    break
-            if info['proveedor']:
-                break
-    
-    # Estrategia 3: Buscar línea antes/después del CIF
-    if not info['proveedor']:
-        match_cif = re.search(r'CIF[:\s]+([A-Z0-9]+)', texto, re.IGNORECASE)
-        if match_cif:
-            # Buscar nombre en contexto cercano al CIF
-            inicio = max(0, match_cif.start() - 200)
-            fin = min(len(texto), match_cif.end() + 200)
-            contexto = texto[inicio:fin]
-            
-            # Buscar nombre de empresa en el contexto
-            for patron in patrones_empresa:
-                match = re.search(patron, contexto)
-                if match:
-                    proveedor = match.group(1).strip()
-                    proveedor = re.sub(r'\s+', '_', proveedor)
-                    proveedor = re.sub(r'[^\w\s-]', '', proveedor)
-                    if len(proveedor) > 50:
-                        proveedor = proveedor[:50]
-                    info['proveedor'] = proveedor
-                    logger.debug(f"   ✓ Proveedor encontrado (cerca del CIF): {proveedor}")
-                    break
+    else:
+        proveedor, _, regla = extraer_campo('proveedor', texto, texto_min)
+        if proveedor:
+            info['proveedor'] = proveedor
+            logger.debug(f"   ✓ Proveedor encontrado ({regla}): {proveedor}")
     
     # 3. EXTRAER NÚMERO DE FACTURA
-    patrones_numero = [
-        r'N[º°úu]?\s*FACTURA\s+FECHA\s+FACTURA\s+([A-Z]\s*\d+)',  # Nº FACTURA FECHA FACTURA A 20250965
-        r'N[º°úu]?\s*FACTURA[:\s]+([A-Z]\s*\d+)',  # Nº FACTURA A 20250965
-        r'N[úu]mero de Factura[:\s]+([A-Z0-9\-/]+)(?:\s|$)',  # Número de Factura: FAC-2024-12345
-        r'Factura [nN][º°u][:\s]+([A-Z0-9\-/_]+)',
-        r'Invoice Number[:\s]+([A-Z0-9\-/]+)',
-        r'N[º°] Factura[:\s]+([A-Z0-9\-/]+)',
-        r'fra\.\s*(\d{6,})',  # Plazo n'1 fra. 2500612
-        r'(\d{6}/\d{2})',  # Formato: 511890/25
-        r'Fact[ura]*\s+([A-Z]?\d{6,})',  # Fact FAA20250965
-    ]
-    
-    for patron in patrones_numero:
-        match = re.search(patron, texto, re.IGNORECASE)
-        if match:
-            numero = match.group(1).strip()
-            # Limpiar espacios extra dentro del número
-            numero = re.sub(r'\s+', '', numero)
-            # Evitar que capture palabras como "FECHA", "FACTURA", etc.
-            if numero.upper() not in ['FECHA', 'FACTURA', 'DATE', 'INVOICE']:
-                info['numero'] = numero
-                logger.debug(f"   ✓ Número encontrado: {numero}")
-                break
-    
-    # Validar que al menos tengamos 2 de los 3 campos
-    campos_encontrados = sum([bool(info['fecha']), bool(info['proveedor']), bool(info['numero'])])
+    numero, _, _ = extraer_campo('numero', texto, texto_min)
+    if numero:
+        info['numero'] = numero
+        logger.debug(f"   ✓ Número encontrado: {numero}")
+    
+    return info
+
+
+CAMPOS_REQUERIDOS = ('fecha', 'proveedor', 'numero')
+
+
+def campos_faltantes(info):
+    """
+    Devuelve los campos requeridos (fecha, proveedor, numero) que faltan.
+    
+    Args:
+        info (dict): Información extraída
+        
+    Returns:
+        list: Nombres de los campos vacíos
+    """
+    return [campo for campo in CAMPOS_REQUERIDOS if not info.get(campo)]
+
+
+def validar_campos(info):
+    """
+    Valida que al menos tengamos 2 de los 3 campos requeridos.
+    
+    Args:
+        info (dict): Información extraída
+        
+    Returns:
+        bool: True si el parseo es suficiente para renombrar
+    """
+    
+    campos_encontrados = len(CAMPOS_REQUERIDOS) - len(campos_faltantes(info))
     
     if campos_encontrados >= 2:
         logger.success(f"   ✓ Parseo exitoso: {campos_encontrados}/3 campos extraídos")
-        return info
+        return True
     else:
         logger.warning(f"   ⚠️ Parseo incompleto: solo {campos_encontrados}/3 campos")
         logger.debug(f"      Fecha: {info['fecha']}")
         logger.debug(f"      Proveedor: {info['proveedor']}")
         logger.debug(f"      Número: {info['numero']}")
-        return None
+        return False
 
 
 def sanitizar_nombre_archivo(texto):
@@ -599,8 +651,6 @@ def sanitizar_nombre_archivo(texto):
     Returns:
         str: Texto limpio y seguro para nombre de archivo
     """
-    import re
-    
     # Si es None o vacío, retornar string vacío
     if not texto:
         return ""
@@ -631,8 +681,6 @@ def generar_nuevo_nombre(info):
         str: Nuevo nombre del archivo
     """
     
-    from config.settings import FILENAME_TEMPLATE, FILENAME_SEPARATOR
-    
     # Sanitizar cada componente
     fecha_limpia = sanitizar_nombre_archivo(info['fecha'])
     proveedor_limpio = sanitizar_nombre_archivo(info['proveedor'])
@@ -653,82 +701,517 @@ def generar_nuevo_nombre(info):
     return nuevo_nombre
 
 
-def procesar_factura(ruta_factura):
+# Etapas del pipeline de extracción (se registran en info['etapa'])
+ETAPA_AZURE = "azure"
+ETAPA_NATIVO = "nativo"
+ETAPA_NATIVO_OCR = "nativo+ocr"
+ETAPA_OCR = "ocr"
+ETAPA_IMAGEN = "imagen"
+
+
+def _texto_cacheado(entrada, campo, extractor):
+    """
+    Devuelve el texto guardado en la entrada de caché o lo extrae y lo guarda.
+    Los fallos (None) no se guardan para reintentarlos en la siguiente ejecución.
+    """
+    if entrada.get(campo) is not None:
+        logger.debug(f"   💾 {campo} recuperado de caché")
+        return entrada[campo]
+    
+    texto = extractor()
+    if texto is not None:
+        entrada[campo] = texto
+    return texto
+
+
+def _leer_cache(ruta_pdf, documento=None):
+    """
+    Busca la entrada de caché de una factura.
+    
+    Returns:
+        tuple: (caché, clave, entrada); entrada es {} si no hay caché o no existe
+    """
+    
+    cache = obtener_cache()
+    clave = None
+    entrada = {}
+    if cache:
+        try:
+            clave = cache.clave(ruta_pdf, documento.hash if documento else None)
+            entrada = cache.obtener(clave) or {}
+        except OSError as e:
+            logger.debug(f"   ⚠️ Caché no disponible: {e}")
+    return cache, clave, entrada
+
+
+def _info_de_cache(entrada, version_kb):
+    """Info parseada de la entrada si sigue siendo válida para la base de proveedores actual."""
+    if entrada.get('info') and entrada.get('version_kb') == version_kb:
+        return entrada['info']
+    return None
+
+
+def _guardar_en_cache(cache, clave, entrada, info, version_kb):
+    """Guarda la entrada (textos extraídos y, si hay, la info parseada)."""
+    if info:
+        entrada['info'] = info
+        entrada['version_kb'] = version_kb
+    if cache and clave:
+        cache.guardar(clave, entrada)
+
+
+def extraer_y_parsear_pdf(ruta_pdf, usar_azure=True):
+    """
+    Pipeline por etapas para PDFs: cada etapa solo se ejecuta si la
+    anterior no resolvió la factura y si la clasificación previa del PDF
+    (clasificar) dice que el documento la necesita.
+    
+    1. Azure Document Intelligence (si está configurado; con
+       AZURE_SOLO_ESCANEADOS, solo para PDF escaneados)
+    2. Texto nativo + regex (no en los escaneados)
+    3. Texto nativo + OCR de la primera página (logos) + regex,
+       solo si falta algún campo requerido y el PDF tiene imágenes
+    4. OCR completo + regex, si el PDF es escaneado o no tiene texto nativo
+    
+    Los textos extraídos y el resultado se guardan en la caché de
+    extracción, de modo que una factura sin cambios no se vuelve a procesar.
+    
+    Args:
+        ruta_pdf (Path): Ruta al archivo PDF
+        usar_azure (bool): False si Azure ya se intentó (p.ej. en el lote concurrente)
+        
+    Returns:
+        dict: Información extraída (con la etapa en info['etapa']) o None si falla
+    """
+    
+    logger.debug(f"📄 Extrayendo información de: {ruta_pdf.name}")
+    
+    # El archivo se lee una sola vez para el hash y todas las etapas
+    with DocumentoFactura(ruta_pdf) as documento:
+        cache, clave, entrada = _leer_cache(ruta_pdf, documento)
+        
+        # El resultado parseado depende también de los proveedores aprendidos
+        version_kb = version_proveedores()
+        info = _info_de_cache(entrada, version_kb)
+        if info:
+            logger.debug(f"   💾 Resultado recuperado de caché (etapa: {info.get('etapa')})")
+            anotar_cache()
+            info['hash'] = documento.hash
+            return info
+        
+        info = _extraer_y_parsear_pdf(ruta_pdf, entrada, usar_azure, documento)
+        if info:
+            info['hash'] = documento.hash  # Para el registro de procesadas
+    
+    _guardar_en_cache(cache, clave, entrada, info, version_kb)
+    return info
+
+
+def _extraer_y_parsear_pdf(ruta_pdf, entrada, usar_azure=True, documento=None):
+    """Etapas de extracción de extraer_y_parsear_pdf (textos cacheados en entrada)."""
+    
+    clasificacion = clasificar(ruta_pdf, documento)
+    ruta = clasificacion['ruta'] if clasificacion else None
+    
+    # Etapa 1: Azure
+    if usar_azure and usar_azure_con(clasificacion):
+        with medir("azure"):
+            info = parsear_con_azure(ruta_pdf, documento)
+        if info:
+            info['etapa'] = ETAPA_AZURE
+            return info
+    
+    # Etapa 2: Texto nativo (los escaneados van directos al OCR completo)
+    texto_nativo = ""
+    if ruta != RUTA_OCR:
+        try:
+            with medir("extraccion"):
+                texto_nativo = _texto_cacheado(entrada, 'texto_nativo',
+                                               lambda: extraer_texto_nativo_pdf(ruta_pdf, documento))
+        except Exception as e:
+            logger.error(f"   ❌ Error extrayendo texto: {e}")
+            return None
+    
+    if texto_nativo.strip():
+        logger.debug(f"   ✓ Extraídos {len(texto_nativo)} caracteres (texto nativo)")
+        with medir("parseo"):
+            info = parsear_con_regex(texto_nativo, ruta_pdf.name)
+        info['etapa'] = ETAPA_NATIVO
+        
+        faltan = campos_faltantes(info)
+        if faltan and ruta == RUTA_NATIVO:
+            logger.debug(f"   ⏭️ Faltan campos {faltan} - PDF digital sin imágenes, sin OCR de cabecera")
+        elif faltan:
+            # Etapa 3: OCR de la primera página para capturar logos/cabeceras
+            logger.debug(f"   🔍 Faltan campos {faltan} - aplicando OCR a la primera página")
+            with medir("ocr"):
+                texto_ocr = _texto_cacheado(entrada, 'texto_ocr_pagina',
+                                            lambda: extraer_texto_pdf_con_ocr_pagina(ruta_pdf, pagina_num=0,
+                                                                                     documento=documento))
+            if texto_ocr:
+                # Combinar ambos textos (OCR al inicio, luego texto nativo)
+                with medir("parseo"):
+                    info = parsear_con_regex(texto_ocr + "\n" + texto_nativo, ruta_pdf.name)
+                info['etapa'] = ETAPA_NATIVO_OCR
+    else:
+        # Etapa 4: PDF escaneado, OCR completo
+        if ruta != RUTA_OCR:
+            logger.warning(f"   ⚠️ PDF sin texto extraíble - intentando OCR...")
+        with medir("ocr"):
+            texto_ocr = _texto_cacheado(entrada, 'texto_ocr',
+                                        lambda: extraer_texto_pdf_con_ocr(ruta_pdf, documento=documento))
+        if not texto_ocr:
+            logger.error(f"❌ No se pudo extraer texto de: {ruta_pdf.name}")
+            return None
+        with medir("parseo"):
+            info = parsear_con_regex(texto_ocr, ruta_pdf.name)
+        info['etapa'] = ETAPA_OCR
+    
+    if not validar_campos(info):
+        return None
+    
+    logger.debug(f"   → Resuelta en etapa: {info['etapa']}")
+    return info
+
+
+def extraer_y_parsear(ruta_archivo, usar_azure=True):
+    """
+    Extrae la información de una factura (PDF o imagen).
+    
+    Args:
+        ruta_archivo (Path): Ruta al archivo
+        usar_azure (bool): False para saltar la etapa de Azure
+        
+    Returns:
+        dict: Información extraída (con la etapa en info['etapa']) o None si falla
+    """
+    
+    if ruta_archivo.suffix.lower() == '.pdf':
+        return extraer_y_parsear_pdf(ruta_archivo, usar_azure)
+    
+    if usar_azure:
+        with medir("azure"):
+            info = parsear_con_azure(ruta_archivo)
+        if info:
+            info['etapa'] = ETAPA_AZURE
+            return info
+    
+    with medir("ocr"):
+        texto = extraer_texto(ruta_archivo)
+    if not texto:
+        logger.error(f"❌ No se pudo extraer texto de: {ruta_archivo.name}")
+        return None
+    
+    with medir("parseo"):
+        info = parsear_con_regex(texto, ruta_archivo.name)
+    info['etapa'] = ETAPA_IMAGEN
+    return info if validar_campos(info) else None
+
+
+def procesar_factura(ruta_factura, info=None, usar_azure=True):
     """
     Procesa una factura completa: extrae, parsea y renombra.
     
     Args:
         ruta_factura (Path): Ruta a la factura
+        info (dict, optional): Información ya extraída (p.ej. por el lote de Azure)
+        usar_azure (bool): False si Azure ya se intentó para esta factura
         
     Returns:
-        bool: True si se procesó correctamente, False si falló
+        dict: Información extraída, con el nuevo nombre en 'nuevo_nombre'
+            (el movimiento lo hace el proceso principal por lotes), o None si falló
     """
     
     logger.info(f"\n📋 Procesando: {ruta_factura.name}")
     logger.info("-" * 60)
     
-    # Paso 1: Extraer texto
-    texto = extraer_texto(ruta_factura)
-    
-    if not texto:
-        logger.error(f"❌ No se pudo extraer texto de: {ruta_factura.name}")
-        # Mover a carpeta de errores
-        return False
-    
-    # Paso 2: Parsear información (pasar ruta para Azure)
-    info = parsear_factura(texto, ruta_factura.name, ruta_pdf=ruta_factura)
+    # Paso 1-2: Extraer y parsear información (pipeline por etapas)
+    if info is None:
+        with medir("factura"):
+            info = extraer_y_parsear(ruta_factura, usar_azure)
     
     if not info:
         logger.error(f"❌ No se pudo extraer información de: {ruta_factura.name}")
-        return False
+        return None
     
-    # Paso 3: Generar nuevo nombre
+    # Paso 3: Generar nuevo nombre (las imágenes conservan su extensión)
     nuevo_nombre = generar_nuevo_nombre(info)
-    logger.info(f"✏️ Nombre propuesto: {nuevo_nombre}")
+    if Path(nuevo_nombre).suffix.lower() != ruta_factura.suffix.lower():
+        nuevo_nombre = Path(nuevo_nombre).stem + ruta_factura.suffix.lower()
+    logger.info(f"✏️ Nombre propuesto: {nuevo_nombre} (etapa: {info.get('etapa')})")
+    
+    # Tamaño y mtime antes de mover, para el registro de procesadas
+    info['firma'] = firma(ruta_factura.stat())
+    info['nuevo_nombre'] = nuevo_nombre
+    
+    logger.info("-" * 60)
+    return info
+
+
+def crear_lote_movimientos():
+    """
+    Lote de movimientos a OUTPUT_FOLDER / ERROR_FOLDER (simulado en DRY
+    RUN). Cada factura movida se anota en el registro de procesadas.
+    
+    Returns:
+        LoteMovimientos: Lote vacío (usar como context manager)
+    """
+    
+    return LoteMovimientos(JOURNAL_FOLDER, MOVER_LOTE, simular=DRY_RUN, al_mover=registrar_procesada)
+
+
+def reanudar_movimientos():
+    """Completa los lotes de movimientos que quedaron a medias en una ejecución anterior."""
     
-    # Paso 4: Renombrar (o simular)
     if DRY_RUN:
-        logger.info(f"🔍 DRY RUN: No se renombró realmente")
-        logger.info(f"   {ruta_factura.name} → {nuevo_nombre}")
+        return
+    completados = reanudar_pendientes(JOURNAL_FOLDER)
+    if completados:
+        logger.info(f"♻️ {completados} movimientos pendientes completados")
+
+
+def deshacer_ultimo_lote(nombre=None):
+    """
+    Devuelve a INPUT_FOLDER las facturas de un lote de movimientos (por
+    defecto el último) y las quita del registro de procesadas.
+    
+    Args:
+        nombre (str, optional): Nombre del diario en JOURNAL_FOLDER
+    """
+    
+    check_config()
+    configurar_logs()
+    devueltas = deshacer_lote(JOURNAL_FOLDER, nombre)
+    registro = obtener_registro()
+    if registro and devueltas:
+        registro.olvidar(devueltas)
+    cerrar_registro()
+
+
+def procesar_secuencial(facturas, lote, usar_azure=True):
+    """
+    Procesa las facturas una a una en el proceso actual.
+    
+    Args:
+        facturas (list): Rutas Path de las facturas
+        lote (LoteMovimientos): Lote donde se añaden los movimientos
+        usar_azure (bool): False si Azure ya se intentó para estas facturas
+        
+    Returns:
+        tuple: (exitosas, fallidas, timeouts)
+    """
+    
+    exitosas = 0
+    fallidas = 0
+    
+    for factura in facturas:
+        try:
+            resultado = _registrar_resultado(factura, "ok", procesar_factura(factura, usar_azure=usar_azure), lote)
+        except Exception as e:
+            resultado = _registrar_resultado(factura, "error", e, lote)
+        if resultado == "exitosa":
+            exitosas += 1
+        else:
+            fallidas += 1
+    
+    return exitosas, fallidas, 0
+
+
+def procesar_en_paralelo(facturas, lote, log_file, max_workers=MAX_WORKERS, timeout=PROCESSING_TIMEOUT,
+                         usar_azure=True):
+    """
+    Procesa las facturas en un pool de procesos con timeout duro por factura.
+    Una factura que supera el timeout (p.ej. colgada en OCR) se envía a
+    ERROR_FOLDER y su worker se reemplaza sin bloquear el resto del lote.
+    
+    Args:
+        facturas (list): Rutas Path de las facturas
+        lote (LoteMovimientos): Lote donde se añaden los movimientos
+        log_file (Path): Archivo de log compartido con los workers
+        max_workers (int): Número de procesos
+        timeout (int): Segundos máximos por factura
+        usar_azure (bool): False si Azure ya se intentó para estas facturas
+        
+    Returns:
+        tuple: (exitosas, fallidas, timeouts)
+    """
+    
+    from functools import partial
+    from src.paralelo import PoolFacturas
+    
+    exitosas = 0
+    fallidas = 0
+    timeouts = 0
+    workers = min(max_workers, len(facturas))
+    
+    logger.info(f"⚙️ Procesando en paralelo con {workers} workers")
+    
+    with PoolFacturas(partial(procesar_factura, usar_azure=usar_azure), workers, timeout=timeout,
+                      inicializador=configurar_logs_worker, initargs=(log_file,),
+                      finalizador=finalizar_worker,
+                      recolector=recoger_metricas, al_recolectar=combinar_metricas) as pool:
+        for factura, estado, valor in pool.procesar(facturas):
+            resultado = _registrar_resultado(factura, estado, valor, lote)
+            if resultado == "exitosa":
+                exitosas += 1
+            else:
+                fallidas += 1
+                timeouts += resultado == "timeout"
+    
+    return exitosas, fallidas, timeouts
+
+
+def _registrar_resultado(factura, estado, valor, lote):
+    """
+    Registra el resultado de una factura procesada y añade su movimiento al
+    lote: a OUTPUT_FOLDER con su nuevo nombre o a ERROR_FOLDER si falló.
+    
+    Returns:
+        str: 'exitosa', 'fallida' o 'timeout'
+    """
+    if estado == "ok" and valor:
+        lote.agregar(factura, OUTPUT_FOLDER, valor['nuevo_nombre'], datos=valor)
+        contar("resueltas_total", etapa=valor.get('etapa'))
+        resultado = "exitosa"
+    elif estado == "ok":
+        lote.agregar(factura, ERROR_FOLDER, factura.name, motivo="sin datos")
+        resultado = "fallida"
+    elif estado == "timeout":
+        logger.error(f"⏱️ Timeout ({valor}s) procesando {factura.name}")
+        lote.agregar(factura, ERROR_FOLDER, factura.name, motivo="timeout")
+        resultado = "timeout"
     else:
-        # TODO: Implementar renombrado real
-        logger.info(f"✅ Renombrado: {ruta_factura.name} → {nuevo_nombre}")
+        logger.error(f"❌ Error inesperado procesando {factura.name}: {valor}")
+        lote.agregar(factura, ERROR_FOLDER, factura.name, motivo="error")
+        resultado = "fallida"
     
-    logger.info("-" * 60)
-    return True
+    contar("facturas_total", resultado=resultado)
+    return resultado
 
 
-def main():
-    """Función principal."""
+def analizar_con_azure_en_lote(facturas):
+    """
+    Analiza con Azure, varias a la vez, las facturas que no estén ya resueltas
+    en la caché. Las que Azure no resuelve quedan pendientes para el fallback
+    (texto nativo / OCR + regex). El hash de la caché y la clasificación de
+    cada PDF comparten una lectura (DocumentoFactura), que se cierra antes de
+    pasar al siguiente: en un lote grande no se acumulan archivos abiertos.
+    
+    Args:
+        facturas (list): Rutas Path de las facturas
+        
+    Returns:
+        tuple: (dict factura → info de las resueltas por Azure, lista de facturas pendientes)
+    """
+    
+    from src.azure_async import extraer_lote_con_azure
+    
+    version_kb = version_proveedores()
+    por_analizar = []
+    pendientes = []
+    entradas = {}
+    
+    for factura in facturas:
+        if factura.suffix.lower() == '.pdf':
+            # Hash y clasificación con una sola lectura; el documento se cierra
+            # enseguida (la subida lee el archivo dentro del límite de concurrencia)
+            with DocumentoFactura(factura) as documento:
+                cache, clave, entrada = _leer_cache(factura, documento)
+                resuelta = _info_de_cache(entrada, version_kb)
+                digital = not resuelta and AZURE_SOLO_ESCANEADOS and not usar_azure_con(clasificar(factura, documento))
+            if resuelta:
+                # Ya resuelta en una ejecución anterior: no gastar una llamada a Azure
+                pendientes.append(factura)
+                continue
+            if digital:
+                # PDF digital: el texto nativo basta, sin gastar una llamada a Azure
+                pendientes.append(factura)
+                continue
+            entradas[factura] = (cache, clave, entrada)
+        por_analizar.append(factura)
+    
+    with medir("azure_lote"):
+        resultados = extraer_lote_con_azure(por_analizar)
+    resueltas = {}
+    
+    for factura in por_analizar:
+        info = resultados.get(factura)
+        if not info:
+            pendientes.append(factura)
+            continue
+        
+        info['etapa'] = ETAPA_AZURE
+        resueltas[factura] = info
+        if factura in entradas:
+            _guardar_en_cache(*entradas[factura], info, version_kb)
+    
+    if pendientes:
+        logger.info(f"   ↪️ {len(pendientes)} facturas pasan al fallback local")
+    return resueltas, pendientes
+
+
+def main(todas=False):
+    """
+    Función principal.
+    
+    Args:
+        todas (bool): Procesar también las facturas ya registradas como procesadas
+    """
+    
+    # Validar configuración (carpetas, NAS, Tesseract)
+    check_config()
     
     # Configurar logs
-    configurar_logs()
+    log_file = configurar_logs()
     
     # Verificar seguridad
     if not is_safe_to_run():
         logger.error("❌ Ejecución cancelada por el usuario")
         return
     
+    # Completar los movimientos de una ejecución cortada antes de listar la carpeta
+    reanudar_movimientos()
+    
     # Obtener facturas pendientes
-    facturas = obtener_facturas_pendientes()
+    facturas = obtener_facturas_pendientes(todas)
     
     if not facturas:
         logger.warning("⚠️ No hay facturas para procesar")
+        cerrar_registro()
         return
     
-    # Procesar cada factura
-    exitosas = 0
-    fallidas = 0
-    
-    for factura in facturas:
+    # Azure en lote: varias facturas en vuelo a la vez; solo las que fallen
+    # pasan al pipeline local
+    pendientes = facturas
+    usar_azure = True
+    resueltas = {}
+    if AZURE_CONCURRENCIA > 1 and len(facturas) > 1 and esta_azure_disponible():
         try:
-            if procesar_factura(factura):
-                exitosas += 1
-            else:
-                fallidas += 1
-        except Exception as e:
-            logger.error(f"❌ Error inesperado procesando {factura.name}: {e}")
-            fallidas += 1
+            resueltas, pendientes = analizar_con_azure_en_lote(facturas)
+            usar_azure = False
+        except ImportError as e:
+            logger.warning(f"⚠️ Modo lote de Azure no disponible ({e}) - se analizará factura a factura")
+            logger.info("   💡 Instala con: pip install aiohttp")
+    
+    # Los movimientos se ejecutan cada MOVER_LOTE facturas y al terminar
+    with crear_lote_movimientos() as lote:
+        exitosas, fallidas, timeouts = 0, 0, 0
+        for factura, info in resueltas.items():
+            exitosas += _registrar_resultado(factura, "ok", procesar_factura(factura, info=info), lote) == "exitosa"
+        
+        # Procesar facturas (en paralelo si hay más de un worker)
+        if not pendientes:
+            resultado = (0, 0, 0)
+        elif MAX_WORKERS > 1 and len(pendientes) > 1:
+            resultado = procesar_en_paralelo(pendientes, lote, log_file, usar_azure=usar_azure)
+        else:
+            # Una sola sesión de Azure (conexiones reutilizadas) para todo el lote
+            with sesion_azure():
+                resultado = procesar_secuencial(pendientes, lote, usar_azure=usar_azure)
+        exitosas, fallidas, timeouts = exitosas + resultado[0], fallidas + resultado[1], timeouts + resultado[2]
+    
+    if lote.fallidas:
+        logger.warning(f"⚠️ {len(lote.fallidas)} facturas no se pudieron mover (siguen en {INPUT_FOLDER})")
     
     # Resumen final
     logger.info("\n" + "="*70)
@@ -736,16 +1219,188 @@ def main():
     logger.info(f"   Total facturas: {len(facturas)}")
     logger.info(f"   ✅ Exitosas: {exitosas}")
     logger.info(f"   ❌ Fallidas: {fallidas}")
+    if timeouts:
+        logger.info(f"   ⏱️ De ellas por timeout: {timeouts}")
     logger.info(f"   📈 Tasa de éxito: {exitosas/len(facturas)*100:.1f}%")
     logger.info("="*70)
     
+    # Eliminar entradas caducadas o que exceden el tamaño de la caché
+    cache = obtener_cache()
+    if cache:
+        cache.limpiar()
+    
+    # Histogramas por etapa y contadores de esta ejecución
+    escribir_metricas()
+    
+    # Cerrar el registro de procesadas (con el WAL ya pasado a la base de datos)
+    cerrar_registro()
+    
     if DRY_RUN:
         logger.info("\n💡 Ejecutado en modo DRY RUN - no se renombró ningún archivo")
 
 
+# Limpieza periódica de la caché en modo servicio
+LIMPIEZA_CACHE_SEGUNDOS = 3600
+
+
+def configurar_worker_servicio(log_file):
+    """
+    Inicializa un worker del modo servicio: ignora Ctrl+C (la parada la
+    ordena el proceso principal, que espera a las facturas en curso) y
+    recupera el SIGTERM por defecto heredado del fork (el pool lo usa para
+    terminar un worker que supera el timeout).
+    """
+    
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    configurar_logs_worker(log_file)
+
+
+def vigilar():
+    """
+    Modo servicio: vigila INPUT_FOLDER y procesa las facturas según llegan.
+    
+    Los workers del pool (con sus imports, la base de proveedores y la
+    conexión a Azure) se arrancan una sola vez para toda la vida del
+    servicio. Una factura entra en la cola cuando su tamaño y fecha de
+    modificación llevan VIGILAR_ESTABILIDAD segundos sin cambiar (copia
+    terminada); en la cola caben VIGILAR_COLA_MAX facturas y el resto espera
+    en la carpeta. Termina con Ctrl+C o SIGTERM, tras acabar las facturas en curso.
+    """
+    
+    import time
+    import threading
+    from collections import Counter, deque
+    from src.paralelo import PoolFacturas
+    from src.vigilancia import VigilanteCarpeta, iniciar_eventos, senal_de_parada
+    
+    check_config()
+    log_file = configurar_logs()
+    
+    if not is_safe_to_run():
+        logger.error("❌ Ejecución cancelada por el usuario")
+        return
+    
+    if not INPUT_FOLDER.exists():
+        logger.error(f"❌ Carpeta no encontrada: {INPUT_FOLDER}")
+        return
+    
+    reanudar_movimientos()
+    
+    workers = max(1, MAX_WORKERS)
+    vigilante = VigilanteCarpeta(INPUT_FOLDER, ALLOWED_EXTENSIONS, VIGILAR_ESTABILIDAD, obtener_registro())
+    detener = senal_de_parada()
+    despertar = threading.Event()
+    
+    logger.info(f"👀 Vigilando {INPUT_FOLDER} cada {VIGILAR_INTERVALO}s con {workers} workers (Ctrl+C para detener)")
+    observador = iniciar_eventos(INPUT_FOLDER, despertar)
+    
+    cola = deque()
+    resultados = Counter()
+    proximo_escaneo = 0.0
+    proxima_limpieza = time.monotonic() + LIMPIEZA_CACHE_SEGUNDOS
+    proximas_metricas = time.monotonic() + METRICAS_INTERVALO
+    
+    def recoger(pool, lote, espera=None):
+        for factura, estado, valor in pool.recoger(espera):
+            resultados[_registrar_resultado(factura, estado, valor, lote)] += 1
+            vigilante.marcar_procesado(factura)
+    
+    with crear_lote_movimientos() as lote, \
+         PoolFacturas(procesar_factura, workers, timeout=PROCESSING_TIMEOUT,
+                      inicializador=configurar_worker_servicio, initargs=(log_file,),
+                      finalizador=finalizar_worker,
+                      recolector=recoger_metricas, al_recolectar=combinar_metricas) as pool:
+        try:
+            while not detener.is_set():
+                ahora = time.monotonic()
+                
+                if despertar.is_set() or ahora >= proximo_escaneo:
+                    despertar.clear()
+                    hueco = VIGILAR_COLA_MAX - len(cola)
+                    if hueco > 0:
+                        try:
+                            with medir("listado"):
+                                nuevas = vigilante.escanear(hueco)
+                        except OSError as e:
+                            # NAS desconectado: se reintenta en el siguiente escaneo
+                            logger.error(f"❌ No se puede leer {INPUT_FOLDER}: {e}")
+                            nuevas = []
+                        if nuevas:
+                            logger.info(f"📥 {len(nuevas)} facturas nuevas en cola")
+                        cola.extend(nuevas)
+                    
+                    # Volver antes si hay archivos a punto de cumplir el tiempo de estabilidad
+                    espera = vigilante.segundos_hasta_estable()
+                    if espera is None or len(cola) >= VIGILAR_COLA_MAX:
+                        espera = VIGILAR_INTERVALO
+                    proximo_escaneo = ahora + min(VIGILAR_INTERVALO, espera)
+                
+                while cola and pool.en_curso < workers:
+                    pool.enviar(cola.popleft())
+                
+                # Como mucho 1 s sin revisar señales y eventos de la carpeta
+                espera = min(1.0, max(0.0, proximo_escaneo - time.monotonic()))
+                if pool.en_curso:
+                    recoger(pool, lote, espera)
+                else:
+                    # Sin trabajo en curso: mover lo ya procesado sin esperar a llenar el lote
+                    if len(lote) and not cola:
+                        lote.ejecutar()
+                    despertar.wait(espera)
+                
+                if time.monotonic() >= proxima_limpieza:
+                    cache = obtener_cache()
+                    if cache:
+                        cache.limpiar()
+                    proxima_limpieza = time.monotonic() + LIMPIEZA_CACHE_SEGUNDOS
+                
+                if time.monotonic() >= proximas_metricas:
+                    escribir_metricas()
+                    proximas_metricas = time.monotonic() + METRICAS_INTERVALO
+        finally:
+            if observador:
+                observador.stop()
+            if pool.en_curso:
+                logger.info(f"⏳ Esperando a {pool.en_curso} facturas en curso...")
+                while pool.en_curso:
+                    recoger(pool, lote)
+    
+    escribir_metricas()
+    cerrar_registro()
+    
+    logger.info("\n" + "="*70)
+    logger.info("📊 RESUMEN DEL SERVICIO")
+    logger.info(f"   ✅ Exitosas: {resultados['exitosa']}")
+    logger.info(f"   ❌ Fallidas: {resultados['fallida'] + resultados['timeout']}")
+    if resultados['timeout']:
+        logger.info(f"   ⏱️ De ellas por timeout: {resultados['timeout']}")
+    if cola:
+        logger.info(f"   📥 Sin procesar (siguen en la carpeta): {len(cola)}")
+    logger.info("="*70)
+
+
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Renombrado automático de facturas")
+    parser.add_argument("--vigilar", action="store_true",
+                        help="Modo servicio: vigilar INPUT_FOLDER y procesar las facturas según llegan")
+    parser.add_argument("--todas", action="store_true",
+                        help="Procesar también las facturas ya registradas como procesadas")
+    parser.add_argument("--deshacer", nargs="?", const="", metavar="DIARIO",
+                        help="Devolver a INPUT_FOLDER las facturas del último lote movido (o del diario indicado)")
+    args = parser.parse_args()
+    
     try:
-        main()
+        if args.deshacer is not None:
+            deshacer_ultimo_lote(args.deshacer or None)
+        elif args.vigilar:
+            vigilar()
+        else:
+            main(todas=args.todas)
     except KeyboardInterrupt:
         logger.warning("\n⚠️ Proceso interrumpido por el usuario")
     except Exception as e:
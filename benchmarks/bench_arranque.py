@@ -0,0 +1,130 @@
+"""
+Benchmark del tiempo de arranque: imports y workers
+
+Mide con python -X importtime (en procesos nuevos, mediana de varias
+repeticiones) lo que cuesta importar los módulos de entrada, y lo que tarda
+un worker arrancado con spawn (el método de Windows) en tener cargado el
+pipeline. Importar no debe tener efectos secundarios: la validación de la
+configuración (carpetas, NAS, Tesseract) la hacen los puntos de entrada con
+check_config(), no el import de config.settings.
+
+Cada medida se compara con su presupuesto (PRESUPUESTOS, en ms); si alguna
+lo supera el script termina con código 1, así que sirve como comprobación
+antes de un commit. Con --detalle se listan los imports con más tiempo
+propio.
+
+Uso:
+    python benchmarks/bench_arranque.py --repeticiones 7 --detalle 15
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import multiprocessing
+
+from comun import BASE_DIR
+
+# Presupuesto por medida (ms). loguru (que arrastra asyncio y ssl) se lleva
+# la mayor parte del import de renombrar.
+PRESUPUESTOS = {
+    "config.settings": 5,
+    "src.paralelo": 30,
+    "Renombrar_facturas.renombrar": 120,
+    "worker spawn": 500,
+}
+
+
+def _entorno():
+    """Entorno de los procesos medidos: con .pyc (si no, se mide la compilación)."""
+    entorno = dict(os.environ)
+    entorno.pop("PYTHONDONTWRITEBYTECODE", None)
+    return entorno
+
+
+def medir_import(modulo):
+    """
+    Importa 'modulo' en un proceso nuevo con -X importtime.
+    
+    Returns:
+        tuple: (ms acumulados del módulo, lista de (ms propios, import) de todos los imports)
+    """
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=BASE_DIR, env=_entorno(), capture_output=True, text=True, check=True
+    ).stderr
+    
+    propios = []
+    total = None
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "[us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        propios.append((int(propio) / 1000, nombre.rstrip()))
+        if nombre.strip() == modulo:
+            total = int(acumulado) / 1000
+    return total, propios
+
+
+def _cargar_pipeline():
+    import Renombrar_facturas.renombrar  # noqa: F401
+    return os.getpid()
+
+
+def medir_worker():
+    """ms desde que se pide un worker spawn hasta que devuelve con el pipeline importado."""
+    contexto = multiprocessing.get_context("spawn")
+    inicio = time.perf_counter()
+    with contexto.Pool(1) as pool:
+        pool.apply(_cargar_pipeline)
+        return (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--detalle", type=int, default=0, help="Listar los N imports con más tiempo propio")
+    args = parser.parse_args()
+    
+    # Los workers spawn heredan el entorno: que escriban y usen .pyc
+    os.environ.pop("PYTHONDONTWRITEBYTECODE", None)
+    sys.dont_write_bytecode = False
+    
+    modulos = [m for m in PRESUPUESTOS if m != "worker spawn"]
+    medidas = {}
+    propios = {}
+    for modulo in modulos:
+        medir_import(modulo)  # Calentamiento: genera los .pyc
+        tiempos = []
+        for _ in range(args.repeticiones):
+            total, propios[modulo] = medir_import(modulo)
+            tiempos.append(total)
+        medidas[modulo] = statistics.median(tiempos)
+    
+    medir_worker()
+    medidas["worker spawn"] = statistics.median(medir_worker() for _ in range(args.repeticiones))
+    
+    print(f"\n  {'medida':<30} {'ms':>8} {'presup.':>8}")
+    excedidos = []
+    for nombre, ms in medidas.items():
+        presupuesto = PRESUPUESTOS[nombre]
+        marca = "" if ms <= presupuesto else "  ❌ excede"
+        if marca:
+            excedidos.append(nombre)
+        print(f"  {nombre:<30} {ms:>8.1f} {presupuesto:>8}{marca}")
+    
+    if args.detalle:
+        print(f"\n  Imports con más tiempo propio (Renombrar_facturas.renombrar):")
+        for ms, nombre in sorted(propios["Renombrar_facturas.renombrar"], reverse=True)[:args.detalle]:
+            print(f"  {ms:>8.1f} ms  {nombre.strip()}")
+    
+    if excedidos:
+        print(f"\n❌ Fuera de presupuesto: {', '.join(excedidos)}")
+        sys.exit(1)
+    print("\n✅ Todo dentro de presupuesto")
+
+
+if __name__ == "__main__":
+    main()
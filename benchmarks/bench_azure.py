@@ -0,0 +1,81 @@
+"""
+Benchmark de Azure Document Intelligence: uno a uno frente a lote concurrente
+
+Arranca el servidor simulado de benchmarks/mock_azure.py (con latencia por
+análisis y límite de peticiones por segundo) y compara extraer_con_azure,
+factura a factura, con extraer_lote_con_azure (asyncio + token bucket).
+
+Uso:
+    python benchmarks/bench_azure.py --latencia 0.5 --limite-tps 15 --concurrencia 8
+"""
+
+import os
+import time
+import argparse
+
+from comun import muestras, silenciar_logs, verdad_desde_nombre
+from mock_azure import ServidorAzureSimulado
+
+
+def aciertos(resultados):
+    """Facturas cuya fecha, proveedor y número coinciden con los de su nombre."""
+    total = 0
+    for ruta, info in resultados.items():
+        verdad = verdad_desde_nombre(ruta.name)
+        if not info or not verdad:
+            continue
+        # El proveedor se guarda ya preparado para el nombre de archivo (espacios → _)
+        verdad['proveedor'] = verdad['proveedor'].replace(' ', '_')
+        if all(info.get(campo) == verdad[campo] for campo in verdad):
+            total += 1
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia", type=float, default=0.5, help="Segundos por análisis en el servidor")
+    parser.add_argument("--limite-tps", type=int, default=15, help="Peticiones/s antes de responder 429")
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--tasa", type=float, default=15, help="Peticiones/s del limitador del cliente")
+    parser.add_argument("--facturas", type=int, default=0, help="Limitar el número de facturas (0 = todas)")
+    args = parser.parse_args()
+    
+    silenciar_logs()
+    rutas = muestras()
+    if args.facturas:
+        rutas = rutas[:args.facturas]
+    
+    servidor = ServidorAzureSimulado(latencia=args.latencia, limite_tps=args.limite_tps)
+    os.environ["AZURE_FORM_RECOGNIZER_ENDPOINT"] = servidor.iniciar_en_hilo()
+    os.environ["AZURE_FORM_RECOGNIZER_KEY"] = servidor.clave
+    
+    from config import settings
+    from src.azure_extractor import extraer_con_azure, sesion_azure
+    from src.azure_async import extraer_lote_con_azure
+    
+    # El SDK consulta el resultado cada AZURE_POLLING_INTERVALO si el servidor no indica retry-after
+    print(f"{len(rutas)} facturas, latencia {args.latencia}s, límite {args.limite_tps} pet/s "
+          f"(polling {settings.AZURE_POLLING_INTERVALO}s)\n")
+    
+    inicio = time.perf_counter()
+    with sesion_azure():
+        secuencial = {ruta: extraer_con_azure(ruta) for ruta in rutas}
+    t_secuencial = time.perf_counter() - inicio
+    limitadas_secuencial = servidor.estadisticas["limitadas"]
+    
+    inicio = time.perf_counter()
+    lote = extraer_lote_con_azure(rutas, concurrencia=args.concurrencia, tasa=args.tasa)
+    t_lote = time.perf_counter() - inicio
+    limitadas_lote = servidor.estadisticas["limitadas"] - limitadas_secuencial
+    
+    print(f"  {'modo':<22} {'tiempo':>8} {'fact/s':>8} {'429':>6} {'correctas':>10}")
+    print(f"  {'uno a uno':<22} {t_secuencial:7.2f}s {len(rutas) / t_secuencial:8.2f} "
+          f"{limitadas_secuencial:6d} {aciertos(secuencial):>6}/{len(rutas)}")
+    print(f"  {f'lote (x{args.concurrencia})':<22} {t_lote:7.2f}s {len(rutas) / t_lote:8.2f} "
+          f"{limitadas_lote:6d} {aciertos(lote):>6}/{len(rutas)}  (x{t_secuencial / t_lote:.1f})")
+    
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
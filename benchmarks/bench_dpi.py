@@ -0,0 +1,116 @@
+"""
+Benchmark del OCR adaptativo: resolución rápida frente a OCR_DPI
+
+Sobre las facturas escaneadas de data/samples (sin capa de texto), mide por
+página el render y el mapa de bits a OCR_DPI en RGB (lo que se hacía antes),
+a OCR_DPI en gris y a OCR_DPI_RAPIDO en gris; y, si hay motor de OCR, el
+tiempo y la confianza de Tesseract a cada resolución y la resolución que
+elegiría reconocer_pagina con OCR_CONFIANZA_MINIMA.
+
+Uso:
+    python benchmarks/bench_dpi.py --rapido 200 --confianza 70
+"""
+
+import time
+import argparse
+
+from comun import muestras, silenciar_logs
+
+MB = 1024 * 1024
+
+
+def escaneadas():
+    """Muestras PDF sin texto nativo en ninguna página."""
+    import fitz
+    
+    rutas = []
+    for ruta in muestras():
+        with fitz.open(ruta) as doc:
+            if not any(pagina.get_text().strip() for pagina in doc):
+                rutas.append(ruta)
+    return rutas
+
+
+def medir_render(pagina, dpi, gris):
+    """ms de render y MB del mapa de bits."""
+    import fitz
+    
+    inicio = time.perf_counter()
+    pix = pagina.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY if gris else fitz.csRGB, alpha=False)
+    ms = (time.perf_counter() - inicio) * 1000
+    return ms, len(pix.samples_mv) / MB
+
+
+def medir_ocr(pagina, dpi):
+    """(ms de render + OCR, confianza) o None si no hay motor de OCR."""
+    from src.ocr import pagina_como_imagen, reconocer_con_confianza
+    
+    inicio = time.perf_counter()
+    try:
+        with pagina_como_imagen(pagina, dpi=dpi, gris=True) as imagen:
+            _, confianza = reconocer_con_confianza(imagen)
+    except Exception:
+        return None
+    return (time.perf_counter() - inicio) * 1000, confianza
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rapido", type=int, default=None, help="DPI de la primera pasada (por defecto OCR_DPI_RAPIDO)")
+    parser.add_argument("--confianza", type=int, default=None, help="Por defecto OCR_CONFIANZA_MINIMA")
+    args = parser.parse_args()
+    
+    silenciar_logs()
+    import fitz
+    from config import settings
+    
+    alto = settings.OCR_DPI
+    rapido = args.rapido or settings.OCR_DPI_RAPIDO
+    minima = settings.OCR_CONFIANZA_MINIMA if args.confianza is None else args.confianza
+    
+    rutas = escaneadas()
+    print(f"{len(rutas)} facturas escaneadas; {alto} DPI frente a {rapido} DPI, confianza mínima {minima}\n")
+    print(f"  {'factura':<42} {'pág':>3} {'RGB ' + str(alto):>13} {'gris ' + str(alto):>13} {'gris ' + str(rapido):>13}"
+          f" {'OCR ' + str(alto):>14} {'OCR ' + str(rapido):>14} {'elegido':>8}")
+    
+    totales = {"rgb": [0, 0], "alto": [0, 0], "rapido": [0, 0], "ocr_alto": 0, "ocr_adaptativo": 0}
+    con_ocr = True
+    for ruta in rutas:
+        with fitz.open(ruta) as doc:
+            for num, pagina in enumerate(doc):
+                renders = {
+                    "rgb": medir_render(pagina, alto, False),
+                    "alto": medir_render(pagina, alto, True),
+                    "rapido": medir_render(pagina, rapido, True),
+                }
+                for clave, (ms, mb) in renders.items():
+                    totales[clave][0] += ms
+                    totales[clave][1] += mb
+                
+                ocr_alto = medir_ocr(pagina, alto) if con_ocr else None
+                ocr_rapido = medir_ocr(pagina, rapido) if ocr_alto else None
+                con_ocr = ocr_rapido is not None
+                if con_ocr:
+                    elegido = rapido if ocr_rapido[1] >= minima else alto
+                    totales["ocr_alto"] += ocr_alto[0]
+                    totales["ocr_adaptativo"] += ocr_rapido[0] + (ocr_alto[0] if elegido == alto else 0)
+                    columnas_ocr = (f" {ocr_alto[0]:>7.0f}ms c{ocr_alto[1]:>3}"
+                                    f" {ocr_rapido[0]:>7.0f}ms c{ocr_rapido[1]:>3} {elegido:>8}")
+                else:
+                    columnas_ocr = f" {'sin motor de OCR':>38}"
+                
+                print(f"  {ruta.name[:42]:<42} {num + 1:>3}"
+                      + "".join(f" {ms:>5.0f}ms {mb:>4.1f}MB" for ms, mb in renders.values())
+                      + columnas_ocr)
+    
+    print(f"\n  Mapa de bits total: RGB {alto} {totales['rgb'][1]:.1f} MB, gris {alto} {totales['alto'][1]:.1f} MB,"
+          f" gris {rapido} {totales['rapido'][1]:.1f} MB")
+    print(f"  Render total:       RGB {alto} {totales['rgb'][0]:.0f} ms, gris {alto} {totales['alto'][0]:.0f} ms,"
+          f" gris {rapido} {totales['rapido'][0]:.0f} ms")
+    if con_ocr:
+        print(f"  OCR total:          solo {alto} DPI {totales['ocr_alto']:.0f} ms,"
+              f" adaptativo {totales['ocr_adaptativo']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
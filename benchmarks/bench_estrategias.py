@@ -0,0 +1,250 @@
+"""
+Benchmark de precisión y rendimiento de las estrategias de extracción
+
+Ejecuta cada estrategia sobre las facturas de data/samples, cuyos nombres
+(dd.mm.aaaa_PROVEEDOR_NUMERO.ext) son la verdad de referencia, y mide:
+precisión por campo (fecha, proveedor, número y los tres a la vez),
+facturas/s, latencia p50/p95 y memoria máxima (RSS).
+
+Estrategias:
+    nativo      Texto nativo + regex
+    nativo+ocr  Pipeline local completo (texto nativo, OCR de cabecera si
+                faltan campos, OCR completo si no hay texto) + regex
+    ocr         OCR de todas las páginas + regex
+    azure       Azure Document Intelligence contra el servidor simulado de
+                benchmarks/mock_azure.py (devuelve los datos del nombre: mide
+                el cliente y la latencia, no la precisión real de Azure)
+
+En nativo+ocr, las facturas que el pipeline no resuelve (campos
+obligatorios sin validar) cuentan como fallo en todos sus campos, igual
+que en producción.
+
+Cada estrategia se ejecuta en un proceso nuevo (la memoria máxima es la de
+esa estrategia) con la caché de extracción desactivada. Los resultados se
+guardan en JSON con el commit actual; con --comparar se muestran las
+diferencias frente a otro JSON (p.ej. el de un commit anterior).
+
+Uso:
+    python benchmarks/bench_estrategias.py --estrategias nativo nativo+ocr azure
+    python benchmarks/bench_estrategias.py --comparar benchmarks/resultados/bench_abc1234_20250101_120000.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from comun import BASE_DIR, CAMPOS, acierta, muestras, silenciar_logs, verdad_desde_nombre
+
+ESTRATEGIAS = ("nativo", "nativo+ocr", "ocr", "azure")
+CARPETA_RESULTADOS = BASE_DIR / "benchmarks" / "resultados"
+
+
+def _extractor(estrategia):
+    """Función ruta → info (o None) de una estrategia."""
+    from Renombrar_facturas import renombrar
+    from src.documento import DocumentoFactura
+    
+    def nativo(ruta):
+        texto = renombrar.extraer_texto_nativo_pdf(ruta)
+        return renombrar.parsear_con_regex(texto, ruta.name) if texto.strip() else None
+    
+    def nativo_ocr(ruta):
+        with DocumentoFactura(ruta) as documento:
+            return renombrar._extraer_y_parsear_pdf(ruta, {}, usar_azure=False, documento=documento)
+    
+    def ocr(ruta):
+        texto = renombrar.extraer_texto_pdf_con_ocr(ruta)
+        return renombrar.parsear_con_regex(texto, ruta.name) if texto else None
+    
+    return {"nativo": nativo, "nativo+ocr": nativo_ocr, "ocr": ocr,
+            "azure": renombrar.parsear_con_azure}[estrategia]
+
+
+def _memoria_maxima_mb():
+    """Memoria máxima (RSS) de este proceso en MB, o None si no se puede medir."""
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux la da en KB y macOS en bytes
+    return maximo / (1024 * 1024) if sys.platform == "darwin" else maximo / 1024
+
+
+def ejecutar_estrategia(estrategia, rutas):
+    """
+    Ejecuta una estrategia sobre todas las facturas (en un proceso aparte).
+    
+    Returns:
+        dict: latencias (s), info por factura (solo los campos medidos) y
+            memoria máxima en MB
+    """
+    silenciar_logs()
+    extraer = _extractor(estrategia)
+    
+    latencias = []
+    resultados = []
+    for ruta in rutas:
+        inicio = time.perf_counter()
+        try:
+            info = extraer(ruta)
+        except Exception:
+            info = None
+        latencias.append(time.perf_counter() - inicio)
+        resultados.append({campo: (info or {}).get(campo) for campo in CAMPOS})
+    
+    return {"latencias": latencias, "resultados": resultados, "memoria_mb": _memoria_maxima_mb()}
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por el método del rango más cercano."""
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def resumir(rutas, medida):
+    """Métricas de una estrategia a partir de sus latencias y resultados."""
+    aciertos = dict.fromkeys(CAMPOS + ("completa",), 0)
+    con_verdad = 0
+    fallos = []
+    
+    for ruta, info in zip(rutas, medida["resultados"]):
+        verdad = verdad_desde_nombre(ruta.name)
+        if not verdad:
+            continue
+        con_verdad += 1
+        correctos = [campo for campo in CAMPOS if acierta(campo, info, verdad)]
+        for campo in correctos:
+            aciertos[campo] += 1
+        if len(correctos) == len(CAMPOS):
+            aciertos["completa"] += 1
+        else:
+            fallos.append(ruta.name)
+    
+    latencias = medida["latencias"]
+    total = sum(latencias)
+    return {
+        "facturas": len(rutas),
+        "con_verdad": con_verdad,
+        "precision": {campo: round(n / con_verdad, 4) if con_verdad else None for campo, n in aciertos.items()},
+        "facturas_por_segundo": round(len(rutas) / total, 2) if total else None,
+        "latencia_p50_ms": round(percentil(latencias, 50) * 1000, 1),
+        "latencia_p95_ms": round(percentil(latencias, 95) * 1000, 1),
+        "memoria_max_mb": round(medida["memoria_mb"], 1) if medida["memoria_mb"] else None,
+        "fallos": fallos,
+    }
+
+
+def info_entorno():
+    """Commit, plataforma y ajustes que afectan a las medidas."""
+    from config import settings
+    
+    def git(*args):
+        try:
+            return subprocess.check_output(["git", "-C", str(BASE_DIR), *args],
+                                           stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "cambios_sin_commit": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "ajustes": {
+            "TEXTO_MOTOR": settings.TEXTO_MOTOR,
+            "TEXTO_MAX_PAGINAS": settings.TEXTO_MAX_PAGINAS,
+            "OCR_DPI": settings.OCR_DPI,
+            "OCR_CABECERA": settings.OCR_CABECERA,
+        },
+    }
+
+
+def imprimir(resumenes, anterior=None):
+    print(f"\n  {'estrategia':<11} " + " ".join(f"{c:>9}" for c in CAMPOS + ("completa",))
+          + f" {'fact/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>7}")
+    for estrategia, r in resumenes.items():
+        print(f"  {estrategia:<11} "
+              + " ".join(f"{r['precision'][c]:>9.1%}" for c in CAMPOS + ("completa",))
+              + f" {r['facturas_por_segundo'] or 0:>7.1f} {r['latencia_p50_ms']:>8.1f}"
+              f" {r['latencia_p95_ms']:>8.1f} {r['memoria_max_mb'] or 0:>7.1f}")
+        
+        previo = (anterior or {}).get(estrategia)
+        if previo:
+            print(f"  {'  vs ant.':<11} "
+                  + " ".join(f"{(r['precision'][c] - previo['precision'][c]) * 100:>+8.1f}p"
+                             for c in CAMPOS + ("completa",))
+                  + f" {(r['facturas_por_segundo'] or 0) - (previo['facturas_por_segundo'] or 0):>+7.1f}"
+                  f" {r['latencia_p50_ms'] - previo['latencia_p50_ms']:>+8.1f}"
+                  f" {r['latencia_p95_ms'] - previo['latencia_p95_ms']:>+8.1f}"
+                  f" {(r['memoria_max_mb'] or 0) - (previo['memoria_max_mb'] or 0):>+7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estrategias", nargs="+", choices=ESTRATEGIAS, default=list(ESTRATEGIAS))
+    parser.add_argument("--facturas", type=int, default=0, help="Limitar el número de facturas (0 = todas)")
+    parser.add_argument("--latencia", type=float, default=0.2, help="Segundos por análisis en el Azure simulado")
+    parser.add_argument("--salida", default=None, help="JSON de resultados (por defecto en benchmarks/resultados/)")
+    parser.add_argument("--comparar", default=None, help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+    
+    # Medir el trabajo real, no la caché; los procesos hijos heredan el entorno
+    os.environ["CACHE_ACTIVA"] = "false"
+    
+    rutas = muestras()
+    if args.facturas:
+        rutas = rutas[:args.facturas]
+    
+    servidor = None
+    if "azure" in args.estrategias:
+        from mock_azure import ServidorAzureSimulado
+        servidor = ServidorAzureSimulado(latencia=args.latencia)
+        os.environ["AZURE_FORM_RECOGNIZER_ENDPOINT"] = servidor.iniciar_en_hilo()
+        os.environ["AZURE_FORM_RECOGNIZER_KEY"] = servidor.clave
+    
+    print(f"{len(rutas)} facturas, estrategias: {', '.join(args.estrategias)}")
+    
+    resumenes = {}
+    try:
+        for estrategia in args.estrategias:
+            print(f"  ⏳ {estrategia}...", flush=True)
+            # Un proceso nuevo por estrategia: memoria máxima e imports en frío de cada una
+            with ProcessPoolExecutor(max_workers=1) as proceso:
+                medida = proceso.submit(ejecutar_estrategia, estrategia, rutas).result()
+            resumenes[estrategia] = resumir(rutas, medida)
+    finally:
+        if servidor:
+            servidor.shutdown()
+    
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            datos = json.load(f)
+        anterior = datos["estrategias"]
+        print(f"\nComparando con {args.comparar} (commit {datos['entorno'].get('commit')})")
+    
+    imprimir(resumenes, anterior)
+    
+    entorno = info_entorno()
+    if args.salida:
+        salida = args.salida
+    else:
+        CARPETA_RESULTADOS.mkdir(parents=True, exist_ok=True)
+        salida = CARPETA_RESULTADOS / f"bench_{entorno['commit'] or 'sin_git'}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump({"entorno": entorno, "estrategias": resumenes}, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados guardados en {salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark de los motores de OCR: tesserocr frente a pytesseract
+
+Renderiza páginas de data/samples a OCR_DPI (como el pipeline, con
+pagina_como_imagen) y las reconoce con cada motor instalado de src/ocr.py,
+con 1 hilo o con varios (como ocr_paginas). Mide páginas/s, la primera
+página por separado (con tesserocr incluye cargar el idioma) y cuánto
+difiere el texto de cada motor del de pytesseract.
+
+Uso:
+    python benchmarks/bench_ocr.py --patron CEPSA --paginas 10 --hilos 1 4
+"""
+
+import time
+import difflib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from comun import muestras, silenciar_logs
+
+
+def cargar_paginas(patron, cantidad):
+    """(ruta, número de página) de las muestras que contienen 'patron', hasta 'cantidad'."""
+    import fitz
+    
+    paginas = []
+    for ruta in muestras():
+        if patron.upper() not in ruta.name.upper():
+            continue
+        with fitz.open(ruta) as doc:
+            paginas.extend((ruta, num) for num in range(len(doc)))
+        if len(paginas) >= cantidad:
+            break
+    return paginas[:cantidad]
+
+
+def reconocer_pagina(ruta, num, motor):
+    from src.ocr import pagina_como_imagen, reconocer
+    from src.documento import abrir_pdf
+    
+    with abrir_pdf(ruta) as doc:
+        with pagina_como_imagen(doc[num]) as imagen:
+            return reconocer(imagen, motor)
+
+
+def medir_motor(motor, paginas, hilos):
+    """
+    Returns:
+        tuple: (ms de la primera página, páginas/s del resto, textos)
+    """
+    inicio = time.perf_counter()
+    primero = reconocer_pagina(*paginas[0], motor)
+    ms_primera = (time.perf_counter() - inicio) * 1000
+    
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        resto = list(pool.map(lambda pagina: reconocer_pagina(*pagina, motor), paginas[1:]))
+    duracion = time.perf_counter() - inicio
+    
+    por_segundo = (len(paginas) - 1) / duracion if resto else None
+    return ms_primera, por_segundo, [primero] + resto
+
+
+def motores_disponibles():
+    import importlib.util
+    from src.ocr import MOTORES_OCR
+    
+    # pytesseract primero: su texto es la referencia para comparar
+    return [motor for motor in reversed(MOTORES_OCR) if importlib.util.find_spec(motor) is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patron", default="", help="Texto que debe contener el nombre de la muestra")
+    parser.add_argument("--paginas", type=int, default=10)
+    parser.add_argument("--hilos", type=int, nargs="+", default=[1])
+    args = parser.parse_args()
+    
+    silenciar_logs()
+    from config import settings
+    
+    motores = motores_disponibles()
+    paginas = cargar_paginas(args.patron, args.paginas)
+    print(f"{len(paginas)} páginas a {settings.OCR_DPI} DPI ({'gris' if settings.OCR_GRIS else 'RGB'}), "
+          f"motores: {', '.join(motores) or 'ninguno'}\n")
+    if not paginas or not motores:
+        return
+    
+    print(f"  {'motor':<12} {'hilos':>5} {'1ª pág. ms':>11} {'págs/s':>8} {'dif. texto':>11}")
+    referencia = None
+    for hilos in args.hilos:
+        for motor in motores:
+            try:
+                ms_primera, por_segundo, textos = medir_motor(motor, paginas, hilos)
+            except Exception as e:
+                print(f"  {motor:<12} {hilos:>5}  ❌ {e}")
+                continue
+            
+            if motor == "pytesseract" and referencia is None:
+                referencia = textos
+            diferencia = ""
+            if referencia is not None and motor != "pytesseract":
+                similitud = sum(difflib.SequenceMatcher(None, a, b).ratio()
+                                for a, b in zip(referencia, textos)) / len(textos)
+                diferencia = f"{1 - similitud:.2%}"
+            print(f"  {motor:<12} {hilos:>5} {ms_primera:>11.0f} {por_segundo or 0:>8.2f} {diferencia:>11}")
+
+
+if __name__ == "__main__":
+    main()
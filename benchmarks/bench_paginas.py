@@ -0,0 +1,78 @@
+"""
+Benchmark del texto nativo frente al número de páginas
+
+Construye PDF de 1 a N páginas repitiendo las páginas de una factura de
+data/samples (por defecto una de CEPSA) y mide el texto nativo leyendo el
+documento entero frente a la extracción página a página con parada
+temprana y TEXTO_MAX_PAGINAS, como extraer_texto_nativo_pdf
+(src/texto_nativo.py).
+
+Uso:
+    python benchmarks/bench_paginas.py --patron CEPSA --paginas 1 5 20 60 --motor pymupdf
+"""
+
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from comun import muestras, silenciar_logs
+
+
+def construir_pdf(origen, paginas, destino):
+    """Copia de 'origen' con sus páginas repetidas hasta tener 'paginas' páginas."""
+    import fitz
+    
+    with fitz.open(origen) as fuente, fitz.open() as doc:
+        while len(doc) < paginas:
+            doc.insert_pdf(fuente, to_page=min(len(fuente), paginas - len(doc)) - 1)
+        doc.save(destino)
+
+
+def medir(extraer, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        extraer()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patron", default="CEPSA", help="Texto que debe contener el nombre de la muestra")
+    parser.add_argument("--paginas", type=int, nargs="+", default=[1, 5, 20, 60])
+    parser.add_argument("--motor", default=None, help="Por defecto TEXTO_MOTOR")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    
+    silenciar_logs()
+    from config import settings
+    from src.texto_nativo import extraer_texto_nativo
+    from Renombrar_facturas.renombrar import campos_faltantes, parsear_con_regex
+    
+    motor = args.motor or settings.TEXTO_MOTOR
+    origen = next(ruta for ruta in muestras() if args.patron.upper() in ruta.name.upper())
+    
+    max_paginas = settings.TEXTO_MAX_PAGINAS
+    
+    print(f"{origen.name} ({motor}, TEXTO_MAX_PAGINAS={max_paginas})\n")
+    print(f"  {'páginas':>8} {'completo ms':>12} {'por páginas ms':>15}")
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        for paginas in args.paginas:
+            ruta = Path(carpeta) / f"{paginas}_{origen.name}"
+            construir_pdf(origen, paginas, ruta)
+            
+            def completo(texto):
+                return not campos_faltantes(parsear_con_regex(texto, ruta.name))
+            
+            # Como extraer_texto_nativo_pdf, sin y con parada temprana y TEXTO_MAX_PAGINAS
+            completo_ms = medir(lambda: extraer_texto_nativo(ruta, motor, max_paginas=0), args.repeticiones)
+            por_paginas = medir(lambda: extraer_texto_nativo(ruta, motor, completo, max_paginas), args.repeticiones)
+            
+            print(f"  {paginas:>8} {completo_ms:12.1f} {por_paginas:15.1f}  (x{completo_ms / por_paginas:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark del parseo por regex (parsear_con_regex)
+
+Mide el tiempo de parseo por factura sobre el texto nativo de data/samples
+con la implementación actual y con la de una revisión anterior, y comprueba
+que ambas devuelven la misma información.
+
+Uso:
+    python benchmarks/bench_parser.py --referencia HEAD~1 --repeticiones 20
+"""
+
+import argparse
+import time
+
+from comun import muestras, cargar_modulo_de_revision, silenciar_logs
+
+
+def funcion_parseo(modulo):
+    """parsear_con_regex si existe; en revisiones antiguas, parsear_factura sin Azure."""
+    if hasattr(modulo, "parsear_con_regex"):
+        return modulo.parsear_con_regex
+    return lambda texto, nombre: modulo.parsear_factura(texto, nombre)
+
+
+def normalizar(info):
+    """Resultado comparable entre versiones (None si no hay al menos 2 de 3 campos)."""
+    if not info:
+        return None
+    campos = ("fecha", "proveedor", "numero", "cif")
+    if sum(bool(info.get(campo)) for campo in campos[:3]) < 2:
+        return None
+    return {campo: info.get(campo) for campo in campos}
+
+
+def medir(parsear, textos, repeticiones):
+    """
+    Returns:
+        float: Microsegundos por factura (mejor de las repeticiones)
+    """
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for nombre, texto in textos:
+            parsear(texto, nombre)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor / len(textos) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--referencia", default="HEAD~1", help="Revisión de git a comparar")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+    
+    silenciar_logs()
+    from Renombrar_facturas import renombrar as actual
+    referencia = cargar_modulo_de_revision("Renombrar_facturas/renombrar.py", args.referencia)
+    
+    print(f"Extrayendo texto nativo de {len(muestras())} facturas...")
+    textos = []
+    for ruta in muestras():
+        texto = actual.extraer_texto_nativo_pdf(ruta)
+        if texto.strip():
+            textos.append((ruta.name, texto))
+    
+    parsear_actual = funcion_parseo(actual)
+    parsear_referencia = funcion_parseo(referencia)
+    
+    diferencias = [
+        nombre for nombre, texto in textos
+        if normalizar(parsear_actual(texto, nombre)) != normalizar(parsear_referencia(texto, nombre))
+    ]
+    
+    t_referencia = medir(parsear_referencia, textos, args.repeticiones)
+    t_actual = medir(parsear_actual, textos, args.repeticiones)
+    
+    print(f"\nFacturas con texto: {len(textos)}")
+    print(f"  {args.referencia:<12} {t_referencia:10.1f} µs/factura")
+    print(f"  {'actual':<12} {t_actual:10.1f} µs/factura  (x{t_referencia / t_actual:.2f})")
+    print(f"  Resultados distintos: {len(diferencias)}")
+    for nombre in diferencias:
+        print(f"    - {nombre}")
+
+
+if __name__ == "__main__":
+    main()
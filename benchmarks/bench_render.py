@@ -0,0 +1,107 @@
+"""
+Benchmark del paso página PDF → imagen PIL que precede al OCR
+
+Compara, por página y a OCR_DPI, la conversión anterior (pixmap RGB → PNG →
+Image.open) con la imagen construida sobre los samples del pixmap
+(src/ocr.py), en RGB y en escala de grises. Por defecto usa las facturas
+multipágina de CEPSA de data/samples.
+
+La memoria "extra" es la que se reserva además del propio pixmap: el PNG
+intermedio y la imagen decodificada (o la copia RGB que hace PIL).
+
+Uso:
+    python benchmarks/bench_render.py --patron CEPSA --repeticiones 3
+"""
+
+import io
+import time
+import argparse
+import tracemalloc
+
+from comun import muestras, silenciar_logs
+
+MB = 1024 * 1024
+
+
+def via_png(pagina, dpi):
+    """Conversión anterior: PNG intermedio."""
+    from PIL import Image
+    
+    pix = pagina.get_pixmap(dpi=dpi)
+    datos = pix.tobytes("png")
+    imagen = Image.open(io.BytesIO(datos))
+    imagen.load()
+    extra = len(datos) + imagen.width * imagen.height * len(imagen.getbands())
+    return imagen.size, pix.width * pix.height * pix.n, extra
+
+
+def via_samples(gris):
+    def convertir(pagina, dpi):
+        from src.ocr import pagina_como_imagen
+        
+        with pagina_como_imagen(pagina, dpi=dpi, gris=gris) as imagen:
+            imagen.load()
+            # En gris la imagen es una vista del pixmap; en RGB, PIL hace una copia
+            extra = 0 if imagen.mode == "L" else imagen.width * imagen.height * 3
+            return imagen.size, imagen.width * imagen.height * len(imagen.getbands()), extra
+    return convertir
+
+
+def medir(convertir, paginas, dpi, repeticiones):
+    """
+    Returns:
+        tuple: (ms por página, MB de pixmap por página, MB extra por página, pico tracemalloc en MB)
+    """
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for pagina in paginas:
+            convertir(pagina, dpi)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    
+    tracemalloc.start()
+    pixmap = extra = 0
+    for pagina in paginas:
+        _, bytes_pixmap, bytes_extra = convertir(pagina, dpi)
+        pixmap += bytes_pixmap
+        extra += bytes_extra
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    n = len(paginas)
+    return mejor / n * 1000, pixmap / n / MB, extra / n / MB, pico / MB
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patron", default="CEPSA", help="Texto que debe contener el nombre de la muestra")
+    parser.add_argument("--dpi", type=int, default=None, help="Por defecto OCR_DPI")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    
+    silenciar_logs()
+    import fitz
+    from config.settings import OCR_DPI
+    
+    dpi = args.dpi or OCR_DPI
+    documentos = [fitz.open(ruta) for ruta in muestras() if args.patron.upper() in ruta.name.upper()]
+    documentos = [doc for doc in documentos if len(doc) > 1]
+    paginas = [pagina for doc in documentos for pagina in doc]
+    
+    print(f"{len(documentos)} documentos multipágina, {len(paginas)} páginas a {dpi} DPI\n")
+    print(f"  {'conversión':<16} {'ms/pág':>8} {'pixmap MB':>10} {'extra MB':>9} {'pico py MB':>11}")
+    
+    base = None
+    for nombre, convertir in (("PNG (anterior)", via_png),
+                              ("samples RGB", via_samples(False)),
+                              ("samples gris", via_samples(True))):
+        ms, pixmap, extra, pico = medir(convertir, paginas, dpi, args.repeticiones)
+        base = base or ms
+        print(f"  {nombre:<16} {ms:8.1f} {pixmap:10.1f} {extra:9.1f} {pico:11.1f}  (x{base / ms:.1f})")
+    
+    for doc in documentos:
+        doc.close()
+
+
+if __name__ == "__main__":
+    main()
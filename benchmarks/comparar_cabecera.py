@@ -0,0 +1,120 @@
+"""
+Compara el OCR de la página 1 completa con el OCR solo de cabecera y logos
+
+Para cada factura de data/samples con texto nativo calcula cuántos píxeles
+hay que pasar a Tesseract en cada modo (página entera frente a banda
+superior + imágenes, ver src/ocr.py) y el tiempo de OCR. Si Tesseract está
+instalado, parsea además texto OCR + texto nativo con cada modo (como la
+etapa "nativo+ocr") y lista las facturas cuyo resultado cambia, indicando
+cuál de los dos acierta el proveedor según el nombre del archivo.
+
+Uso:
+    python benchmarks/comparar_cabecera.py --banda 0.2
+"""
+
+import time
+import argparse
+
+from comun import muestras, silenciar_logs, verdad_desde_nombre
+
+
+def tesseract_disponible():
+    import pytesseract
+    from pathlib import Path
+    from config.settings import TESSERACT_PATH
+    
+    if Path(TESSERACT_PATH).exists():
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def pixeles(pagina, regiones, dpi):
+    escala = (dpi / 72) ** 2
+    return sum((region or pagina.rect).get_area() * escala for region in regiones)
+
+
+def ocr(pagina, regiones, con_tesseract):
+    """Texto OCR de las regiones (o solo el renderizado si no hay Tesseract) y segundos."""
+    import pytesseract
+    from config.settings import TESSERACT_LANG
+    from src.ocr import pagina_como_imagen
+    
+    inicio = time.perf_counter()
+    textos = []
+    for region in regiones:
+        with pagina_como_imagen(pagina, clip=region) as imagen:
+            if con_tesseract:
+                textos.append(pytesseract.image_to_string(imagen, lang=TESSERACT_LANG))
+    return "\n".join(textos), time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banda", type=float, default=None, help="Por defecto OCR_BANDA_CABECERA")
+    args = parser.parse_args()
+    
+    silenciar_logs()
+    import fitz
+    from config.settings import OCR_DPI, OCR_BANDA_CABECERA
+    from src.ocr import regiones_cabecera
+    from Renombrar_facturas.renombrar import extraer_texto_nativo_pdf, parsear_con_regex
+    
+    banda = OCR_BANDA_CABECERA if args.banda is None else args.banda
+    con_tesseract = tesseract_disponible()
+    if not con_tesseract:
+        print("⚠️ Tesseract no disponible: solo se comparan píxeles y tiempo de renderizado\n")
+    
+    px_pagina = px_cabecera = 0
+    t_pagina = t_cabecera = 0.0
+    cambios = []
+    total = 0
+    
+    for ruta in muestras():
+        nativo = extraer_texto_nativo_pdf(ruta)
+        if not nativo.strip():
+            continue  # PDF escaneado: usa el OCR completo, no el de logos
+        total += 1
+        
+        with fitz.open(ruta) as doc:
+            pagina = doc[0]
+            regiones = regiones_cabecera(pagina, banda)
+            px_pagina += pixeles(pagina, [None], OCR_DPI)
+            px_cabecera += pixeles(pagina, regiones, OCR_DPI)
+            
+            texto_pagina, segundos = ocr(pagina, [None], con_tesseract)
+            t_pagina += segundos
+            texto_cabecera, segundos = ocr(pagina, regiones, con_tesseract)
+            t_cabecera += segundos
+        
+        if not con_tesseract:
+            continue
+        
+        info_pagina = parsear_con_regex(texto_pagina + "\n" + nativo, ruta.name)
+        info_cabecera = parsear_con_regex(texto_cabecera + "\n" + nativo, ruta.name)
+        campos = ("fecha", "proveedor", "numero")
+        if any(info_pagina.get(c) != info_cabecera.get(c) for c in campos):
+            verdad = verdad_desde_nombre(ruta.name) or {}
+            esperado = (verdad.get("proveedor") or "").replace(" ", "_").upper()
+            cambios.append((ruta.name, info_pagina, info_cabecera, esperado))
+    
+    print(f"Facturas con texto nativo: {total} (banda superior: {banda:.0%} de la página, {OCR_DPI} DPI)")
+    print(f"  Píxeles a OCR:  página {px_pagina / 1e6:8.1f} Mpx   cabecera {px_cabecera / 1e6:8.1f} Mpx"
+          f"   ({px_cabecera / px_pagina:.0%})")
+    print(f"  Tiempo {'OCR' if con_tesseract else 'render'}:    página {t_pagina:8.2f} s     cabecera {t_cabecera:8.2f} s"
+          f"     (x{t_pagina / t_cabecera:.1f})")
+    
+    if con_tesseract:
+        print(f"\nResultados distintos: {len(cambios)}")
+        for nombre, info_pagina, info_cabecera, esperado in cambios:
+            print(f"  - {nombre}")
+            for modo, info in (("página", info_pagina), ("cabecera", info_cabecera)):
+                acierta = "✓" if esperado and (info.get("proveedor") or "").upper() == esperado else " "
+                print(f"      {modo:<9} {acierta} {info.get('fecha')} | {info.get('proveedor')} | {info.get('numero')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compara los motores de texto nativo de src/texto_nativo.py (PyMuPDF y pdfplumber)
+
+Para cada PDF de data/samples extrae el texto con cada motor, mide el
+tiempo (mejor de N repeticiones) y parsea el resultado con las regex. La
+precisión se mide campo a campo frente a los datos del nombre del archivo
+(fecha exacta, proveedor contenido en el extraído y número sin separadores)
+y se listan las facturas en las que los dos motores dan resultados
+distintos.
+
+Uso:
+    python benchmarks/comparar_texto.py --repeticiones 3
+"""
+
+import time
+import argparse
+
+from comun import CAMPOS, acierta, muestras, silenciar_logs, verdad_desde_nombre
+
+
+def medir(extraer, ruta, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        texto = extraer(ruta)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return texto, mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=1)
+    args = parser.parse_args()
+    
+    silenciar_logs()
+    from src.texto_nativo import MOTORES, extraer_texto_nativo
+    from Renombrar_facturas.renombrar import parsear_con_regex
+    
+    rutas = muestras()
+    tiempos = dict.fromkeys(MOTORES, 0.0)
+    aciertos = {motor: dict.fromkeys(CAMPOS, 0) for motor in MOTORES}
+    con_texto = dict.fromkeys(MOTORES, 0)
+    distintas = []
+    total = 0
+    
+    for ruta in rutas:
+        verdad = verdad_desde_nombre(ruta.name)
+        resultados = {}
+        for motor in MOTORES:
+            # Documento completo: se comparan los motores, no la parada temprana
+            extraer = lambda ruta: extraer_texto_nativo(ruta, motor, max_paginas=0)
+            texto, segundos = medir(extraer, ruta, args.repeticiones)
+            tiempos[motor] += segundos
+            info = parsear_con_regex(texto, ruta.name) if texto.strip() else {}
+            con_texto[motor] += bool(texto.strip())
+            resultados[motor] = info
+            if verdad:
+                for campo in CAMPOS:
+                    aciertos[motor][campo] += acierta(campo, info, verdad)
+        total += bool(verdad)
+        
+        valores = {tuple(info.get(c) for c in CAMPOS) for info in resultados.values()}
+        if len(valores) > 1:
+            distintas.append((ruta.name, resultados))
+    
+    base = tiempos["pdfplumber"]
+    print(f"{len(rutas)} PDF ({total} con datos esperados en el nombre)\n")
+    print(f"  {'motor':<12} {'tiempo':>8} {'ms/PDF':>8} {'con texto':>10} "
+          + " ".join(f"{c:>10}" for c in CAMPOS))
+    for motor in MOTORES:
+        print(f"  {motor:<12} {tiempos[motor]:7.2f}s {tiempos[motor] / len(rutas) * 1000:8.1f} "
+              f"{con_texto[motor]:>10} "
+              + " ".join(f"{aciertos[motor][c]:>6}/{total:<3}" for c in CAMPOS)
+              + f"  (x{base / tiempos[motor]:.1f})")
+    
+    print(f"\nResultados distintos: {len(distintas)}")
+    for nombre, resultados in distintas:
+        verdad = verdad_desde_nombre(nombre)
+        print(f"  - {nombre}")
+        for motor, info in resultados.items():
+            marcas = "".join("✓" if verdad and acierta(c, info, verdad) else "·" for c in CAMPOS)
+            print(f"      {motor:<11} {marcas} {info.get('fecha')} | {info.get('proveedor')} | {info.get('numero')}")
+
+
+if __name__ == "__main__":
+    main()
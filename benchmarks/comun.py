@@ -0,0 +1,98 @@
+"""
+Utilidades compartidas por los scripts de benchmark
+"""
+
+import re
+import sys
+import types
+import subprocess
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+SAMPLES_DIR = BASE_DIR / "data" / "samples"
+
+sys.path.insert(0, str(BASE_DIR))
+
+
+def silenciar_logs():
+    """Quita los handlers de loguru para que el log no distorsione las medidas."""
+    from loguru import logger
+    logger.remove()
+
+
+def muestras(extensiones=(".pdf",)):
+    """
+    Lista las facturas de muestra de data/samples.
+    
+    Returns:
+        list: Rutas Path ordenadas por nombre
+    """
+    return sorted(p for p in SAMPLES_DIR.iterdir() if p.suffix.lower() in extensiones)
+
+
+def verdad_desde_nombre(nombre):
+    """
+    Datos esperados de una muestra a partir de su nombre.
+    Los nombres de data/samples siguen el formato dd.mm.aaaa_PROVEEDOR_NUMERO.ext
+    (p.ej. 31.03.2025_CEPSA_6503017491.PDF).
+    
+    Args:
+        nombre (str): Nombre del archivo
+        
+    Returns:
+        dict: fecha (AAAAMMDD), proveedor y numero, o None si no sigue el formato
+    """
+    base = re.sub(r'\s*\(\d+\)$', '', Path(nombre).stem)  # Copias: "nombre (2).pdf"
+    partes = base.split('_', 2)
+    if len(partes) != 3:
+        return None
+    
+    match = re.fullmatch(r'(\d{2})\.(\d{2})\.(\d{4})', partes[0])
+    if not match:
+        return None
+    dia, mes, anio = match.groups()
+    
+    return {
+        'fecha': f"{anio}{mes}{dia}",
+        'proveedor': partes[1],
+        'numero': partes[2],
+    }
+
+
+CAMPOS = ("fecha", "proveedor", "numero")
+
+
+def normalizar(texto):
+    return re.sub(r'[^A-Z0-9]', '', (texto or '').upper())
+
+
+def acierta(campo, info, verdad):
+    """Indica si el campo parseado coincide con el del nombre del archivo."""
+    if campo == "fecha":
+        return info.get("fecha") == verdad["fecha"]
+    if campo == "proveedor":
+        # El nombre lleva una forma corta ("CEPSA" frente a "CEPSA_SA")
+        return normalizar(verdad["proveedor"]) in normalizar(info.get("proveedor"))
+    return normalizar(info.get("numero")) == normalizar(verdad["numero"])
+
+
+def cargar_modulo_de_revision(ruta_relativa, revision):
+    """
+    Carga un módulo del proyecto tal como estaba en una revisión de git,
+    para comparar la implementación actual con una anterior.
+    
+    Args:
+        ruta_relativa (str): Ruta del archivo dentro del repositorio
+        revision (str): Commit, rama o tag
+        
+    Returns:
+        module: Módulo cargado
+    """
+    codigo = subprocess.check_output(
+        ["git", "-C", str(BASE_DIR), "show", f"{revision}:{ruta_relativa}"]
+    ).decode("utf-8")
+    
+    modulo = types.ModuleType(f"ref_{Path(ruta_relativa).stem}")
+    modulo.__file__ = str(BASE_DIR / ruta_relativa)
+    exec(compile(codigo, f"{revision}:{ruta_relativa}", "exec"), modulo.__dict__)
+    return modulo
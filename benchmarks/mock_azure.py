@@ -0,0 +1,244 @@
+"""
+Servidor local que simula Azure Document Intelligence (modelo prebuilt-invoice)
+
+Implementa lo mínimo de la API REST que usa el SDK (analyze + polling del
+resultado) para probar y medir src/azure_extractor.py sin llamar a Azure.
+Para las facturas de data/samples devuelve los datos de su nombre de archivo
+(dd.mm.aaaa_PROVEEDOR_NUMERO); para cualquier otro documento, ninguna factura.
+
+Con --limite-tps simula el límite de transacciones por segundo de Azure: las
+peticiones que lo superan reciben 429 con Retry-After.
+
+Uso:
+    python benchmarks/mock_azure.py --puerto 8765 --latencia 0.5 --limite-tps 15
+    
+    # En otra terminal
+    AZURE_FORM_RECOGNIZER_ENDPOINT=http://127.0.0.1:8765 AZURE_FORM_RECOGNIZER_KEY=test \\
+        python Renombrar_facturas/renombrar.py
+
+GET /_estadisticas devuelve el número de conexiones TCP, peticiones recibidas y
+peticiones rechazadas con 429.
+"""
+
+import re
+import json
+import math
+import time
+import uuid
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from comun import muestras, verdad_desde_nombre
+
+CLAVE_API = "test"
+
+_RUTA_ANALIZAR = re.compile(r'^/formrecognizer/documentModels/([^/:]+):analyze')
+_RUTA_RESULTADO = re.compile(r'^/formrecognizer/documentModels/([^/]+)/analyzeResults/([^/?]+)')
+
+
+def _resultado_factura(verdad, modelo):
+    """Cuerpo analyzeResult con los campos de una factura conocida (o sin facturas)."""
+    documentos = []
+    if verdad:
+        fecha = f"{verdad['fecha'][:4]}-{verdad['fecha'][4:6]}-{verdad['fecha'][6:]}"
+        documentos.append({
+            "docType": "invoice",
+            "confidence": 0.95,
+            "spans": [],
+            "fields": {
+                "InvoiceDate": {"type": "date", "valueDate": fecha, "content": fecha, "confidence": 0.95},
+                "VendorName": {"type": "string", "valueString": verdad['proveedor'],
+                               "content": verdad['proveedor'], "confidence": 0.9},
+                "InvoiceId": {"type": "string", "valueString": verdad['numero'],
+                              "content": verdad['numero'], "confidence": 0.9},
+            },
+        })
+    
+    return {
+        "apiVersion": "2023-07-31",
+        "modelId": modelo,
+        "stringIndexType": "textElements",
+        "content": "",
+        "pages": [],
+        "documents": documentos,
+    }
+
+
+class ManejadorAzure(BaseHTTPRequestHandler):
+    """Peticiones de la API de análisis de documentos."""
+    
+    protocol_version = "HTTP/1.1"  # keep-alive: permite comprobar la reutilización de conexiones
+    
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.estadisticas["conexiones"] += 1
+    
+    def log_message(self, formato, *args):
+        pass
+    
+    def _responder(self, codigo, cuerpo=None, cabeceras=None):
+        datos = json.dumps(cuerpo).encode() if cuerpo is not None else b""
+        self.send_response(codigo)
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        if cuerpo is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+    
+    def _autorizado(self):
+        if self.headers.get("Ocp-Apim-Subscription-Key") == self.server.clave:
+            return True
+        self._responder(401, {"error": {"code": "401", "message": "Access denied due to invalid subscription key."}})
+        return False
+    
+    def _limitado(self):
+        """Responde 429 si se superó el límite de peticiones en el segundo actual."""
+        if not self.server.limite_tps:
+            return False
+        
+        ahora = time.monotonic()
+        with self.server.lock:
+            ventana = self.server.ventana
+            if ahora - ventana[0] >= 1.0:
+                ventana[0], ventana[1] = ahora, 0
+            ventana[1] += 1
+            if ventana[1] <= self.server.limite_tps:
+                return False
+            self.server.estadisticas["limitadas"] += 1
+            espera = max(1, math.ceil(ventana[0] + 1.0 - ahora))
+        
+        self._responder(429, {"error": {"code": "429", "message": "Rate limit is exceeded. Try again later."}},
+                        cabeceras={"Retry-After": str(espera)})
+        return True
+    
+    def do_POST(self):
+        longitud = int(self.headers.get("Content-Length", 0))
+        documento = self.rfile.read(longitud)
+        
+        with self.server.lock:
+            self.server.estadisticas["peticiones"] += 1
+        
+        match = _RUTA_ANALIZAR.match(self.path)
+        if not match:
+            self._responder(404, {"error": {"code": "NotFound", "message": self.path}})
+            return
+        if not self._autorizado() or self._limitado():
+            return
+        
+        modelo = match.group(1)
+        verdad = self.server.facturas.get(hashlib.sha256(documento).hexdigest())
+        operacion = uuid.uuid4().hex
+        
+        with self.server.lock:
+            self.server.operaciones[operacion] = (
+                time.monotonic() + self.server.latencia,
+                _resultado_factura(verdad, modelo)
+            )
+        
+        host = self.headers.get("Host")
+        ubicacion = f"http://{host}/formrecognizer/documentModels/{modelo}/analyzeResults/{operacion}?api-version=2023-07-31"
+        self._responder(202, cabeceras={"Operation-Location": ubicacion, "apim-request-id": operacion})
+    
+    def do_GET(self):
+        with self.server.lock:
+            self.server.estadisticas["peticiones"] += 1
+        
+        if self.path.startswith("/_estadisticas"):
+            with self.server.lock:
+                self._responder(200, dict(self.server.estadisticas))
+            return
+        
+        match = _RUTA_RESULTADO.match(self.path)
+        if not match:
+            self._responder(404, {"error": {"code": "NotFound", "message": self.path}})
+            return
+        if not self._autorizado() or self._limitado():
+            return
+        
+        with self.server.lock:
+            operacion = self.server.operaciones.get(match.group(2))
+        if operacion is None:
+            self._responder(404, {"error": {"code": "NotFound", "message": "Operación desconocida"}})
+            return
+        
+        listo_en, resultado = operacion
+        ahora = time.monotonic()
+        marca = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        
+        if ahora < listo_en:
+            espera_ms = max(1, int((listo_en - ahora) * 1000))
+            self._responder(200, {"status": "running", "createdDateTime": marca, "lastUpdatedDateTime": marca},
+                            cabeceras={"retry-after-ms": str(espera_ms)})
+            return
+        
+        self._responder(200, {
+            "status": "succeeded",
+            "createdDateTime": marca,
+            "lastUpdatedDateTime": marca,
+            "analyzeResult": resultado,
+        })
+
+
+class ServidorAzureSimulado(ThreadingHTTPServer):
+    """
+    Servidor HTTP que simula Azure Document Intelligence.
+    
+    Args:
+        direccion (tuple): (host, puerto); puerto 0 = uno libre
+        latencia (float): Segundos que tarda cada análisis en completarse
+        clave (str): API key aceptada
+        limite_tps (int): Peticiones por segundo antes de responder 429 (0 = sin límite)
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self, direccion=("127.0.0.1", 0), latencia=0.0, clave=CLAVE_API, limite_tps=0):
+        super().__init__(direccion, ManejadorAzure)
+        self.latencia = latencia
+        self.clave = clave
+        self.limite_tps = limite_tps
+        self.ventana = [time.monotonic(), 0]  # [inicio del segundo actual, peticiones]
+        self.lock = threading.Lock()
+        self.operaciones = {}
+        self.estadisticas = {"conexiones": 0, "peticiones": 0, "limitadas": 0}
+        self.facturas = {
+            hashlib.sha256(ruta.read_bytes()).hexdigest(): verdad_desde_nombre(ruta.name)
+            for ruta in muestras()
+        }
+    
+    @property
+    def endpoint(self):
+        host, puerto = self.server_address[:2]
+        return f"http://{host}:{puerto}"
+    
+    def iniciar_en_hilo(self):
+        """Arranca el servidor en un hilo en segundo plano y devuelve el endpoint."""
+        hilo = threading.Thread(target=self.serve_forever, daemon=True)
+        hilo.start()
+        return self.endpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.5, help="Segundos por análisis")
+    parser.add_argument("--limite-tps", type=int, default=0, help="Peticiones/s antes de responder 429 (0 = sin límite)")
+    args = parser.parse_args()
+    
+    servidor = ServidorAzureSimulado((args.host, args.puerto), latencia=args.latencia,
+                                     limite_tps=args.limite_tps)
+    print(f"Azure simulado en {servidor.endpoint} (clave: {CLAVE_API}, {len(servidor.facturas)} facturas conocidas)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Configuración del proyecto (settings y reglas de extracción)"""
@@ -0,0 +1,173 @@
+"""
+Patrones regex para extraer datos de facturas
+
+Tabla declarativa de reglas por campo. Las reglas de cada campo se prueban
+en orden y gana la primera que produce un valor válido. El motor que las
+compila (una sola vez, al importar) está en src/parser_regex.py.
+
+Claves de cada regla:
+    nombre: Descripción para el log
+    patron: Expresión regular (el valor es el grupo indicado en 'grupo', por defecto 1)
+    ignorar_mayusculas: Aplica re.IGNORECASE
+    todas: Recorre todas las coincidencias (o las N primeras si es un número)
+           en vez de quedarse con la primera
+    contexto_prohibido: Descarta la coincidencia si estas palabras aparecen
+           a menos de 'ventana' caracteres
+    excluir_si_contiene: Descarta el valor si contiene alguno de estos textos
+    excluir_valores: Descarta el valor si es exactamente uno de estos
+    ancla: Busca primero este patrón y aplica 'patrones' solo en los
+           'ventana' caracteres que lo rodean
+    max_longitud: Recorta el valor
+    requiere: Textos literales de los que la regla necesita al menos uno;
+           si no aparece ninguno no se ejecuta la regex (filtro rápido)
+"""
+
+# Fechas de albarán (no son la fecha de la factura)
+CONTEXTO_ALBARAN = ['albar']
+
+# Empresas que son clientes, no proveedores
+EMPRESAS_CLIENTE = ['HAFESA', 'HAFESA OIL', 'HAFESA OLI']
+
+# Nombres de empresa con sufijo legal
+PATRONES_EMPRESA = [
+    r'([A-ZÁÉÍÓÚÑ&][A-ZÁÉÍÓÚÑa-záéíóúñ\s\-\.,&]+?(?:S\.A\.U\.|S\.L\.U\.|S\.A\.|S\.L\.|S\.C\.|S\.COOP\.))',
+    r'([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑa-záéíóúñ\s\-]+BY\s+[A-ZÁÉÍÓÚÑa-záéíóúñ\s\-]+)',  # Ej: "Q-SAFETY BY QUIRÓN"
+]
+
+FECHA = r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
+
+# Palabras que el patrón de número puede capturar por error
+NO_SON_NUMERO = ['FECHA', 'FACTURA', 'DATE', 'INVOICE']
+
+
+def _numero(nombre, patron, requiere=None):
+    """Regla de número de factura (todas ignoran mayúsculas y excluyen NO_SON_NUMERO)."""
+    regla = {
+        'nombre': nombre,
+        'patron': patron,
+        'ignorar_mayusculas': True,
+        'excluir_valores': NO_SON_NUMERO,
+    }
+    if requiere:
+        regla['requiere'] = requiere
+    return regla
+
+
+REGLAS = {
+    # CIF/NIF (útil para búsqueda en base de datos)
+    # Variaciones: CIF, C.I.F., C.LF., NIF, N.I.F. y NIF de persona física: 34864979-S
+    'cif': [
+        {
+            'nombre': 'con prefijo',
+            'patron': r'(?:C\.?I\.?F\.?|C\.?L\.?F\.?|N\.?I\.?F\.?)\s*[:.\s]*\s*([A-Z0-9][-\s.]*\d{7,8}[-\s]*[A-Z]?)',
+            'ignorar_mayusculas': True,
+        },
+        {
+            'nombre': 'NIF sin prefijo',
+            'patron': r'(\d{8}[-\s]*[A-Z])',
+        },
+    ],
+    
+    # Priorizar fechas explícitas de factura/emisión, luego junto al número
+    # de factura y por último cualquier fecha, evitando las de albarán
+    'fecha': [
+        {
+            'nombre': 'explícita',
+            'patron': r'Fecha\s+(?:de\s+)?(?:emisi[oó]n|factura)[:\s]+' + FECHA,
+            'requiere': ['fecha'],
+            'ignorar_mayusculas': True,
+            'contexto_prohibido': CONTEXTO_ALBARAN,
+            'ventana': 50,
+        },
+        {
+            'nombre': 'explícita',
+            'patron': r'Fecha[:\s]+' + FECHA,
+            'requiere': ['fecha'],
+            'ignorar_mayusculas': True,
+            'contexto_prohibido': CONTEXTO_ALBARAN,
+            'ventana': 50,
+        },
+        {
+            'nombre': 'explícita',
+            'patron': r'Date[:\s]+' + FECHA,
+            'requiere': ['date'],
+            'ignorar_mayusculas': True,
+            'contexto_prohibido': CONTEXTO_ALBARAN,
+            'ventana': 50,
+        },
+        {
+            # Formato: número/año fecha (ej: 511890/25 18-09-2025)
+            'nombre': 'junto a número',
+            'patron': r'(\d{5,7}/\d{2})\s+(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
+            'grupo': 2,
+        },
+        {
+            'nombre': 'genérica',
+            'patron': FECHA,
+            'todas': 5,  # Revisar primeras 5 fechas
+            'contexto_prohibido': CONTEXTO_ALBARAN,
+            'ventana': 50,
+        },
+    ],
+    
+    'proveedor': [
+        # Estrategia 1: "Proveedor:" explícito
+        {
+            'nombre': 'explícito',
+            'patron': r'Proveedor[:\s]+([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?:\n|Número|N[úu]mero|Fecha|Importe)',
+            'requiere': ['proveedor'],
+            'ignorar_mayusculas': True,
+        },
+        {
+            'nombre': 'explícito',
+            'patron': r'Supplier[:\s]+([A-Za-z\s]+?)(?:\n|Number|Date|Amount)',
+            'requiere': ['supplier'],
+            'ignorar_mayusculas': True,
+        },
+        {
+            'nombre': 'explícito',
+            'patron': r'Razón Social[:\s]+([A-ZÁÉÍÓÚÑa-záéíóúñ\s]+?)(?:\n|NIF|CIF)',
+            'requiere': ['razón social'],
+            'ignorar_mayusculas': True,
+        },
+        # Estrategia 2: empresas con sufijo legal en todo el texto (sin clientes)
+        {
+            'nombre': 'sufijo legal',
+            'patron': PATRONES_EMPRESA[0],
+            'requiere': ['S.'],
+            'todas': True,
+            'excluir_si_contiene': EMPRESAS_CLIENTE,
+            'max_longitud': 50,
+        },
+        {
+            'nombre': 'sufijo legal',
+            'patron': PATRONES_EMPRESA[1],
+            'requiere': ['BY'],
+            'todas': True,
+            'excluir_si_contiene': EMPRESAS_CLIENTE,
+            'max_longitud': 50,
+        },
+        # Estrategia 3: nombre de empresa cerca del CIF
+        {
+            'nombre': 'cerca del CIF',
+            'ancla': r'CIF[:\s]+([A-Z0-9]+)',
+            'requiere': ['cif'],
+            'ignorar_mayusculas': True,
+            'ventana': 200,
+            'patrones': PATRONES_EMPRESA,
+            'max_longitud': 50,
+        },
+    ],
+    
+    'numero': [
+        _numero('Nº FACTURA FECHA FACTURA A 20250965', r'N[º°úu]?\s*FACTURA\s+FECHA\s+FACTURA\s+([A-Z]\s*\d+)', ['factura']),
+        _numero('Nº FACTURA A 20250965', r'N[º°úu]?\s*FACTURA[:\s]+([A-Z]\s*\d+)', ['factura']),
+        _numero('Número de Factura: FAC-2024-12345', r'N[úu]mero de Factura[:\s]+([A-Z0-9\-/]+)(?:\s|$)', ['factura']),
+        _numero('Factura nº', r'Factura [nN][º°u][:\s]+([A-Z0-9\-/_]+)', ['factura']),
+        _numero('Invoice Number', r'Invoice Number[:\s]+([A-Z0-9\-/]+)', ['invoice number']),
+        _numero('Nº Factura', r'N[º°] Factura[:\s]+([A-Z0-9\-/]+)', ['factura']),
+        _numero("Plazo n'1 fra. 2500612", r'fra\.\s*(\d{6,})', ['fra.']),
+        _numero('511890/25', r'(\d{6}/\d{2})'),
+        _numero('Fact FAA20250965', r'Fact[ura]*\s+([A-Z]?\d{6,})', ['fact']),
+    ],
+}
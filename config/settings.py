@@ -1,10 +1,22 @@
 """
 Configuración del proyecto Renombrar Facturas
+
+Importar este módulo solo lee variables de entorno (y el .env si existe):
+no crea carpetas ni accede al NAS. La validación la hacen los puntos de
+entrada al arrancar con check_config().
 """
 
 import os
 from pathlib import Path
 
+# Rutas base del proyecto
+BASE_DIR = Path(__file__).parent.parent
+
+# Variables del .env (las del entorno tienen prioridad)
+if (BASE_DIR / ".env").exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / ".env")
+
 # ============================================
 # CONFIGURACIÓN DE ENTORNOS
 # ============================================
@@ -12,9 +24,6 @@ from pathlib import Path
 # Detectar entorno
 ENVIRONMENT = os.getenv("ENV", "development")  # development | testing | production
 
-# Rutas base del proyecto
-BASE_DIR = Path(__file__).parent.parent
-
 # ============================================
 # ENTORNO DE DESARROLLO (Local)
 # ============================================
@@ -26,8 +35,6 @@ if ENVIRONMENT == "development":
     
     # Modo seguro: NO renombra, solo simula
     DRY_RUN = True
-    
-    print("[DESARROLLO] Usando facturas de muestra locales")
 
 # ============================================
 # ENTORNO DE TESTING (NAS Test)
@@ -40,8 +47,6 @@ elif ENVIRONMENT == "testing":
     
     # Modo seguro: NO renombra, solo simula
     DRY_RUN = True
-    
-    print("[TESTING] Usando NAS de pruebas (DRY RUN)")
 
 # ============================================
 # ENTORNO DE PRODUCCIÓN (NAS Real)
@@ -54,12 +59,6 @@ elif ENVIRONMENT == "production":
     
     # ADVERTENCIA: Solo activar cuando esté 100% probado
     DRY_RUN = os.getenv("ALLOW_PRODUCTION", "false").lower() == "true"
-    
-    if not DRY_RUN:
-        print("[PRODUCCION] MODO ACTIVO - RENOMBRARA ARCHIVOS REALES!")
-        print("   Para activar, exporta: $env:ALLOW_PRODUCTION='true'")
-    else:
-        print("[PRODUCCION] Modo DRY RUN - Solo vista previa")
 
 # ============================================
 # CONFIGURACIÓN GENERAL
@@ -73,10 +72,66 @@ FILENAME_TEMPLATE = "{fecha}{sep}{proveedor}{sep}{numero}.pdf"
 # Tesseract OCR
 TESSERACT_PATH = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 TESSERACT_LANG = "spa"
+OCR_DPI = 300  # Resolución de renderizado de páginas PDF para OCR (la alta, con OCR adaptativo)
+OCR_ADAPTATIVO = os.getenv("OCR_ADAPTATIVO", "true").lower() == "true"  # Primera pasada a OCR_DPI_RAPIDO; a OCR_DPI solo si hace falta
+OCR_DPI_RAPIDO = int(os.getenv("OCR_DPI_RAPIDO", "200"))  # Resolución de la primera pasada
+OCR_CONFIANZA_MINIMA = int(os.getenv("OCR_CONFIANZA_MINIMA", "70"))  # Confianza media de Tesseract (0-100) para no repetir a OCR_DPI
+OCR_GRIS = True  # Renderizar en escala de grises (1 byte/píxel, sin copias hasta Tesseract)
+OCR_CABECERA = True  # OCR de logos: solo banda superior + imágenes de la página 1 (False = página entera)
+OCR_BANDA_CABECERA = 0.2  # Alto de la banda superior (fracción de la página)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))  # Hilos de OCR por proceso (0 = núcleos / MAX_WORKERS)
+OCR_PARADA_TEMPRANA = True  # PDF escaneados: dejar de hacer OCR cuando ya están fecha, proveedor y número
+# Motor de OCR: "tesserocr" (Tesseract cargado en el proceso), "pytesseract" (un proceso por imagen) o "auto"
+OCR_MOTOR = os.getenv("OCR_MOTOR", "auto").lower()
+
+# Facturas en imagen (fotos y TIFF): preprocesado antes del OCR (src/imagenes.py)
+IMAGEN_PREPROCESAR = os.getenv("IMAGEN_PREPROCESAR", "true").lower() == "true"  # Reducir, enderezar y binarizar
+IMAGEN_MAX_LADO = int(os.getenv("IMAGEN_MAX_LADO", "3500"))  # Lado mayor (px) al que se reducen las fotos (~300 DPI en A4)
+IMAGEN_ENDEREZAR_MAX = float(os.getenv("IMAGEN_ENDEREZAR_MAX", "5"))  # Inclinación máxima que se corrige (grados, 0 = no enderezar)
+
+# Clasificación previa de los PDF (digital/escaneado) para ejecutar solo las etapas que necesitan
+CLASIFICAR_PDF = os.getenv("CLASIFICAR_PDF", "true").lower() == "true"
+
+# Texto nativo de PDF: "pymupdf" (rápido) o "pdfplumber" (más lento, para maquetaciones difíciles)
+TEXTO_MOTOR = os.getenv("TEXTO_MOTOR", "pymupdf").lower()
+TEXTO_PARADA_TEMPRANA = True  # Dejar de leer páginas cuando ya están fecha, proveedor y número
+TEXTO_MAX_PAGINAS = int(os.getenv("TEXTO_MAX_PAGINAS", "3"))  # Páginas de texto nativo como máximo (0 = todas)
 
 # Procesamiento
-MAX_WORKERS = 4
-PROCESSING_TIMEOUT = 120  # segundos
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "4"))  # 1 = secuencial
+PROCESSING_TIMEOUT = int(os.getenv("PROCESSING_TIMEOUT", "120"))  # segundos por factura
+
+# Modo servicio (renombrar.py --vigilar)
+VIGILAR_INTERVALO = float(os.getenv("VIGILAR_INTERVALO", "10"))  # segundos entre escaneos de INPUT_FOLDER
+VIGILAR_ESTABILIDAD = float(os.getenv("VIGILAR_ESTABILIDAD", "5"))  # segundos sin cambios de tamaño/mtime (copia terminada)
+VIGILAR_COLA_MAX = 100  # facturas en cola como máximo (el resto espera en la carpeta)
+
+# Azure Document Intelligence
+AZURE_POOL_CONEXIONES = 10  # Conexiones HTTP reutilizables por proceso
+AZURE_TIMEOUT = 60  # segundos (conexión y lectura)
+AZURE_POLLING_INTERVALO = 1  # segundos entre consultas si Azure no indica Retry-After
+AZURE_CONCURRENCIA = int(os.getenv("AZURE_CONCURRENCIA", "8"))  # análisis simultáneos en lote (1 = uno a uno)
+AZURE_TASA = float(os.getenv("AZURE_TASA", "15"))  # peticiones/s (límite por defecto del tier S0)
+AZURE_SOLO_ESCANEADOS = os.getenv("AZURE_SOLO_ESCANEADOS", "false").lower() == "true"  # PDF digitales solo con texto nativo
+
+# Caché de extracción (texto nativo, OCR e info parseada por hash de archivo)
+CACHE_ACTIVA = os.getenv("CACHE_ACTIVA", "true").lower() == "true"
+CACHE_FOLDER = BASE_DIR / "data" / "cache"
+CACHE_MAX_MB = 500
+CACHE_MAX_DIAS = 90
+
+# Registro de facturas procesadas (solo se procesan las nuevas o modificadas)
+REGISTRO_ACTIVO = os.getenv("REGISTRO_ACTIVO", "true").lower() == "true"
+REGISTRO_DB = BASE_DIR / "data" / "procesadas.db"  # en disco local (SQLite no es fiable sobre SMB)
+
+# Movimiento a OUTPUT_FOLDER / ERROR_FOLDER
+JOURNAL_FOLDER = BASE_DIR / "data" / "journal"  # diarios de los lotes de movimientos (en disco local)
+MOVER_LOTE = 200  # movimientos por lote (cada carpeta de destino se lista una vez por lote)
+
+# Métricas de rendimiento (histogramas por etapa y contadores)
+METRICAS_ACTIVAS = os.getenv("METRICAS_ACTIVAS", "true").lower() == "true"
+METRICAS_ARCHIVO = Path(os.getenv("METRICAS_ARCHIVO", str(LOG_FOLDER / "metricas.prom")))  # .prom (textfile de Prometheus) o .json
+METRICAS_INTERVALO = 60  # segundos entre escrituras en modo servicio
 
 # Logging
 LOG_LEVEL = "INFO"
@@ -84,7 +139,8 @@ LOG_ROTATION = "100 MB"
 LOG_RETENTION = "30 days"
 
 # Extensiones permitidas
-ALLOWED_EXTENSIONS = [".pdf", ".jpg", ".jpeg", ".png"]
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".tif", ".tiff"]
+ALLOWED_EXTENSIONS = [".pdf"] + IMAGE_EXTENSIONS
 
 # ============================================
 # VALIDACIONES
@@ -95,6 +151,17 @@ def validate_config():
     
     errors = []
     
+    if ENVIRONMENT == "development":
+        print("[DESARROLLO] Usando facturas de muestra locales")
+    elif ENVIRONMENT == "testing":
+        print("[TESTING] Usando NAS de pruebas (DRY RUN)")
+    elif ENVIRONMENT == "production":
+        if not DRY_RUN:
+            print("[PRODUCCION] MODO ACTIVO - RENOMBRARA ARCHIVOS REALES!")
+            print("   Para activar, exporta: $env:ALLOW_PRODUCTION='true'")
+        else:
+            print("[PRODUCCION] Modo DRY RUN - Solo vista previa")
+    
     # Verificar carpetas en desarrollo
     if ENVIRONMENT == "development":
         if not INPUT_FOLDER.exists():
@@ -142,10 +209,26 @@ def is_safe_to_run():
     return True
 
 
-# Validar al importar
-if __name__ != "__main__":
+_config_validada = False
+
+
+def check_config():
+    """
+    Valida la configuración una vez por proceso. La llaman los puntos de
+    entrada al arrancar (no el import, para que importar settings en un
+    worker o un script no toque el NAS).
+    
+    Raises:
+        Exception: Si la configuración no es válida
+    """
+    global _config_validada
+    
+    if _config_validada:
+        return
+    
     errors = validate_config()
     if errors:
         print("\n".join(errors))
         raise Exception("Configuración inválida")
+    _config_validada = True
 
@@ -1,99 +1,215 @@
 """
 Genera un CSV con la comparación entre nombres originales y generados
+
+Las facturas se procesan en paralelo (PoolFacturas, con timeout por
+factura) y reutilizan la caché de extracción; cada fila se escribe en el
+CSV en cuanto termina su factura. Las columnas t_*_ms llevan el tiempo de
+cada etapa (texto nativo, OCR, parseo y Azure), así que el reporte sirve
+también como benchmark de rendimiento.
+
+Uso:
+    python generar_reporte.py --workers 4 --sin-cache
 """
+import os
 import sys
 import csv
+import time
+import argparse
 from pathlib import Path
 from datetime import datetime
+from collections import Counter
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from Renombrar_facturas.renombrar import extraer_texto, parsear_factura, generar_nuevo_nombre
+from Renombrar_facturas.renombrar import extraer_y_parsear, generar_nuevo_nombre, finalizar_worker
+from src.azure_extractor import sesion_azure
+from src.tiempos import ETAPAS, iniciar_medicion, terminar_medicion
+
+CAMPOS = ['nombre_original', 'nombre_generado', 'fecha_detectada',
+          'proveedor_detectado', 'numero_detectado', 'etapa', 'estado',
+          'cache'] + [f't_{etapa}_ms' for etapa in ETAPAS] + ['t_total_ms']
+
+
+def configurar_worker():
+    """Workers del reporte: solo avisos y errores en consola."""
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+
+def analizar_factura(factura_path):
+    """
+    Extrae y parsea una factura y devuelve su fila del reporte.
+    
+    Args:
+        factura_path (Path): Ruta a la factura
+        
+    Returns:
+        dict: Fila del CSV (campos de CAMPOS)
+    """
+    
+    resultado = dict.fromkeys(CAMPOS, '')
+    resultado['nombre_original'] = factura_path.name
+    
+    iniciar_medicion()
+    inicio = time.perf_counter()
+    try:
+        # Extraer y parsear (pipeline por etapas)
+        info = extraer_y_parsear(factura_path)
+        
+        if not info:
+            resultado['estado'] = 'ERROR: No se pudo extraer información'
+        else:
+            resultado['nombre_generado'] = generar_nuevo_nombre(info)
+            resultado['fecha_detectada'] = info.get('fecha', '')
+            resultado['proveedor_detectado'] = info.get('proveedor', '')
+            resultado['numero_detectado'] = info.get('numero', '')
+            resultado['etapa'] = info.get('etapa', '')
+            resultado['estado'] = 'OK'
+    except Exception as e:
+        resultado['estado'] = f'ERROR: {str(e)}'
+    finally:
+        total = time.perf_counter() - inicio
+        medicion = terminar_medicion()
+    
+    resultado['cache'] = 'si' if medicion['cache'] else 'no'
+    for etapa, segundos in medicion['tiempos'].items():
+        resultado[f't_{etapa}_ms'] = round(segundos * 1000, 1)
+    resultado['t_total_ms'] = round(total * 1000, 1)
+    return resultado
+
 
-def generar_reporte_csv():
-    """Genera CSV con comparación de todas las facturas."""
+def analizar_facturas(facturas, workers, timeout):
+    """
+    Genera las filas del reporte según van terminando las facturas.
+    
+    Args:
+        facturas (list): Rutas Path de las facturas
+        workers (int): Procesos (1 = en este proceso)
+        timeout (int): Segundos máximos por factura
+        
+    Yields:
+        dict: Fila del CSV
+    """
+    
+    if workers <= 1:
+        configurar_worker()
+        # Una sola sesión de Azure (conexiones reutilizadas) para todas las muestras
+        with sesion_azure():
+            for factura_path in facturas:
+                yield analizar_factura(factura_path)
+        return
+    
+    from src.paralelo import PoolFacturas
     
-    facturas = sorted(Path("data/samples").glob("*.pdf"))
+    with PoolFacturas(analizar_factura, workers, timeout=timeout,
+                      inicializador=configurar_worker, finalizador=finalizar_worker) as pool:
+        for factura_path, estado, valor in pool.procesar(facturas):
+            if estado == "ok":
+                yield valor
+                continue
+            resultado = dict.fromkeys(CAMPOS, '')
+            resultado['nombre_original'] = factura_path.name
+            resultado['estado'] = f'TIMEOUT ({valor}s)' if estado == "timeout" else f'ERROR: {valor}'
+            yield resultado
+
+
+def generar_reporte_csv(carpeta="data/samples", workers=None, usar_cache=True, abrir=True):
+    """
+    Genera CSV con comparación de todas las facturas.
+    
+    Args:
+        carpeta (str): Carpeta con las facturas
+        workers (int, optional): Procesos (por defecto MAX_WORKERS)
+        usar_cache (bool): False para extraer todo de nuevo (benchmark en frío)
+        abrir (bool): Abrir el CSV al terminar (solo Windows)
+        
+    Returns:
+        str: Nombre del CSV generado
+    """
+    
+    from config import settings
+    
+    settings.check_config()
+    
+    if not usar_cache:
+        # El entorno llega también a los workers arrancados con spawn (Windows)
+        os.environ["CACHE_ACTIVA"] = "false"
+        settings.CACHE_ACTIVA = False
+    
+    workers = settings.MAX_WORKERS if workers is None else workers
+    facturas = sorted(Path(carpeta).glob("*.pdf"))
+    workers = max(1, min(workers, len(facturas)))
     
     # Nombre del archivo CSV
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     csv_file = f"reporte_validacion_{timestamp}.csv"
     
-    print(f"\nProcesando {len(facturas)} facturas...")
+    print(f"\nProcesando {len(facturas)} facturas con {workers} workers...")
     print(f"Generando: {csv_file}\n")
     
-    resultados = []
+    estados = Counter()
+    tiempos = Counter()
+    inicio = time.perf_counter()
     
-    for i, factura_path in enumerate(facturas, 1):
-        print(f"[{i}/{len(facturas)}] {factura_path.name}...", end=" ")
-        
-        resultado = {
-            'nombre_original': factura_path.name,
-            'nombre_generado': '',
-            'fecha_detectada': '',
-            'proveedor_detectado': '',
-            'numero_detectado': '',
-            'estado': ''
-        }
-        
-        try:
-            # Extraer y parsear
-            texto = extraer_texto(factura_path)
-            
-            if not texto:
-                resultado['estado'] = 'ERROR: No se pudo extraer texto'
-                print("ERROR (sin texto)")
-            else:
-                info = parsear_factura(texto, factura_path.name, ruta_pdf=factura_path)
-                
-                if not info:
-                    resultado['estado'] = 'ERROR: No se pudo parsear'
-                    print("ERROR (parseo)")
-                else:
-                    # Generar nombre
-                    nombre_gen = generar_nuevo_nombre(info)
-                    
-                    resultado['nombre_generado'] = nombre_gen
-                    resultado['fecha_detectada'] = info.get('fecha', '')
-                    resultado['proveedor_detectado'] = info.get('proveedor', '')
-                    resultado['numero_detectado'] = info.get('numero', '')
-                    resultado['estado'] = 'OK'
-                    print("OK")
-                    
-        except Exception as e:
-            resultado['estado'] = f'ERROR: {str(e)}'
-            print(f"EXCEPCION")
-        
-        resultados.append(resultado)
-    
-    # Escribir CSV
+    # Cada fila se escribe en cuanto termina su factura
     with open(csv_file, 'w', newline='', encoding='utf-8-sig') as f:
-        fieldnames = ['nombre_original', 'nombre_generado', 'fecha_detectada', 
-                     'proveedor_detectado', 'numero_detectado', 'estado']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        
+        writer = csv.DictWriter(f, fieldnames=CAMPOS)
         writer.writeheader()
-        writer.writerows(resultados)
+        
+        for i, resultado in enumerate(analizar_facturas(facturas, workers, settings.PROCESSING_TIMEOUT), 1):
+            writer.writerow(resultado)
+            f.flush()
+            
+            estados['OK' if resultado['estado'] == 'OK' else 'ERROR'] += 1
+            estados['cache'] += resultado['cache'] == 'si'
+            for campo in CAMPOS:
+                if campo.startswith('t_') and resultado[campo] != '':
+                    tiempos[campo] += resultado[campo]
+            
+            etapa = f" ({resultado['etapa']})" if resultado['etapa'] else ""
+            print(f"[{i}/{len(facturas)}] {resultado['nombre_original']}... "
+                  f"{resultado['estado'].split(':')[0]}{etapa} {resultado['t_total_ms']} ms")
     
+    duracion = time.perf_counter() - inicio
     print(f"\n[OK] CSV generado: {csv_file}")
     
+    # Mantener la caché de extracción dentro de sus límites
+    from src.cache import obtener_cache
+    cache = obtener_cache()
+    if cache:
+        cache.limpiar()
+    
     # Estadísticas
-    total = len(resultados)
-    exitosas = sum(1 for r in resultados if r['estado'] == 'OK')
-    errores = total - exitosas
+    total = max(1, len(facturas))
+    exitosas = estados['OK']
+    errores = estados['ERROR']
     
     print(f"\nESTADISTICAS:")
-    print(f"  Total:     {total}")
+    print(f"  Total:     {len(facturas)}")
     print(f"  Exitosas:  {exitosas} ({exitosas/total*100:.1f}%)")
     print(f"  Errores:   {errores} ({errores/total*100:.1f}%)")
+    print(f"  De caché:  {estados['cache']}")
+    
+    print(f"\nRENDIMIENTO:")
+    print(f"  Duración:  {duracion:.2f}s ({len(facturas)/duracion:.1f} facturas/s con {workers} workers)")
+    for etapa in ETAPAS:
+        print(f"  {etapa:<10} {tiempos[f't_{etapa}_ms']/total:8.1f} ms/factura")
+    print(f"  {'total':<10} {tiempos['t_total_ms']/total:8.1f} ms/factura")
     
-    # Abrir CSV
-    import os
-    os.startfile(csv_file)
+    # Abrir CSV (os.startfile solo existe en Windows)
+    if abrir and hasattr(os, "startfile"):
+        os.startfile(csv_file)
     
     return csv_file
 
 
 if __name__ == "__main__":
-    generar_reporte_csv()
-
+    parser = argparse.ArgumentParser(description="Reporte de validación de nombres generados")
+    parser.add_argument("--carpeta", default="data/samples", help="Carpeta con las facturas")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto MAX_WORKERS)")
+    parser.add_argument("--sin-cache", action="store_true", help="No reutilizar la caché de extracción")
+    parser.add_argument("--no-abrir", action="store_true", help="No abrir el CSV al terminar")
+    args = parser.parse_args()
+    
+    generar_reporte_csv(args.carpeta, args.workers, usar_cache=not args.sin_cache, abrir=not args.no_abrir)
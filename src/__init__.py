@@ -0,0 +1 @@
+"""Módulos de extracción, procesamiento y soporte del renombrado de facturas"""
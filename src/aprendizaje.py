@@ -1,20 +1,38 @@
 """
 Sistema de aprendizaje incremental para proveedores
 Guarda y reutiliza información validada por el usuario
+
+La base de conocimiento se carga una sola vez por proceso y solo se vuelve a
+leer si el archivo cambia (mtime/tamaño). Las escrituras se acumulan y se
+guardan por lotes, de forma atómica y con un bloqueo entre procesos para que
+varios workers no se pisen los cambios.
 """
 
+import os
+import re
 import json
+import time
+import atexit
+import threading
 from pathlib import Path
 from datetime import datetime
 
 PROVEEDORES_FILE = Path(__file__).parent.parent / "config" / "proveedores.json"
 
+# Número de cambios pendientes que fuerzan una escritura
+LOTE_ESCRITURA = 20
 
-def cargar_proveedores():
-    """Carga el archivo de proveedores aprendidos."""
-    if PROVEEDORES_FILE.exists():
-        with open(PROVEEDORES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+# Como mucho una comprobación de cambios en el archivo cada este tiempo: en un
+# NAS cada stat es un viaje de ida y vuelta y una factura consulta la base
+# decenas de veces (una por regla y por página)
+INTERVALO_COMPROBACION = 1.0  # segundos
+
+# Bloqueo entre procesos (se considera abandonado pasado este tiempo)
+BLOQUEO_TIMEOUT = 10  # segundos
+BLOQUEO_CADUCIDAD = 60  # segundos
+
+
+def _estructura_vacia():
     return {
         "proveedores_por_cif": {},
         "proveedores_por_patron": {},
@@ -22,10 +40,239 @@ def cargar_proveedores():
     }
 
 
-def guardar_proveedores(data):
-    """Guarda el archivo de proveedores."""
-    with open(PROVEEDORES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def limpiar_cif(cif):
+    """Normaliza un CIF (sin guiones, puntos ni espacios, en mayúsculas)."""
+    return cif.replace('-', '').replace('.', '').replace(' ', '').upper()
+
+
+def cargar_proveedores(archivo=None):
+    """Carga el archivo de proveedores aprendidos."""
+    archivo = archivo or PROVEEDORES_FILE
+    if archivo.exists():
+        with open(archivo, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return _estructura_vacia()
+
+
+def guardar_proveedores(data, archivo=None):
+    """Guarda el archivo de proveedores de forma atómica (archivo temporal + rename)."""
+    import tempfile
+    
+    archivo = archivo or PROVEEDORES_FILE
+    fd, tmp = tempfile.mkstemp(dir=archivo.parent, prefix=".proveedores_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, archivo)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class _BloqueoArchivo:
+    """Bloqueo exclusivo entre procesos basado en un archivo .lock."""
+    
+    def __init__(self, ruta):
+        self.ruta = Path(str(ruta) + ".lock")
+    
+    def __enter__(self):
+        limite = time.monotonic() + BLOQUEO_TIMEOUT
+        while True:
+            try:
+                fd = os.open(self.ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                # Bloqueo abandonado por un proceso que murió
+                try:
+                    if time.time() - self.ruta.stat().st_mtime > BLOQUEO_CADUCIDAD:
+                        self.ruta.unlink(missing_ok=True)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > limite:
+                    raise TimeoutError(f"No se pudo bloquear {self.ruta}")
+                time.sleep(0.05)
+    
+    def __exit__(self, *exc):
+        self.ruta.unlink(missing_ok=True)
+        return False
+
+
+class CorrectorOCR:
+    """
+    Aplica todas las correcciones de OCR en una sola pasada sobre el texto.
+    
+    Usa una única expresión regular con las claves ordenadas de mayor a menor
+    longitud, de modo que en cada posición gana la coincidencia más larga
+    (leftmost-longest) y un reemplazo nunca se vuelve a corregir.
+    
+    Args:
+        correcciones (dict): Diccionario error → corrección
+    """
+    
+    def __init__(self, correcciones):
+        self._reemplazos = {error: correccion for error, correccion in correcciones.items() if error}
+        errores = sorted(self._reemplazos, key=len, reverse=True)
+        self._patron = re.compile('|'.join(map(re.escape, errores))) if errores else None
+    
+    def corregir(self, texto):
+        if self._patron is None:
+            return texto
+        return self._patron.sub(lambda m: self._reemplazos[m.group(0)], texto)
+
+
+class BaseConocimiento:
+    """
+    Base de conocimiento de proveedores en memoria.
+    
+    Args:
+        archivo (Path): Archivo JSON de proveedores
+    """
+    
+    def __init__(self, archivo=None):
+        self.archivo = Path(archivo) if archivo else PROVEEDORES_FILE
+        self._data = _estructura_vacia()
+        self._firma = None
+        self._indice_cif = {}
+        self._pendientes = []
+        self._corrector = None
+        self._version_corrector = None
+        self._proxima_comprobacion = 0.0
+        self._lock = threading.RLock()
+    
+    def _firma_archivo(self):
+        try:
+            stat = self.archivo.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _cargar(self, data, firma):
+        for seccion, valores in _estructura_vacia().items():
+            data.setdefault(seccion, valores)
+        self._data = data
+        self._firma = firma
+        self._indice_cif = {
+            limpiar_cif(cif): entrada
+            for cif, entrada in data['proveedores_por_cif'].items()
+        }
+        # Mantener visibles los cambios aún no guardados
+        for seccion, clave, valor in self._pendientes:
+            self._aplicar(seccion, clave, valor)
+    
+    def _aplicar(self, seccion, clave, valor):
+        self._data[seccion][clave] = valor
+        if seccion == 'proveedores_por_cif':
+            self._indice_cif[limpiar_cif(clave)] = valor
+    
+    def _actualizar(self):
+        """
+        Recarga el archivo solo si cambió desde la última lectura, comprobándolo
+        como mucho una vez cada INTERVALO_COMPROBACION segundos.
+        """
+        ahora = time.monotonic()
+        if ahora < self._proxima_comprobacion:
+            return
+        self._proxima_comprobacion = ahora + INTERVALO_COMPROBACION
+        firma = self._firma_archivo()
+        if firma != self._firma:
+            self._cargar(cargar_proveedores(self.archivo), firma)
+    
+    @property
+    def version(self):
+        """Versión de la base (cambia con cada modificación guardada o pendiente)."""
+        with self._lock:
+            self._actualizar()
+            firma = self._firma or (0, 0)
+            return f"{firma[0]}-{firma[1]}-{len(self._pendientes)}"
+    
+    @property
+    def datos(self):
+        with self._lock:
+            self._actualizar()
+            return self._data
+    
+    def buscar_cif(self, cif):
+        """Devuelve la entrada del proveedor para un CIF o None."""
+        with self._lock:
+            self._actualizar()
+            return self._indice_cif.get(limpiar_cif(cif))
+    
+    def correcciones_ocr(self):
+        """Diccionario error → corrección."""
+        return self.datos.get('correcciones_ocr', {})
+    
+    def corrector_ocr(self):
+        """Corrector compilado (se reconstruye solo cuando cambia la base)."""
+        with self._lock:
+            version = self.version
+            if self._version_corrector != version:
+                self._corrector = CorrectorOCR(self.correcciones_ocr())
+                self._version_corrector = version
+            return self._corrector
+    
+    def registrar(self, seccion, clave, valor):
+        """
+        Registra un cambio. Se aplica en memoria al momento y se escribe en
+        disco cuando se acumulan LOTE_ESCRITURA cambios (o al llamar a guardar).
+        """
+        with self._lock:
+            self._actualizar()
+            self._pendientes.append((seccion, clave, valor))
+            self._aplicar(seccion, clave, valor)
+            if len(self._pendientes) >= LOTE_ESCRITURA:
+                self.guardar()
+    
+    def guardar(self):
+        """
+        Escribe los cambios pendientes. Relee el archivo bajo bloqueo y aplica
+        encima solo los cambios propios, para no perder los de otros procesos.
+        """
+        with self._lock:
+            if not self._pendientes:
+                return
+            with _BloqueoArchivo(self.archivo):
+                data = cargar_proveedores(self.archivo)
+                for seccion, clave, valor in self._pendientes:
+                    data.setdefault(seccion, {})[clave] = valor
+                guardar_proveedores(data, self.archivo)
+                self._pendientes = []
+                self._cargar(data, self._firma_archivo())
+
+
+_base = None
+
+
+def obtener_base():
+    """
+    Devuelve la base de conocimiento del proceso (se crea la primera vez).
+    
+    Returns:
+        BaseConocimiento: Base de conocimiento compartida
+    """
+    global _base
+    if _base is None:
+        _base = BaseConocimiento()
+        atexit.register(guardar_pendientes)
+    return _base
+
+
+def guardar_pendientes():
+    """Escribe en disco los aprendizajes pendientes del proceso."""
+    if _base is not None:
+        _base.guardar()
+
+
+def version_proveedores():
+    """
+    Identificador de la versión actual de la base de proveedores.
+    Cambia cada vez que se modifica (sirve para invalidar cachés).
+    
+    Returns:
+        str: Versión
+    """
+    return obtener_base().version
 
 
 def buscar_proveedor_por_cif(cif):
@@ -38,13 +285,10 @@ def buscar_proveedor_por_cif(cif):
     Returns:
         str: Nombre del proveedor o None
     """
-    data = cargar_proveedores()
-    
-    # Limpiar CIF (remover guiones, puntos)
-    cif_limpio = cif.replace('-', '').replace('.', '').upper()
+    entrada = obtener_base().buscar_cif(cif)
     
-    if cif_limpio in data['proveedores_por_cif']:
-        return data['proveedores_por_cif'][cif_limpio].get('alias') or data['proveedores_por_cif'][cif_limpio]['nombre']
+    if entrada:
+        return entrada.get('alias') or entrada['nombre']
     
     return None
 
@@ -58,24 +302,21 @@ def aprender_proveedor(cif, nombre, nombre_archivo):
         nombre (str): Nombre correcto del proveedor
         nombre_archivo (str): Archivo de donde se aprendió
     """
-    data = cargar_proveedores()
-    
     # Limpiar CIF
-    cif_limpio = cif.replace('-', '').replace('.', '').upper()
+    cif_limpio = limpiar_cif(cif)
     
     # Crear alias (nombre simplificado para archivos)
     alias = nombre.upper().replace(',', '').replace('.', '')
     alias = alias.replace('S.A.U.', '').replace('S.L.U.', '').replace('S.A.', '').replace('S.L.', '')
     alias = alias.strip().replace(' ', '_')[:30]  # Máximo 30 caracteres
     
-    data['proveedores_por_cif'][cif_limpio] = {
+    obtener_base().registrar('proveedores_por_cif', cif_limpio, {
         "nombre": nombre,
         "alias": alias,
         "aprendido_de": nombre_archivo,
         "fecha_aprendizaje": datetime.now().strftime("%Y-%m-%d")
-    }
+    })
     
-    guardar_proveedores(data)
     print(f"[APRENDIDO] CIF {cif} → {alias}")
 
 
@@ -89,20 +330,10 @@ def corregir_ocr(texto):
     Returns:
         str: Texto corregido
     """
-    data = cargar_proveedores()
-    
-    texto_corregido = texto
-    for error, correcion in data.get('correcciones_ocr', {}).items():
-        texto_corregido = texto_corregido.replace(error, correcion)
-    
-    return texto_corregido
+    return obtener_base().corrector_ocr().corregir(texto)
 
 
 def agregar_correccion_ocr(error, correccion):
     """Agrega una nueva corrección de OCR."""
-    data = cargar_proveedores()
-    data['correcciones_ocr'][error] = correccion
-    guardar_proveedores(data)
+    obtener_base().registrar('correcciones_ocr', error, correccion)
     print(f"[APRENDIDO] Corrección OCR: {error} → {correccion}")
-
-
@@ -0,0 +1,220 @@
+"""
+Análisis concurrente de facturas con Azure Document Intelligence (asyncio)
+
+extraer_con_azure analiza un documento cada vez y pasa casi todo el tiempo
+esperando a la red (subida y polling del resultado). Aquí se mantienen varios
+análisis en curso a la vez con el cliente asíncrono del SDK.
+
+Todas las peticiones (análisis, consultas de resultado y reintentos) pasan
+por un mismo limitador de tasa (token bucket). Si Azure responde 429, el
+limitador se detiene durante el Retry-After indicado para todas las
+peticiones, no solo para la que recibió el error; el reintento en sí lo hace
+la política de reintentos del SDK.
+
+Requiere aiohttp (transporte asíncrono de azure-core).
+"""
+
+import os
+import time
+import asyncio
+from pathlib import Path
+
+from loguru import logger
+from azure.core.pipeline.transport import AsyncHttpTransport
+
+from src.azure_extractor import interpretar_resultado
+
+
+def segundos_reintento(cabeceras, por_defecto=1.0):
+    """
+    Tiempo de espera indicado por Azure en una respuesta 429.
+    
+    Args:
+        cabeceras (Mapping): Cabeceras de la respuesta
+        por_defecto (float): Espera si no viene ninguna cabecera válida
+        
+    Returns:
+        float: Segundos
+    """
+    for nombre, escala in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("Retry-After", 1)):
+        valor = cabeceras.get(nombre)
+        if valor is None:
+            continue
+        try:
+            return max(0.0, float(valor) * escala)
+        except ValueError:
+            continue  # Retry-After en formato fecha HTTP: usar el valor por defecto
+    return por_defecto
+
+
+class LimitadorTasa:
+    """
+    Token bucket compartido por las corrutinas de un lote.
+    
+    Args:
+        tasa (float): Peticiones por segundo
+        capacidad (int): Ráfaga máxima. Con 1 (por defecto) las peticiones salen
+            espaciadas 1/tasa y nunca se superan tasa+1 en un mismo segundo
+    """
+    
+    def __init__(self, tasa, capacidad=1):
+        self.tasa = float(tasa)
+        self.capacidad = float(max(1, capacidad))
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = asyncio.Lock()
+        self.limitadas = 0
+    
+    def _reponer(self, ahora):
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+    
+    async def adquirir(self):
+        """Espera hasta que haya un token libre (en orden de llegada)."""
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                if ahora < self._pausa_hasta:
+                    await asyncio.sleep(self._pausa_hasta - ahora)
+                    continue
+                
+                self._reponer(ahora)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.tasa)
+    
+    def pausar(self, segundos):
+        """Detiene todas las peticiones durante 'segundos' (respuesta 429)."""
+        self.limitadas += 1
+        self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+        # Tras la pausa se arranca sin ráfaga acumulada
+        self._tokens = 0
+        self._ultimo = self._pausa_hasta
+
+
+class TransporteLimitado(AsyncHttpTransport):
+    """
+    Transporte HTTP que pasa cada petición por el limitador antes de enviarla.
+    Está por debajo de la política de reintentos del SDK, así que también
+    limita los reintentos y ve todas las respuestas 429.
+    
+    Args:
+        transporte (AsyncHttpTransport): Transporte real (aiohttp)
+        limitador (LimitadorTasa): Limitador compartido del lote
+    """
+    
+    def __init__(self, transporte, limitador):
+        self._transporte = transporte
+        self._limitador = limitador
+    
+    async def __aenter__(self):
+        await self._transporte.__aenter__()
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self._transporte.__aexit__(*exc)
+    
+    async def open(self):
+        await self._transporte.open()
+    
+    async def close(self):
+        await self._transporte.close()
+    
+    async def send(self, request, **kwargs):
+        await self._limitador.adquirir()
+        respuesta = await self._transporte.send(request, **kwargs)
+        
+        if respuesta.status_code == 429:
+            espera = segundos_reintento(respuesta.headers)
+            logger.warning(f"   ⏳ Azure limitó la tasa (429) - pausa de {espera:.1f}s")
+            self._limitador.pausar(espera)
+        
+        return respuesta
+
+
+def _crear_cliente_async(limitador):
+    """Cliente asíncrono cuyo transporte pasa por el limitador."""
+    
+    from azure.ai.formrecognizer.aio import DocumentAnalysisClient
+    from azure.core.credentials import AzureKeyCredential
+    from azure.core.pipeline.transport import AioHttpTransport
+    from config.settings import AZURE_TIMEOUT, AZURE_POLLING_INTERVALO
+    
+    transporte = AioHttpTransport(connection_timeout=AZURE_TIMEOUT, read_timeout=AZURE_TIMEOUT)
+    
+    return DocumentAnalysisClient(
+        endpoint=os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT"),
+        credential=AzureKeyCredential(os.getenv("AZURE_FORM_RECOGNIZER_KEY")),
+        transport=TransporteLimitado(transporte, limitador),
+        polling_interval=AZURE_POLLING_INTERVALO
+    )
+
+
+async def _analizar(cliente, ruta, semaforo):
+    """Analiza una factura (como máximo 'concurrencia' a la vez)."""
+    async with semaforo:
+        try:
+            documento = await asyncio.to_thread(Path(ruta).read_bytes)
+            poller = await cliente.begin_analyze_document("prebuilt-invoice", document=documento)
+            resultado = await poller.result()
+        except Exception as e:
+            logger.error(f"   ❌ Error en Azure Document Intelligence ({Path(ruta).name}): {e}")
+            return None
+    
+    logger.debug(f"   🔷 Azure: {Path(ruta).name}")
+    return interpretar_resultado(resultado)
+
+
+async def analizar_lote(rutas, concurrencia, tasa):
+    """
+    Analiza todas las facturas con hasta 'concurrencia' análisis en curso.
+    
+    Args:
+        rutas (list): Rutas Path de las facturas
+        concurrencia (int): Análisis simultáneos
+        tasa (float): Peticiones por segundo permitidas
+        
+    Returns:
+        tuple: (dict ruta → info o None, LimitadorTasa con las estadísticas)
+    """
+    limitador = LimitadorTasa(tasa)
+    semaforo = asyncio.Semaphore(max(1, concurrencia))
+    
+    async with _crear_cliente_async(limitador) as cliente:
+        resultados = await asyncio.gather(*(_analizar(cliente, ruta, semaforo) for ruta in rutas))
+    
+    return dict(zip(rutas, resultados)), limitador
+
+
+def extraer_lote_con_azure(rutas, concurrencia=None, tasa=None):
+    """
+    Versión por lotes de extraer_con_azure: analiza varias facturas a la vez.
+    
+    Args:
+        rutas (list): Rutas Path de las facturas
+        concurrencia (int, optional): Análisis simultáneos (por defecto AZURE_CONCURRENCIA)
+        tasa (float, optional): Peticiones por segundo (por defecto AZURE_TASA)
+        
+    Returns:
+        dict: Ruta → info (o None si Azure no resolvió la factura)
+    """
+    from config.settings import AZURE_CONCURRENCIA, AZURE_TASA
+    
+    rutas = list(rutas)
+    if not rutas:
+        return {}
+    
+    concurrencia = concurrencia or AZURE_CONCURRENCIA
+    tasa = tasa or AZURE_TASA
+    
+    logger.info(f"🔷 Azure: analizando {len(rutas)} facturas ({concurrencia} en paralelo, {tasa:g} pet/s)")
+    inicio = time.perf_counter()
+    
+    resultados, limitador = asyncio.run(analizar_lote(rutas, concurrencia, tasa))
+    
+    resueltas = sum(1 for info in resultados.values() if info)
+    logger.info(f"🔷 Azure: {resueltas}/{len(rutas)} resueltas en {time.perf_counter() - inicio:.1f}s"
+                f" ({limitador.limitadas} respuestas 429)")
+    return resultados
@@ -1,32 +1,129 @@
 """
 Extracción de datos de facturas usando Azure Document Intelligence (Form Recognizer)
+
+El cliente se crea una sola vez por proceso y reutiliza las conexiones HTTP
+(pool de requests), de modo que un lote de facturas no paga un handshake TLS
+por documento. El endpoint se lee de AZURE_FORM_RECOGNIZER_ENDPOINT, así que
+se puede apuntar a un servidor local de pruebas (benchmarks/mock_azure.py).
 """
 
 import os
+import threading
+from functools import lru_cache
+from contextlib import contextmanager
 from pathlib import Path
 from loguru import logger
-from dotenv import load_dotenv
 
-# Cargar variables de entorno
-load_dotenv()
+# config.settings carga el .env (credenciales de Azure)
+import config.settings  # noqa: F401
+
+_cliente = None
+_sesion_http = None
+_usuarios_sesion = 0
+_lock = threading.Lock()
+
+
+def _crear_cliente():
+    """Crea el cliente de Azure con un transporte HTTP con pool de conexiones."""
+    
+    from azure.ai.formrecognizer import DocumentAnalysisClient
+    from azure.core.credentials import AzureKeyCredential
+    from azure.core.pipeline.transport import RequestsTransport
+    import requests
+    from requests.adapters import HTTPAdapter
+    from config.settings import AZURE_POOL_CONEXIONES, AZURE_TIMEOUT, AZURE_POLLING_INTERVALO
+    
+    endpoint = os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT")
+    api_key = os.getenv("AZURE_FORM_RECOGNIZER_KEY")
+    
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=AZURE_POOL_CONEXIONES)
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    
+    transporte = RequestsTransport(
+        session=sesion,
+        session_owner=False,
+        connection_timeout=AZURE_TIMEOUT,
+        read_timeout=AZURE_TIMEOUT
+    )
+    
+    cliente = DocumentAnalysisClient(
+        endpoint=endpoint,
+        credential=AzureKeyCredential(api_key),
+        transport=transporte,
+        polling_interval=AZURE_POLLING_INTERVALO
+    )
+    
+    return cliente, sesion
 
 
-def extraer_con_azure(ruta_pdf):
+def obtener_cliente():
+    """
+    Devuelve el cliente de Azure del proceso (se crea la primera vez).
+    
+    Returns:
+        DocumentAnalysisClient: Cliente compartido
+    """
+    global _cliente, _sesion_http
+    
+    with _lock:
+        if _cliente is None:
+            logger.debug("   🔷 Creando cliente de Azure Document Intelligence")
+            _cliente, _sesion_http = _crear_cliente()
+        return _cliente
+
+
+def cerrar_cliente():
+    """Cierra el cliente y sus conexiones (se recreará si se vuelve a usar)."""
+    global _cliente, _sesion_http
+    
+    with _lock:
+        if _cliente is not None:
+            _cliente.close()
+            _sesion_http.close()
+        _cliente = None
+        _sesion_http = None
+
+
+@contextmanager
+def sesion_azure():
+    """
+    Comparte una misma sesión de Azure durante un lote y la cierra al terminar.
+    Se puede anidar: solo el bloque más externo cierra la sesión.
+    
+    Ejemplo:
+        with sesion_azure():
+            for factura in facturas:
+                extraer_con_azure(factura)
+    """
+    global _usuarios_sesion
+    
+    with _lock:
+        _usuarios_sesion += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _usuarios_sesion -= 1
+            ultimo = _usuarios_sesion == 0
+        if ultimo:
+            cerrar_cliente()
+
+
+def extraer_con_azure(ruta_pdf, documento=None):
     """
     Extrae datos de factura usando Azure Document Intelligence.
     
     Args:
         ruta_pdf (Path): Ruta al archivo PDF
+        documento (DocumentoFactura, optional): Contenido ya leído (no se vuelve a abrir el archivo)
         
     Returns:
         dict: Diccionario con fecha, proveedor, numero o None si falla
     """
     
     try:
-        from azure.ai.formrecognizer import DocumentAnalysisClient
-        from azure.core.credentials import AzureKeyCredential
-        from datetime import datetime
-        
         # Obtener credenciales desde variables de entorno
         endpoint = os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT")
         api_key = os.getenv("AZURE_FORM_RECOGNIZER_KEY")
@@ -38,97 +135,18 @@ def extraer_con_azure(ruta_pdf):
         
         logger.debug("   🔷 Usando Azure Document Intelligence...")
         
-        # Crear cliente
-        client = DocumentAnalysisClient(
-            endpoint=endpoint,
-            credential=AzureKeyCredential(api_key)
-        )
+        # Cliente compartido (reutiliza conexiones entre facturas)
+        client = obtener_cliente()
         
         # Analizar documento con modelo pre-entrenado para facturas
-        with open(ruta_pdf, "rb") as f:
+        with (documento.flujo() if documento else open(ruta_pdf, "rb")) as f:
             poller = client.begin_analyze_document(
                 model_id="prebuilt-invoice",  # Modelo específico para facturas
                 document=f
             )
         
         result = poller.result()
-        
-        if not result.documents:
-            logger.warning("   ⚠️ Azure no detectó facturas en el documento")
-            return None
-        
-        # Obtener primera factura detectada
-        invoice = result.documents[0]
-        fields = invoice.fields
-        
-        # Extraer datos
-        info = {
-            'fecha': None,
-            'proveedor': None,
-            'numero': None,
-            'cif': None,
-            'confianza': {}
-        }
-        
-        # Fecha de factura
-        if 'InvoiceDate' in fields and fields['InvoiceDate'].value:
-            fecha_obj = fields['InvoiceDate'].value
-            if isinstance(fecha_obj, datetime):
-                info['fecha'] = fecha_obj.strftime('%Y%m%d')
-            else:
-                # Intentar parsear si es string
-                try:
-                    fecha_obj = datetime.fromisoformat(str(fecha_obj))
-                    info['fecha'] = fecha_obj.strftime('%Y%m%d')
-                except:
-                    pass
-            
-            if info['fecha']:
-                confianza = fields['InvoiceDate'].confidence
-                info['confianza']['fecha'] = confianza
-                logger.debug(f"   ✓ Fecha: {info['fecha']} (confianza: {confianza:.1%})")
-        
-        # Proveedor (VendorName)
-        if 'VendorName' in fields and fields['VendorName'].value:
-            proveedor = str(fields['VendorName'].value).strip()
-            # Limpiar para nombre de archivo
-            import re
-            proveedor = re.sub(r'\s+', '_', proveedor)
-            proveedor = re.sub(r'[^\w\s-]', '', proveedor)
-            info['proveedor'] = proveedor[:50]  # Limitar longitud
-            
-            confianza = fields['VendorName'].confidence
-            info['confianza']['proveedor'] = confianza
-            logger.debug(f"   ✓ Proveedor: {proveedor} (confianza: {confianza:.1%})")
-        
-        # Número de factura
-        if 'InvoiceId' in fields and fields['InvoiceId'].value:
-            numero = str(fields['InvoiceId'].value).strip()
-            info['numero'] = numero
-            
-            confianza = fields['InvoiceId'].confidence
-            info['confianza']['numero'] = confianza
-            logger.debug(f"   ✓ Número: {numero} (confianza: {confianza:.1%})")
-        
-        # CIF/NIF del proveedor (opcional)
-        if 'VendorTaxId' in fields and fields['VendorTaxId'].value:
-            cif = str(fields['VendorTaxId'].value).strip()
-            info['cif'] = cif.replace('-', '').replace('.', '').replace(' ', '')
-            logger.debug(f"   ✓ CIF: {info['cif']}")
-        
-        # Validar que tengamos al menos 2 campos
-        campos_validos = sum([
-            bool(info['fecha']),
-            bool(info['proveedor']),
-            bool(info['numero'])
-        ])
-        
-        if campos_validos >= 2:
-            logger.success(f"   ✓ Azure extrajo {campos_validos}/3 campos")
-            return info
-        else:
-            logger.warning(f"   ⚠️ Azure solo extrajo {campos_validos}/3 campos")
-            return None
+        return interpretar_resultado(result)
             
     except ImportError:
         logger.error("   ❌ azure-ai-formrecognizer no instalado")
@@ -139,9 +157,103 @@ def extraer_con_azure(ruta_pdf):
         return None
 
 
+def interpretar_resultado(result):
+    """
+    Convierte el resultado de Azure (prebuilt-invoice) en la información de la factura.
+    
+    Args:
+        result (AnalyzeResult): Resultado de begin_analyze_document
+        
+    Returns:
+        dict: Diccionario con fecha, proveedor, numero o None si no hay al menos 2 campos
+    """
+    
+    from datetime import datetime
+    
+    if not result.documents:
+        logger.warning("   ⚠️ Azure no detectó facturas en el documento")
+        return None
+    
+    # Obtener primera factura detectada
+    invoice = result.documents[0]
+    fields = invoice.fields
+    
+    # Extraer datos
+    info = {
+        'fecha': None,
+        'proveedor': None,
+        'numero': None,
+        'cif': None,
+        'confianza': {}
+    }
+    
+    # Fecha de factura
+    if 'InvoiceDate' in fields and fields['InvoiceDate'].value:
+        fecha_obj = fields['InvoiceDate'].value
+        if isinstance(fecha_obj, datetime):
+            info['fecha'] = fecha_obj.strftime('%Y%m%d')
+        else:
+            # Intentar parsear si es string
+            try:
+                fecha_obj = datetime.fromisoformat(str(fecha_obj))
+                info['fecha'] = fecha_obj.strftime('%Y%m%d')
+            except:
+                pass
+        
+        if info['fecha']:
+            confianza = fields['InvoiceDate'].confidence
+            info['confianza']['fecha'] = confianza
+            logger.debug(f"   ✓ Fecha: {info['fecha']} (confianza: {confianza:.1%})")
+    
+    # Proveedor (VendorName)
+    if 'VendorName' in fields and fields['VendorName'].value:
+        proveedor = str(fields['VendorName'].value).strip()
+        # Limpiar para nombre de archivo
+        import re
+        proveedor = re.sub(r'\s+', '_', proveedor)
+        proveedor = re.sub(r'[^\w\s-]', '', proveedor)
+        info['proveedor'] = proveedor[:50]  # Limitar longitud
+        
+        confianza = fields['VendorName'].confidence
+        info['confianza']['proveedor'] = confianza
+        logger.debug(f"   ✓ Proveedor: {proveedor} (confianza: {confianza:.1%})")
+    
+    # Número de factura
+    if 'InvoiceId' in fields and fields['InvoiceId'].value:
+        numero = str(fields['InvoiceId'].value).strip()
+        info['numero'] = numero
+        
+        confianza = fields['InvoiceId'].confidence
+        info['confianza']['numero'] = confianza
+        logger.debug(f"   ✓ Número: {numero} (confianza: {confianza:.1%})")
+    
+    # CIF/NIF del proveedor (opcional)
+    if 'VendorTaxId' in fields and fields['VendorTaxId'].value:
+        cif = str(fields['VendorTaxId'].value).strip()
+        info['cif'] = cif.replace('-', '').replace('.', '').replace(' ', '')
+        logger.debug(f"   ✓ CIF: {info['cif']}")
+    
+    # Validar que tengamos al menos 2 campos
+    campos_validos = sum([
+        bool(info['fecha']),
+        bool(info['proveedor']),
+        bool(info['numero'])
+    ])
+    
+    if campos_validos >= 2:
+        logger.success(f"   ✓ Azure extrajo {campos_validos}/3 campos")
+        return info
+    else:
+        logger.warning(f"   ⚠️ Azure solo extrajo {campos_validos}/3 campos")
+        return None
+
+
+@lru_cache(maxsize=1)
 def esta_azure_disponible():
     """
     Verifica si Azure Document Intelligence está configurado.
+    El resultado se guarda durante la vida del proceso (las credenciales se
+    leen del entorno y del .env al arrancar).
     
     Returns:
         bool: True si está disponible
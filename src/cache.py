@@ -0,0 +1,219 @@
+"""
+Caché persistente de resultados de extracción
+Guarda en disco el texto nativo, el texto OCR y la información parseada de
+cada factura, indexados por el hash del contenido del archivo más la versión
+del extractor. Si el archivo no cambia, no se vuelve a extraer ni a aplicar
+OCR.
+
+Cada campo de la entrada se guarda con la firma de los parámetros de los que
+depende (el texto nativo, de los de texto nativo; el OCR, de los de OCR; la
+información parseada, de todos más los de Azure) y al leer se descartan solo
+los campos cuya firma ya no coincide: configurar Azure o cambiar el DPI no
+obliga a volver a extraer el texto nativo.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+
+from loguru import logger
+
+# Incrementar cuando cambie la lógica de extracción/parseo para invalidar la caché
+EXTRACTOR_VERSION = "1"
+
+TAMANO_BLOQUE = 1024 * 1024
+
+
+def hash_archivo(ruta):
+    """
+    Calcula el SHA-256 del contenido de un archivo.
+    
+    Args:
+        ruta (Path): Ruta al archivo
+        
+    Returns:
+        str: Hash hexadecimal
+    """
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _firma(parametros):
+    """Firma corta de un conjunto de parámetros."""
+    return hashlib.sha256(json.dumps(parametros, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class CacheExtraccion:
+    """
+    Caché en disco direccionada por contenido (un JSON por factura).
+    
+    Args:
+        carpeta (Path): Carpeta donde se guardan las entradas
+        parametros (dict): Por campo de la entrada (texto_nativo, texto_ocr,
+            info...), los parámetros que afectan a su valor (DPI, idioma...).
+            Los campos sin parámetros propios solo dependen de la versión
+        max_mb (int): Tamaño máximo total de la caché
+        max_dias (int): Antigüedad máxima de una entrada sin usarse
+    """
+    
+    def __init__(self, carpeta, parametros, max_mb=500, max_dias=90):
+        self.carpeta = Path(carpeta)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.max_segundos = max_dias * 24 * 3600
+        self._firmas = {campo: _firma(valor) for campo, valor in parametros.items()}
+    
+    def clave(self, ruta, hash_contenido=None):
+        """Clave de la factura: hash del contenido + versión del extractor."""
+        sha = hashlib.sha256((hash_contenido or hash_archivo(ruta)).encode())
+        sha.update(EXTRACTOR_VERSION.encode())
+        return sha.hexdigest()
+    
+    def _ruta_entrada(self, clave):
+        return self.carpeta / clave[:2] / f"{clave}.json"
+    
+    def obtener(self, clave):
+        """
+        Lee una entrada de la caché.
+        
+        Returns:
+            dict: Campos guardados con los parámetros actuales (los demás se
+                descartan) o None si no existe
+        """
+        ruta = self._ruta_entrada(clave)
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                guardada = json.load(f)
+            firmas = guardada['firmas']
+            entrada = {campo: valor for campo, valor in guardada['campos'].items()
+                       if firmas.get(campo) == self._firmas.get(campo)}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        
+        # Marcar como usada (la limpieza elimina primero las menos usadas)
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+        return entrada
+    
+    def guardar(self, clave, entrada):
+        """Escribe una entrada, con la firma de cada campo, de forma atómica (seguro con varios workers)."""
+        ruta = self._ruta_entrada(clave)
+        guardada = {
+            "campos": entrada,
+            "firmas": {campo: self._firmas.get(campo) for campo in entrada},
+        }
+        try:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(guardada, f, ensure_ascii=False)
+            os.replace(tmp, ruta)
+        except OSError as e:
+            logger.debug(f"   ⚠️ No se pudo guardar en caché: {e}")
+    
+    def limpiar(self):
+        """
+        Elimina entradas caducadas y, si la caché supera el tamaño máximo,
+        las menos usadas recientemente.
+        
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        if not self.carpeta.exists():
+            return 0
+        
+        ahora = time.time()
+        entradas = []
+        eliminadas = 0
+        
+        for ruta in self.carpeta.glob('*/*'):
+            try:
+                stat = ruta.stat()
+            except OSError:
+                continue
+            
+            caducada = ahora - stat.st_mtime > self.max_segundos
+            # Temporales huérfanos de escrituras interrumpidas
+            if caducada or (ruta.suffix == '.tmp' and ahora - stat.st_mtime > 3600):
+                ruta.unlink(missing_ok=True)
+                eliminadas += 1
+            elif ruta.suffix == '.json':
+                entradas.append((stat.st_mtime, stat.st_size, ruta))
+        
+        total = sum(tamano for _, tamano, _ in entradas)
+        if total > self.max_bytes:
+            for _, tamano, ruta in sorted(entradas):
+                ruta.unlink(missing_ok=True)
+                eliminadas += 1
+                total -= tamano
+                if total <= self.max_bytes:
+                    break
+        
+        if eliminadas:
+            logger.debug(f"🧹 Caché: eliminadas {eliminadas} entradas")
+        return eliminadas
+
+
+_cache = None
+
+
+def obtener_cache():
+    """
+    Devuelve la caché configurada en settings (una por proceso).
+    
+    Returns:
+        CacheExtraccion: Caché o None si está desactivada
+    """
+    global _cache
+    
+    from config.settings import (
+        CACHE_ACTIVA, CACHE_FOLDER, CACHE_MAX_MB, CACHE_MAX_DIAS,
+        OCR_DPI, OCR_GRIS, OCR_CABECERA, OCR_BANDA_CABECERA, OCR_PARADA_TEMPRANA,
+        OCR_ADAPTATIVO, OCR_DPI_RAPIDO, OCR_CONFIANZA_MINIMA, CLASIFICAR_PDF, AZURE_SOLO_ESCANEADOS,
+        TESSERACT_LANG, TEXTO_MOTOR, TEXTO_PARADA_TEMPRANA, TEXTO_MAX_PAGINAS
+    )
+    
+    if not CACHE_ACTIVA:
+        return None
+    
+    if _cache is None:
+        from src.ocr import motor_ocr
+        from src.azure_extractor import esta_azure_disponible
+        
+        ocr = {
+            "dpi": OCR_DPI,
+            "adaptativo": (OCR_DPI_RAPIDO, OCR_CONFIANZA_MINIMA) if OCR_ADAPTATIVO else None,
+            "gris": OCR_GRIS,
+            "lang": TESSERACT_LANG,
+            "motor_ocr": motor_ocr(),
+        }
+        texto_nativo = {
+            "texto": TEXTO_MOTOR,
+            "texto_paginas": (TEXTO_PARADA_TEMPRANA, TEXTO_MAX_PAGINAS),
+        }
+        texto_ocr_pagina = {**ocr, "cabecera": OCR_BANDA_CABECERA if OCR_CABECERA else None}
+        texto_ocr = {**ocr, "parada_temprana": OCR_PARADA_TEMPRANA}
+        # La info parseada depende de los textos, de las etapas que se ejecutan
+        # y de Azure: un resultado por regex guardado sin Azure no debe impedir
+        # que la factura llegue a Azure cuando se configure
+        info = {
+            **texto_nativo, **texto_ocr_pagina, **texto_ocr,
+            "clasificar": CLASIFICAR_PDF,
+            "azure": (esta_azure_disponible(), AZURE_SOLO_ESCANEADOS),
+        }
+        parametros = {
+            "texto_nativo": texto_nativo,
+            "texto_ocr_pagina": texto_ocr_pagina,
+            "texto_ocr": texto_ocr,
+            "info": info,
+            "version_kb": info,
+        }
+        _cache = CacheExtraccion(CACHE_FOLDER, parametros, CACHE_MAX_MB, CACHE_MAX_DIAS)
+    return _cache
@@ -0,0 +1,76 @@
+"""
+Clasificación previa de los PDF: qué etapas necesita cada documento
+Antes de extraer nada se mira lo que el PDF declara, sin análisis de
+maquetación (del orden de 1 ms por documento): las fuentes e imágenes de
+los recursos de las primeras páginas, los objetos de texto (BT) de sus
+content streams y el productor de los metadatos. Con eso se elige la ruta:
+
+- nativo: PDF digital sin imágenes → texto nativo + regex, sin OCR de
+  cabecera (solo volvería a leer el mismo texto)
+- nativo+ocr: PDF digital con imágenes (logos) o escaneado con capa de
+  texto → texto nativo y, si faltan campos, OCR de la cabecera
+- ocr: sin fuentes (escaneado) → OCR completo directamente, sin intentar
+  el texto nativo
+
+Azure se usa con todos los documentos o, con AZURE_SOLO_ESCANEADOS, solo
+con los escaneados (en los digitales el texto nativo es fiable y gratis).
+"""
+
+import re
+
+RUTA_NATIVO = "nativo"
+RUTA_NATIVO_OCR = "nativo+ocr"
+RUTA_OCR = "ocr"
+
+# Páginas que se inspeccionan (las facturas tienen los datos al principio)
+PAGINAS_INSPECCION = 3
+
+# Productores/creadores de PDF de escáneres y programas de digitalización
+PRODUCTORES_ESCANER = ("scan", "bizhub", "konica", "ricoh", "xerox", "canon", "kyocera",
+                       "epson", "abbyy", "naps2", "twain", "paperport")
+
+_OBJETO_TEXTO = re.compile(rb"\bBT\b")
+_TEXTO_INVISIBLE = re.compile(rb"\b3\s+Tr\b")  # Capa de OCR de un escáner
+
+
+def clasificar_pdf(doc):
+    """
+    Decide la ruta de extracción de un PDF.
+    
+    Las fuentes cuentan también las de los XObject de formulario, así que un
+    PDF digital con el texto dentro de un formulario (sin BT en la página)
+    no se confunde con un escaneado.
+    
+    Args:
+        doc (fitz.Document): Documento abierto
+        
+    Returns:
+        dict: ruta (RUTA_*), escaneado (bool) y motivo (para el log)
+    """
+    fuentes = 0
+    imagenes = 0
+    objetos_texto = 0
+    invisible = False
+    
+    for pagina in doc.pages(0, min(len(doc), PAGINAS_INSPECCION)):
+        fuentes += len(pagina.get_fonts())
+        imagenes += len(pagina.get_images())
+        contenido = pagina.read_contents()
+        objetos_texto += len(_OBJETO_TEXTO.findall(contenido))
+        invisible = invisible or _TEXTO_INVISIBLE.search(contenido) is not None
+    
+    metadatos = doc.metadata or {}
+    productor = f"{metadatos.get('producer') or ''} {metadatos.get('creator') or ''}".lower()
+    de_escaner = any(marca in productor for marca in PRODUCTORES_ESCANER)
+    
+    if not fuentes:
+        return {"ruta": RUTA_OCR, "escaneado": True,
+                "motivo": f"sin fuentes, {imagenes} imágenes"}
+    if invisible or (de_escaner and imagenes):
+        return {"ruta": RUTA_NATIVO_OCR, "escaneado": True,
+                "motivo": "escaneado con capa de texto"}
+    if not imagenes:
+        return {"ruta": RUTA_NATIVO, "escaneado": False,
+                "motivo": f"digital, {objetos_texto} objetos de texto, sin imágenes"}
+    return {"ruta": RUTA_NATIVO_OCR, "escaneado": False,
+            "motivo": f"digital, {objetos_texto} objetos de texto, {imagenes} imágenes"}
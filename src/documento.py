@@ -0,0 +1,179 @@
+"""
+Documento de factura abierto una sola vez
+Lee el archivo una vez (memory-map si está en un disco local, copia en
+memoria si está en una unidad de red) y comparte esos bytes con todas las
+etapas: hash para la caché, texto nativo (pdfplumber), renderizado para OCR
+(PyMuPDF) y subida a Azure. Sobre SMB, cada apertura del archivo por
+separado volvía a leerlo por la red.
+"""
+
+import io
+import os
+import mmap
+import hashlib
+from pathlib import Path
+
+# Sistemas de archivos de red en Linux (/proc/mounts)
+_FS_RED = {"cifs", "smb3", "smbfs", "nfs", "nfs4", "fuse.sshfs", "9p"}
+
+
+def es_local(ruta):
+    """
+    Indica si un archivo está en un disco local (se puede mapear en memoria
+    sin riesgo: en una unidad de red cada fallo de página es una lectura
+    remota y un corte de conexión tumba el proceso).
+    
+    Args:
+        ruta (Path): Ruta al archivo
+        
+    Returns:
+        bool: False si está en una ruta UNC o unidad de red
+    """
+    ruta_str = os.path.abspath(ruta)
+    
+    if ruta_str.startswith(("\\\\", "//")):
+        return False
+    
+    if os.name == "nt":
+        import ctypes
+        unidad = os.path.splitdrive(ruta_str)[0] + "\\"
+        return ctypes.windll.kernel32.GetDriveTypeW(unidad) != 4  # DRIVE_REMOTE
+    
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            montajes = [linea.split()[1:3] for linea in f]
+    except OSError:
+        return True
+    
+    # Montaje más específico que contiene la ruta
+    tipo = None
+    largo = -1
+    for punto, sistema in montajes:
+        if (ruta_str == punto or ruta_str.startswith(punto.rstrip("/") + "/")) and len(punto) > largo:
+            tipo, largo = sistema, len(punto)
+    return tipo not in _FS_RED
+
+
+class _LectorMemoria(io.RawIOBase):
+    """Flujo de solo lectura sobre un buffer, con posición propia y sin copiarlo."""
+    
+    def __init__(self, memoria):
+        super().__init__()
+        self._memoria = memoria
+        self._posicion = 0
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def readinto(self, destino):
+        n = max(0, min(len(destino), len(self._memoria) - self._posicion))
+        destino[:n] = self._memoria[self._posicion:self._posicion + n]
+        self._posicion += n
+        return n
+    
+    def seek(self, desplazamiento, desde=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._posicion, io.SEEK_END: len(self._memoria)}[desde]
+        self._posicion = max(0, base + desplazamiento)
+        return self._posicion
+    
+    def tell(self):
+        return self._posicion
+    
+    def close(self):
+        self._memoria = b""
+        super().close()
+
+
+class DocumentoFactura:
+    """
+    Contenido de una factura leído una sola vez y compartido por las etapas.
+    
+    Args:
+        ruta (Path): Ruta al archivo
+    
+    Ejemplo:
+        with DocumentoFactura(ruta) as documento:
+            with pdfplumber.open(documento.flujo()) as pdf:
+                ...
+            with documento.abrir_pdf() as doc:
+                ...
+    """
+    
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self._archivo = None
+        self._mapa = None
+        self._memoria = None
+        self._hash = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+    
+    @property
+    def memoria(self):
+        """Contenido del archivo (memoryview sobre el mapa o sobre los bytes leídos)."""
+        if self._memoria is None:
+            if es_local(self.ruta) and self.ruta.stat().st_size > 0:
+                self._archivo = open(self.ruta, "rb")
+                self._mapa = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+                self._memoria = memoryview(self._mapa)
+            else:
+                self._memoria = memoryview(self.ruta.read_bytes())
+        return self._memoria
+    
+    @property
+    def hash(self):
+        """SHA-256 del contenido (mismo valor que cache.hash_archivo)."""
+        if self._hash is None:
+            self._hash = hashlib.sha256(self.memoria).hexdigest()
+        return self._hash
+    
+    def flujo(self):
+        """Nuevo flujo de lectura (pdfplumber, subida a Azure) sin copiar el contenido."""
+        return io.BufferedReader(_LectorMemoria(self.memoria))
+    
+    def abrir_pdf(self):
+        """Documento PyMuPDF nuevo sobre los mismos bytes (uno por hilo: fitz no es thread-safe)."""
+        import fitz
+        return fitz.open(stream=self.memoria, filetype="pdf")
+    
+    def cerrar(self):
+        """Libera el mapa en memoria y el archivo (los documentos PyMuPDF abiertos deben estar cerrados)."""
+        if self._memoria is not None:
+            try:
+                self._memoria.release()
+            except BufferError:
+                pass  # Aún hay un flujo abierto: el mapa se libera cuando se recoja
+            self._memoria = None
+        
+        if self._mapa is not None:
+            try:
+                self._mapa.close()
+            except BufferError:
+                pass
+            self._mapa = None
+        
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+
+def abrir_pdf(origen):
+    """
+    Abre un PDF con PyMuPDF desde una ruta o un DocumentoFactura.
+    
+    Returns:
+        fitz.Document: Documento nuevo (el llamador lo cierra)
+    """
+    if isinstance(origen, DocumentoFactura):
+        return origen.abrir_pdf()
+    
+    import fitz
+    return fitz.open(origen)
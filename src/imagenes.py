@@ -0,0 +1,197 @@
+"""
+Facturas en imagen: fotos del móvil y TIFF multipágina de los escáneres
+Antes del OCR cada imagen se prepara (preparar_imagen): escala de grises,
+reducción de las fotos con más resolución de la que Tesseract aprovecha,
+enderezado y binarizado con el fondo compensado (sombras y luz irregular
+de las fotos).
+
+Los TIFF multipágina se procesan página a página en el pool de hilos de OCR
+compartido con los PDF (ocr_imagen): cada tarea abre el archivo y decodifica
+solo su página, así que como mucho hay tantas páginas en memoria como hilos,
+sea cual sea el número de páginas del TIFF.
+"""
+
+from functools import partial
+
+from loguru import logger
+
+from config.settings import IMAGEN_PREPROCESAR, IMAGEN_MAX_LADO, IMAGEN_ENDEREZAR_MAX
+from src.ocr import reconocer, en_pool_ocr
+from src.tiempos import medir
+
+# Ángulos (grados) que se prueban al enderezar, sobre una miniatura
+PASO_ENDEREZADO = 0.5
+LADO_MINIATURA = 800
+
+
+def _reducir(imagen, max_lado):
+    """Reduce la imagen si su lado mayor supera max_lado (conservando la proporción)."""
+    from PIL import Image
+    
+    lado = max(imagen.size)
+    if not max_lado or lado <= max_lado:
+        return imagen
+    escala = max_lado / lado
+    tamano = (max(1, round(imagen.width * escala)), max(1, round(imagen.height * escala)))
+    return imagen.resize(tamano, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def _compensar_fondo(imagen):
+    """
+    Iguala el fondo (papel blanco) de una imagen en gris: resta a cada píxel
+    el fondo estimado con un desenfoque grande, de modo que las sombras y la
+    luz irregular de una foto no se conviertan en manchas al binarizar.
+    """
+    from PIL import ImageChops, ImageFilter
+    
+    radio = max(8, max(imagen.size) // 40)
+    fondo = imagen.filter(ImageFilter.MaxFilter(3)).filter(ImageFilter.BoxBlur(radio))
+    return ImageChops.invert(ImageChops.subtract(fondo, imagen))
+
+
+def umbral_otsu(imagen):
+    """
+    Umbral de Otsu del histograma de una imagen en gris.
+    
+    Returns:
+        int: Nivel (0-255) que separa mejor tinta y papel
+    """
+    histograma = imagen.histogram()[:256]
+    total = sum(histograma)
+    suma_total = sum(nivel * cuenta for nivel, cuenta in enumerate(histograma))
+    
+    mejor, umbral = -1.0, 127
+    peso_fondo = suma_fondo = 0
+    for nivel, cuenta in enumerate(histograma):
+        peso_fondo += cuenta
+        if peso_fondo == 0:
+            continue
+        peso_frente = total - peso_fondo
+        if peso_frente == 0:
+            break
+        suma_fondo += nivel * cuenta
+        media_fondo = suma_fondo / peso_fondo
+        media_frente = (suma_total - suma_fondo) / peso_frente
+        varianza = peso_fondo * peso_frente * (media_fondo - media_frente) ** 2
+        if varianza > mejor:
+            mejor, umbral = varianza, nivel
+    return umbral
+
+
+def angulo_inclinacion(imagen, max_grados):
+    """
+    Inclinación del texto por perfil de proyección: con el ángulo correcto
+    las líneas de texto quedan horizontales y la media de tinta por fila
+    alterna al máximo entre líneas y espacios (varianza máxima).
+    
+    Args:
+        imagen (PIL.Image.Image): Imagen binarizada en gris (tinta oscura)
+        max_grados (float): Inclinación máxima que se busca, en los dos sentidos
+        
+    Returns:
+        float: Grados que hay que girar la imagen (0 si está derecha)
+    """
+    from PIL import Image, ImageOps, ImageStat
+    
+    miniatura = ImageOps.invert(_reducir(imagen, LADO_MINIATURA))  # Tinta = valores altos
+    
+    def dispersion(angulo):
+        girada = miniatura.rotate(angulo, resample=Image.Resampling.BILINEAR, expand=True)
+        filas = girada.resize((1, girada.height), Image.Resampling.BOX)
+        return ImageStat.Stat(filas).var[0]
+    
+    pasos = int(max_grados / PASO_ENDEREZADO)
+    angulos = [paso * PASO_ENDEREZADO for paso in range(-pasos, pasos + 1)]
+    mejor = max(angulos, key=dispersion)
+    # Sin una mejora clara, no girar (evita giros por ruido en páginas casi vacías)
+    return mejor if dispersion(mejor) > dispersion(0) * 1.05 else 0.0
+
+
+def preparar_imagen(imagen):
+    """
+    Prepara una imagen de factura para el OCR según IMAGEN_PREPROCESAR:
+    escala de grises, reducción a IMAGEN_MAX_LADO, compensación del fondo,
+    binarizado (Otsu) y enderezado hasta IMAGEN_ENDEREZAR_MAX grados.
+    
+    Args:
+        imagen (PIL.Image.Image): Imagen o página de un TIFF
+        
+    Returns:
+        PIL.Image.Image: Imagen en gris lista para reconocer
+    """
+    from PIL import Image
+    
+    # Escala de grises (las imágenes con transparencia, sobre fondo blanco)
+    if imagen.mode in ("RGBA", "LA", "P"):
+        imagen = imagen.convert("RGBA")
+        fondo = Image.new("RGBA", imagen.size, (255, 255, 255, 255))
+        imagen = Image.alpha_composite(fondo, imagen)
+    imagen = imagen.convert("L")
+    
+    if not IMAGEN_PREPROCESAR:
+        return imagen
+    
+    imagen = _reducir(imagen, IMAGEN_MAX_LADO)
+    imagen = _compensar_fondo(imagen)
+    umbral = umbral_otsu(imagen)
+    imagen = imagen.point(lambda nivel: 255 if nivel > umbral else 0)
+    
+    if IMAGEN_ENDEREZAR_MAX:
+        angulo = angulo_inclinacion(imagen, IMAGEN_ENDEREZAR_MAX)
+        if angulo:
+            logger.debug(f"   📐 Enderezando {angulo:+.1f}°")
+            imagen = imagen.rotate(angulo, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+    return imagen
+
+
+def num_paginas_imagen(ruta):
+    """
+    Returns:
+        int: Páginas de la imagen (varias en un TIFF multipágina; sin decodificarlas)
+    """
+    from PIL import Image
+    
+    with Image.open(ruta) as imagen:
+        return getattr(imagen, "n_frames", 1)
+
+
+def _ocr_pagina_imagen(ruta, num_pagina):
+    """Decodifica, prepara y reconoce una página de la imagen (cada hilo abre el archivo)."""
+    from PIL import Image
+    
+    with Image.open(ruta) as imagen:
+        imagen.seek(num_pagina)
+        imagen = preparar_imagen(imagen)
+    with medir("tesseract"):
+        texto = reconocer(imagen)
+    return {"texto": texto, "dpi": None, "confianza": None, "pagina": num_pagina}
+
+
+def ocr_imagen(ruta, completo=None, parada_temprana=True):
+    """
+    Aplica OCR a las páginas de una imagen (una, o varias en un TIFF) en el
+    pool de hilos de OCR, en orden, deteniéndose como en los PDF en cuanto
+    el texto acumulado tiene lo necesario.
+    
+    Args:
+        ruta (Path): Ruta a la imagen
+        completo (callable, optional): Función texto acumulado → bool
+        parada_temprana (bool): Parar en cuanto 'completo' devuelva True
+        
+    Returns:
+        list: Por página procesada, en orden, dict con texto y número de página
+    """
+    
+    num_paginas = num_paginas_imagen(ruta)
+    resultados = []
+    paginas = en_pool_ocr(partial(_ocr_pagina_imagen, ruta), range(num_paginas))
+    try:
+        for resultado in paginas:
+            resultados.append(resultado)
+            if (parada_temprana and completo and len(resultados) < num_paginas
+                    and completo("\n".join(r["texto"] for r in resultados))):
+                logger.debug(f"   ⏭️ Datos completos tras {len(resultados)}/{num_paginas} páginas - OCR detenido")
+                break
+    finally:
+        paginas.close()
+    return resultados
@@ -0,0 +1,265 @@
+"""
+Métricas de rendimiento: histogramas de duración por etapa y contadores
+Las etapas se miden con src.tiempos.medir() (listado de la carpeta, texto
+nativo, render y Tesseract del OCR, parseo, búsqueda en la base de
+proveedores, Azure y movimiento de archivos) y los resultados con
+contadores (facturas por resultado, etapa que resolvió cada factura,
+aciertos de caché, movimientos).
+
+Cada proceso acumula sus métricas; los workers del pool envían lo
+acumulado junto con cada resultado (PoolFacturas(recolector=...)) y el
+proceso principal lo combina. Al final de main() (y cada
+METRICAS_INTERVALO segundos en modo servicio) se escriben en
+METRICAS_ARCHIVO: textfile de Prometheus si termina en .prom (para el
+textfile collector de node_exporter) o resumen JSON si termina en .json.
+"""
+
+import os
+import bisect
+import threading
+from pathlib import Path
+
+from loguru import logger
+
+PREFIJO = "renombrar"
+
+# Límites superiores (segundos) de los buckets de los histogramas
+LIMITES = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+DESCRIPCIONES = {
+    "etapa_segundos": ("histogram", "Duración de cada etapa del pipeline (etapa=factura: procesamiento completo)"),
+    "facturas_total": ("counter", "Facturas procesadas por resultado"),
+    "resueltas_total": ("counter", "Facturas resueltas por etapa del pipeline"),
+    "cache_aciertos_total": ("counter", "Facturas cuyo resultado salió de la caché de extracción"),
+    "movimientos_total": ("counter", "Archivos movidos a la carpeta de salida o de errores"),
+    "rutas_total": ("counter", "PDF por ruta de extracción elegida por el clasificador"),
+    "ocr_pasadas_total": ("counter", "Pasadas de OCR por resolución (páginas y zonas de cabecera)"),
+}
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted(etiquetas.items()))
+
+
+def _etiquetas_prometheus(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    escapar = lambda valor: str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{nombre}="{escapar(valor)}"' for nombre, valor in pares) + "}"
+
+
+class Metricas:
+    """
+    Histogramas y contadores de un proceso (seguro entre hilos: el OCR
+    mide desde su pool de hilos).
+    
+    Los datos se guardan como diccionarios (nombre, etiquetas) → valor:
+    los histogramas como [cuentas por bucket, suma, máximo].
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}
+        self._contadores = {}
+    
+    @property
+    def vacia(self):
+        return not self._histogramas and not self._contadores
+    
+    def observar(self, nombre, valor, **etiquetas):
+        """Añade una observación (segundos) a un histograma."""
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = [[0] * (len(LIMITES) + 1), 0.0, 0.0]
+            histograma[0][bisect.bisect_left(LIMITES, valor)] += 1
+            histograma[1] += valor
+            histograma[2] = max(histograma[2], valor)
+    
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        """Suma 'valor' a un contador."""
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+    
+    def extraer(self):
+        """
+        Devuelve lo acumulado y vacía las métricas (los workers envían así
+        solo lo nuevo desde el último resultado).
+        
+        Returns:
+            dict: {"histogramas": ..., "contadores": ...} o None si no hay nada
+        """
+        with self._lock:
+            if self.vacia:
+                return None
+            datos = {"histogramas": self._histogramas, "contadores": self._contadores}
+            self._histogramas = {}
+            self._contadores = {}
+        return datos
+    
+    def combinar(self, datos):
+        """Suma las métricas extraídas de otro proceso."""
+        if not datos:
+            return
+        with self._lock:
+            for clave, (cuentas, suma, maximo) in datos["histogramas"].items():
+                histograma = self._histogramas.get(clave)
+                if histograma is None:
+                    self._histogramas[clave] = [list(cuentas), suma, maximo]
+                    continue
+                histograma[0] = [a + b for a, b in zip(histograma[0], cuentas)]
+                histograma[1] += suma
+                histograma[2] = max(histograma[2], maximo)
+            for clave, valor in datos["contadores"].items():
+                self._contadores[clave] = self._contadores.get(clave, 0) + valor
+    
+    def texto_prometheus(self):
+        """
+        Returns:
+            str: Métricas en el formato de exposición de texto de Prometheus
+        """
+        with self._lock:
+            histogramas = sorted(self._histogramas.items())
+            contadores = sorted(self._contadores.items())
+        
+        lineas = []
+        vistos = set()
+        
+        def cabecera(nombre, tipo):
+            if nombre not in vistos:
+                vistos.add(nombre)
+                descripcion = DESCRIPCIONES.get(nombre, (tipo, nombre))[1]
+                lineas.append(f"# HELP {PREFIJO}_{nombre} {descripcion}")
+                lineas.append(f"# TYPE {PREFIJO}_{nombre} {tipo}")
+        
+        for (nombre, etiquetas), (cuentas, suma, _) in histogramas:
+            cabecera(nombre, "histogram")
+            acumulado = 0
+            for limite, cuenta in zip(LIMITES + ("+Inf",), cuentas):
+                acumulado += cuenta
+                lineas.append(f"{PREFIJO}_{nombre}_bucket{_etiquetas_prometheus(etiquetas, [('le', limite)])} {acumulado}")
+            lineas.append(f"{PREFIJO}_{nombre}_sum{_etiquetas_prometheus(etiquetas)} {suma:.6f}")
+            lineas.append(f"{PREFIJO}_{nombre}_count{_etiquetas_prometheus(etiquetas)} {acumulado}")
+        
+        for (nombre, etiquetas), valor in contadores:
+            cabecera(nombre, "counter")
+            lineas.append(f"{PREFIJO}_{nombre}{_etiquetas_prometheus(etiquetas)} {valor}")
+        
+        return "\n".join(lineas) + "\n"
+    
+    def resumen(self):
+        """
+        Returns:
+            dict: Por histograma, número de observaciones, total, media, p50 y
+                p95 aproximados (límite del bucket) y máximo, en ms; y los contadores
+        """
+        from datetime import datetime
+        
+        with self._lock:
+            histogramas = sorted(self._histogramas.items())
+            contadores = sorted(self._contadores.items())
+        
+        def percentil(cuentas, total, p, maximo):
+            objetivo = p / 100 * total
+            acumulado = 0
+            for limite, cuenta in zip(LIMITES, cuentas):
+                acumulado += cuenta
+                if acumulado >= objetivo:
+                    return min(limite, maximo) * 1000
+            return maximo * 1000
+        
+        resumen = {"fecha": datetime.now().isoformat(timespec="seconds"), "histogramas": [], "contadores": []}
+        for (nombre, etiquetas), (cuentas, suma, maximo) in histogramas:
+            total = sum(cuentas)
+            resumen["histogramas"].append({
+                "nombre": nombre,
+                "etiquetas": dict(etiquetas),
+                "cuenta": total,
+                "total_s": round(suma, 3),
+                "media_ms": round(suma / total * 1000, 2) if total else None,
+                "p50_ms": round(percentil(cuentas, total, 50, maximo), 2),
+                "p95_ms": round(percentil(cuentas, total, 95, maximo), 2),
+                "max_ms": round(maximo * 1000, 2),
+            })
+        for (nombre, etiquetas), valor in contadores:
+            resumen["contadores"].append({"nombre": nombre, "etiquetas": dict(etiquetas), "valor": valor})
+        return resumen
+    
+    def escribir(self, ruta):
+        """
+        Escribe las métricas (formato según la extensión: .json o textfile
+        de Prometheus). Se escribe a un temporal y se renombra, para que el
+        textfile collector nunca lea un archivo a medias.
+        
+        Args:
+            ruta (Path): Archivo de destino
+        """
+        ruta = Path(ruta)
+        if ruta.suffix.lower() == ".json":
+            import json
+            contenido = json.dumps(self.resumen(), ensure_ascii=False, indent=2)
+        else:
+            contenido = self.texto_prometheus()
+        
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_name(f".{ruta.name}.{os.getpid()}.tmp")
+        temporal.write_text(contenido, encoding="utf-8")
+        os.replace(temporal, ruta)
+
+
+_metricas = None
+_pid_metricas = None
+
+
+def obtener_metricas():
+    """
+    Métricas de este proceso (un worker creado con fork empieza vacío, no
+    con las del proceso padre).
+    
+    Returns:
+        Metricas: Métricas del proceso o None si están desactivadas
+    """
+    global _metricas, _pid_metricas
+    
+    if _pid_metricas != os.getpid():
+        from config.settings import METRICAS_ACTIVAS
+        _metricas = Metricas() if METRICAS_ACTIVAS else None
+        _pid_metricas = os.getpid()
+    return _metricas
+
+
+def contar(nombre, valor=1, **etiquetas):
+    """Suma 'valor' a un contador de las métricas de este proceso (si están activas)."""
+    metricas = obtener_metricas()
+    if metricas:
+        metricas.incrementar(nombre, valor, **etiquetas)
+
+
+def recoger_metricas():
+    """Métricas nuevas de este proceso desde la última llamada (para enviarlas desde un worker)."""
+    metricas = obtener_metricas()
+    return metricas.extraer() if metricas else None
+
+
+def combinar_metricas(datos):
+    """Suma a las métricas de este proceso las recogidas en un worker."""
+    metricas = obtener_metricas()
+    if metricas:
+        metricas.combinar(datos)
+
+
+def escribir_metricas():
+    """Escribe las métricas de este proceso en METRICAS_ARCHIVO (si están activas)."""
+    from config.settings import METRICAS_ARCHIVO
+    
+    metricas = obtener_metricas()
+    if not metricas:
+        return
+    try:
+        metricas.escribir(METRICAS_ARCHIVO)
+        logger.debug(f"📈 Métricas escritas en {METRICAS_ARCHIVO}")
+    except OSError as e:
+        logger.warning(f"⚠️ No se pudieron escribir las métricas en {METRICAS_ARCHIVO}: {e}")
@@ -0,0 +1,458 @@
+"""
+Movimiento de facturas a OUTPUT_FOLDER / ERROR_FOLDER por lotes, a prueba de cortes
+Cada factura se mueve sin sobrescribir nunca el destino: en el mismo volumen
+con un enlace duro al nombre final y el borrado del original (en Windows, un
+rename, que ya falla si el destino existe); entre volúmenes se copia a un
+archivo .parcial, se verifica (tamaño y SHA-256), se publica con el nombre
+final de la misma forma y solo entonces se borra el original. Si el nombre
+está ocupado se lanza FileExistsError (en Linux y macOS os.rename lo
+reemplazaría sin avisar).
+
+Los movimientos se agrupan en lotes para no pagar un viaje de ida y vuelta
+al NAS por cada consulta de metadatos: cada carpeta de destino se lista y se
+crea una sola vez por lote (las colisiones de nombre se resuelven contra
+ese listado, añadiendo " (2)", " (3)"...) y el diario se sincroniza a disco
+una vez al planificar y otra al terminar.
+
+Diario (write-ahead): antes de mover nada se escribe el plan completo del
+lote en JOURNAL_FOLDER; después, una línea por movimiento hecho. Si el
+proceso se corta, reanudar_pendientes() completa los lotes a medias al
+arrancar y deshacer_lote() devuelve los archivos de un lote a su origen.
+El estado real se comprueba siempre en disco, así que recuperar un lote
+es idempotente aunque se pierdan las últimas líneas del diario.
+"""
+
+import os
+import json
+import errno
+import shutil
+from pathlib import Path
+from datetime import datetime
+
+from loguru import logger
+
+from src.cache import hash_archivo
+from src.metricas import contar
+from src.tiempos import medir
+
+# Diarios de lotes terminados que se conservan (para poder deshacerlos)
+DIARIOS_CONSERVADOS = 20
+
+SUFIJO_PARCIAL = ".parcial"
+SUFIJO_TERMINADO = ".hecho"
+
+# errno de os.link en sistemas de archivos sin enlaces duros
+_SIN_ENLACES_DUROS = {errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOSYS, errno.EMLINK}
+
+
+def _es_otro_volumen(error):
+    """Indica si un fallo del rename (o del enlace) se debe a que origen y destino están en volúmenes distintos."""
+    return error.errno == errno.EXDEV or getattr(error, "winerror", None) == 17  # ERROR_NOT_SAME_DEVICE
+
+
+def _renombrar_exclusivo(origen, destino):
+    """
+    Renombra en el mismo volumen sin sobrescribir: en POSIX con un enlace duro
+    y el borrado del original; si el sistema de archivos no admite enlaces
+    (FAT, algunos CIFS), reservando el nombre con O_EXCL y renombrando sobre
+    la reserva.
+    
+    Raises:
+        FileExistsError: Si el destino ya existe
+    """
+    if os.name == "nt":
+        os.rename(origen, destino)  # En Windows el rename no sobrescribe
+        return
+    
+    try:
+        os.link(origen, destino)
+    except OSError as e:
+        if e.errno not in _SIN_ENLACES_DUROS:
+            raise
+        os.close(os.open(destino, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        try:
+            os.rename(origen, destino)
+        except OSError:
+            os.remove(destino)
+            raise
+        return
+    os.remove(origen)
+
+
+def _copiar_verificar_borrar(origen, destino):
+    """Mueve entre volúmenes: copia a .parcial, verifica, publica con el nombre final y borra el original."""
+    parcial = destino.with_name(destino.name + SUFIJO_PARCIAL)
+    shutil.copyfile(origen, parcial)
+    shutil.copystat(origen, parcial)
+    
+    try:
+        if os.path.getsize(parcial) != os.path.getsize(origen) or hash_archivo(parcial) != hash_archivo(origen):
+            raise OSError(f"La copia de {origen.name} no coincide con el original")
+        _renombrar_exclusivo(parcial, destino)
+    except OSError:
+        parcial.unlink(missing_ok=True)
+        raise
+    os.remove(origen)
+
+
+def mover_archivo(origen, destino, mismo_volumen=None):
+    """
+    Mueve un archivo sin sobrescribir el destino.
+    
+    Args:
+        origen (Path): Archivo a mover
+        destino (Path): Ruta final (la carpeta debe existir)
+        mismo_volumen (bool, optional): Si se sabe que están en volúmenes
+            distintos, se copia directamente sin intentar el rename
+            
+    Raises:
+        FileExistsError: Si el destino ya existe
+        OSError: Si falla la operación (el original queda intacto)
+    """
+    if mismo_volumen is not False:
+        try:
+            _renombrar_exclusivo(origen, destino)
+            return
+        except OSError as e:
+            if not _es_otro_volumen(e):
+                raise
+    _copiar_verificar_borrar(origen, destino)
+
+
+def nombre_libre(nombre, ocupados):
+    """
+    Nombre que no colisiona con los ocupados: "a.pdf" → "a (2).pdf" → "a (3).pdf"...
+    
+    Args:
+        nombre (str): Nombre deseado
+        ocupados (set): Nombres ya usados en la carpeta, en minúsculas
+            (Windows y SMB no distinguen mayúsculas)
+            
+    Returns:
+        str: Nombre libre (se añade a 'ocupados')
+    """
+    candidato = nombre
+    base, extension = os.path.splitext(nombre)
+    n = 2
+    while candidato.lower() in ocupados:
+        candidato = f"{base} ({n}){extension}"
+        n += 1
+    ocupados.add(candidato.lower())
+    return candidato
+
+
+class Diario:
+    """
+    Diario de un lote de movimientos (JSON lines).
+    
+    Registros: {"op": "plan", "id", "origen", "destino", "motivo"},
+    {"op": "hecho", "id"}, {"op": "destino", "id", "destino"} si hubo que
+    cambiar el nombre al mover, {"op": "error", "id", "error"} y {"op": "fin"}.
+    """
+    
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self._archivo = None
+    
+    def escribir(self, registros, sincronizar=False):
+        if self._archivo is None:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            self._archivo = open(self.ruta, "a", encoding="utf-8")
+        for registro in registros:
+            self._archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._archivo.flush()
+        if sincronizar:
+            os.fsync(self._archivo.fileno())
+    
+    def cerrar(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+    
+    def leer(self):
+        """
+        Returns:
+            tuple: (lista de movimientos {id, origen, destino, motivo, hecho}, terminado)
+        """
+        movimientos = {}
+        terminado = False
+        with open(self.ruta, encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    break  # Última línea a medio escribir
+                op = registro.get("op")
+                if op == "plan":
+                    movimientos[registro["id"]] = {**registro, "hecho": False}
+                elif op == "destino":
+                    movimientos[registro["id"]]["destino"] = registro["destino"]
+                elif op == "hecho":
+                    movimientos[registro["id"]]["hecho"] = True
+                elif op == "fin":
+                    terminado = True
+        return list(movimientos.values()), terminado
+
+
+class LoteMovimientos:
+    """
+    Acumula movimientos de facturas y los ejecuta por lotes.
+    
+    Args:
+        carpeta_diarios (Path): Carpeta de los diarios (en disco local)
+        tamano (int): Movimientos acumulados que disparan la ejecución del lote
+        simular (bool): DRY RUN: solo registra en el log lo que haría
+        al_mover (callable, optional): Función (origen, destino, datos) que se
+            llama tras cada movimiento hecho (o simulado)
+    
+    Ejemplo:
+        with LoteMovimientos(JOURNAL_FOLDER, simular=DRY_RUN) as lote:
+            lote.agregar(factura, OUTPUT_FOLDER, nuevo_nombre)
+            lote.agregar(otra, ERROR_FOLDER, otra.name, motivo="sin datos")
+    """
+    
+    def __init__(self, carpeta_diarios, tamano=200, simular=False, al_mover=None):
+        self.carpeta_diarios = Path(carpeta_diarios)
+        self.tamano = tamano
+        self.simular = simular
+        self._al_mover = al_mover
+        self._pendientes = []
+        self.movidas = []  # (origen, destino) de los movimientos hechos
+        self.fallidas = []  # (origen, error)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, tipo, *exc):
+        # Si se interrumpe, lo pendiente no se mueve (ni se anota como procesado)
+        if tipo is None:
+            self.ejecutar()
+        return False
+    
+    def __len__(self):
+        return len(self._pendientes)
+    
+    def agregar(self, origen, carpeta_destino, nombre, motivo=None, datos=None):
+        """
+        Añade un movimiento; si se alcanza el tamaño del lote, lo ejecuta.
+        
+        Args:
+            origen (Path): Factura a mover
+            carpeta_destino (Path): OUTPUT_FOLDER o ERROR_FOLDER
+            nombre (str): Nombre en el destino (si está ocupado se añade " (n)")
+            motivo (str, optional): Motivo (movimientos a errores)
+            datos (optional): Se pasan a al_mover tras el movimiento
+        """
+        self._pendientes.append((Path(origen), Path(carpeta_destino), nombre, motivo, datos))
+        if len(self._pendientes) >= self.tamano:
+            self.ejecutar()
+    
+    def _planificar(self, pendientes):
+        """Destino final de cada movimiento: una lectura de cada carpeta de destino por lote."""
+        ocupados = {}
+        plan = []
+        for origen, carpeta, nombre, motivo, datos in pendientes:
+            if carpeta not in ocupados:
+                if not self.simular:
+                    carpeta.mkdir(parents=True, exist_ok=True)
+                try:
+                    with os.scandir(carpeta) as entradas:
+                        ocupados[carpeta] = {entrada.name.lower() for entrada in entradas}
+                except FileNotFoundError:
+                    ocupados[carpeta] = set()
+            plan.append((origen, carpeta / nombre_libre(nombre, ocupados[carpeta]), motivo, datos))
+        return plan
+    
+    def ejecutar(self):
+        """
+        Ejecuta los movimientos acumulados.
+        
+        Returns:
+            int: Movimientos hechos
+        """
+        if not self._pendientes:
+            return 0
+        
+        pendientes, self._pendientes = self._pendientes, []
+        plan = self._planificar(pendientes)
+        
+        if self.simular:
+            for origen, destino, motivo, datos in plan:
+                accion = f"movió a errores ({motivo})" if motivo else "renombró"
+                logger.info(f"🔍 DRY RUN: No se {accion}: {origen.name} → {destino}")
+                if self._al_mover:
+                    self._al_mover(origen, destino, datos)
+            return 0
+        
+        diario = Diario(self.carpeta_diarios / f"lote_{datetime.now():%Y%m%d_%H%M%S_%f}.jsonl")
+        diario.escribir(
+            ({"op": "plan", "id": i, "origen": str(origen), "destino": str(destino), "motivo": motivo}
+             for i, (origen, destino, motivo, _) in enumerate(plan)),
+            sincronizar=True
+        )
+        
+        # Comprobar el volumen una vez por pareja de carpetas, no por archivo
+        volumenes = {}
+        hechos = 0
+        try:
+            for i, (origen, destino, motivo, datos) in enumerate(plan):
+                pareja = (origen.parent, destino.parent)
+                if pareja not in volumenes:
+                    try:
+                        volumenes[pareja] = os.stat(pareja[0]).st_dev == os.stat(pareja[1]).st_dev
+                    except OSError:
+                        volumenes[pareja] = None  # Desconocido: probar el rename
+                
+                try:
+                    with medir("movimiento"):
+                        destino = self._mover(origen, destino, volumenes[pareja], diario, i)
+                except OSError as e:
+                    logger.error(f"❌ No se pudo mover {origen.name}: {e}")
+                    diario.escribir([{"op": "error", "id": i, "error": str(e)}])
+                    self.fallidas.append((origen, str(e)))
+                    contar("movimientos_total", destino="errores" if motivo else "salida", resultado="error")
+                    continue
+                
+                diario.escribir([{"op": "hecho", "id": i}])
+                contar("movimientos_total", destino="errores" if motivo else "salida", resultado="ok")
+                self.movidas.append((origen, destino))
+                hechos += 1
+                if motivo:
+                    logger.warning(f"📁 Movida a errores ({motivo}): {origen.name}")
+                else:
+                    logger.info(f"✅ Renombrado: {origen.name} → {destino.name}")
+                if self._al_mover:
+                    self._al_mover(origen, destino, datos)
+        except BaseException:
+            # Interrumpido: el diario queda sin terminar para reanudar_pendientes()
+            diario.cerrar()
+            raise
+        
+        diario.escribir([{"op": "fin"}], sincronizar=True)
+        diario.cerrar()
+        _archivar(diario.ruta)
+        return hechos
+    
+    def _mover(self, origen, destino, mismo_volumen, diario, id_movimiento):
+        """Mueve un archivo; si el nombre se ocupó después de planificar, usa el siguiente libre."""
+        ocupados = None
+        while True:
+            try:
+                mover_archivo(origen, destino, mismo_volumen)
+                return destino
+            except FileExistsError:
+                if ocupados is None:
+                    ocupados = {entrada.name.lower() for entrada in os.scandir(destino.parent)}
+                destino = destino.with_name(nombre_libre(destino.name, ocupados))
+                diario.escribir([{"op": "destino", "id": id_movimiento, "destino": str(destino)}],
+                                sincronizar=True)
+
+
+def _archivar(ruta_diario):
+    """Marca un diario como terminado y conserva solo los DIARIOS_CONSERVADOS más recientes."""
+    terminado = ruta_diario.with_name(ruta_diario.name + SUFIJO_TERMINADO)
+    os.replace(ruta_diario, terminado)
+    
+    antiguos = sorted(ruta_diario.parent.glob(f"lote_*.jsonl{SUFIJO_TERMINADO}"))[:-DIARIOS_CONSERVADOS]
+    for ruta in antiguos:
+        ruta.unlink(missing_ok=True)
+
+
+def _completar(movimiento):
+    """
+    Lleva un movimiento planificado a su estado final según lo que hay en disco.
+    
+    Returns:
+        bool: True si el archivo está en su destino
+    """
+    origen = Path(movimiento["origen"])
+    destino = Path(movimiento["destino"])
+    parcial = destino.with_name(destino.name + SUFIJO_PARCIAL)
+    
+    if destino.exists() and origen.exists() and destino.stat().st_size == 0 < origen.stat().st_size:
+        destino.unlink()  # Reserva O_EXCL de un rename que no llegó a hacerse
+    
+    if destino.exists():
+        if not origen.exists():
+            return True
+        # Enlace o copia entre volúmenes terminados pero sin borrar el original
+        if hash_archivo(origen) == hash_archivo(destino):
+            os.remove(origen)
+            return True
+        logger.error(f"❌ {destino.name} existe y no es copia de {origen}: se deja sin mover")
+        return False
+    
+    parcial.unlink(missing_ok=True)
+    if not origen.exists():
+        logger.error(f"❌ No se encuentra {origen} ni {destino}")
+        return False
+    
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    mover_archivo(origen, destino)
+    return True
+
+
+def reanudar_pendientes(carpeta_diarios):
+    """
+    Completa los lotes que quedaron a medias (proceso cortado).
+    
+    Args:
+        carpeta_diarios (Path): Carpeta de los diarios
+        
+    Returns:
+        int: Movimientos completados
+    """
+    completados = 0
+    for ruta in sorted(Path(carpeta_diarios).glob("lote_*.jsonl")):
+        movimientos, _ = Diario(ruta).leer()
+        pendientes = [m for m in movimientos if not m["hecho"]]
+        logger.warning(f"♻️ Reanudando lote interrumpido {ruta.name} ({len(pendientes)} movimientos pendientes)")
+        
+        for movimiento in pendientes:
+            try:
+                completados += _completar(movimiento)
+            except OSError as e:
+                logger.error(f"❌ No se pudo completar {movimiento['origen']}: {e}")
+        _archivar(ruta)
+    return completados
+
+
+def deshacer_lote(carpeta_diarios, nombre=None):
+    """
+    Devuelve a su carpeta de origen los archivos movidos por un lote.
+    
+    Args:
+        carpeta_diarios (Path): Carpeta de los diarios
+        nombre (str, optional): Diario a deshacer (por defecto el más reciente)
+        
+    Returns:
+        list: Rutas de origen de los archivos devueltos
+    """
+    carpeta_diarios = Path(carpeta_diarios)
+    if nombre:
+        ruta = carpeta_diarios / nombre
+    else:
+        diarios = sorted(carpeta_diarios.glob("lote_*.jsonl")) + sorted(carpeta_diarios.glob(f"lote_*.jsonl{SUFIJO_TERMINADO}"))
+        diarios.sort(key=lambda ruta: ruta.name)
+        if not diarios:
+            logger.warning("⚠️ No hay lotes que deshacer")
+            return []
+        ruta = diarios[-1]
+    
+    movimientos, _ = Diario(ruta).leer()
+    devueltos = []
+    for movimiento in reversed(movimientos):
+        origen = Path(movimiento["origen"])
+        destino = Path(movimiento["destino"])
+        Path(str(destino) + SUFIJO_PARCIAL).unlink(missing_ok=True)
+        if origen.exists() or not destino.exists():
+            continue  # No llegó a moverse (o ya se devolvió)
+        try:
+            mover_archivo(destino, origen)
+            devueltos.append(origen)
+        except OSError as e:
+            logger.error(f"❌ No se pudo devolver {destino.name} a {origen.parent}: {e}")
+    
+    ruta.rename(ruta.with_name(ruta.name.replace(SUFIJO_TERMINADO, "") + ".deshecho"))
+    logger.info(f"↩️ Lote {ruta.name} deshecho: {len(devueltos)} archivos devueltos a su origen")
+    return devueltos
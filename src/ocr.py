@@ -0,0 +1,468 @@
+"""
+Renderizado de páginas PDF para OCR
+Construye la imagen PIL directamente sobre los samples del pixmap de PyMuPDF,
+sin comprimir y descomprimir un PNG de la página completa (a 300 DPI) solo
+para dársela a Tesseract. En escala de grises la imagen comparte la memoria
+del pixmap (sin ninguna copia).
+
+Para leer logos de proveedores no hace falta la página entera: basta con la
+banda superior y las zonas con imágenes incrustadas (regiones_cabecera).
+
+El OCR pasa por reconocer(), con el motor de OCR_MOTOR: tesserocr mantiene
+Tesseract cargado dentro del proceso (un motor por hilo, que lee el idioma
+una sola vez) y recibe los píxeles directamente; pytesseract, el respaldo,
+lanza un proceso tesseract y escribe un PNG temporal por imagen.
+
+Las páginas se reconocen con resolución adaptativa (reconocer_pagina):
+primero a OCR_DPI_RAPIDO y a OCR_DPI solo si Tesseract no está seguro del
+resultado o si al documento le siguen faltando datos.
+
+Los PDF escaneados (y los TIFF de src/imagenes.py) se procesan en un pool
+de hilos compartido (en_pool_ocr): con los dos motores el reconocimiento
+corre fuera del GIL (tesserocr lo libera; pytesseract espera a otro proceso).
+"""
+
+import os
+import threading
+from pathlib import Path
+from functools import lru_cache, partial
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+from config.settings import (
+    OCR_MOTOR, OCR_DPI, OCR_GRIS, OCR_BANDA_CABECERA, OCR_ADAPTATIVO, OCR_DPI_RAPIDO,
+    OCR_CONFIANZA_MINIMA, OCR_WORKERS, MAX_WORKERS, TESSERACT_PATH, TESSERACT_LANG
+)
+from src.documento import abrir_pdf
+from src.tiempos import medir
+from src.metricas import contar
+
+
+def _pixmap_a_imagen(pix):
+    """
+    Imagen PIL sobre los samples de un pixmap sin canal alfa.
+    Con 1 canal (gris) comparte la memoria del pixmap; con RGB, PIL hace una
+    única copia (no admite mapear RGB de 3 bytes por píxel).
+    
+    Args:
+        pix (fitz.Pixmap): Pixmap en escala de grises o RGB, sin alfa
+        
+    Returns:
+        PIL.Image.Image: Imagen (hay que cerrarla antes de liberar el pixmap)
+    """
+    from PIL import Image
+    
+    modo = "L" if pix.n == 1 else "RGB"
+    return Image.frombuffer(modo, (pix.width, pix.height), pix.samples_mv, "raw", modo, pix.stride, 1)
+
+
+# Imágenes que se ignoran al buscar logos
+MIN_LADO_IMAGEN = 24  # puntos (tiras y adornos más pequeños)
+MAX_FRACCION_IMAGEN = 0.5  # fondos o páginas escaneadas
+
+
+def regiones_cabecera(pagina, banda=None):
+    """
+    Zonas de una página donde suele estar el nombre del proveedor: la banda
+    superior y las imágenes incrustadas (logos) fuera de ella.
+    
+    Args:
+        pagina (fitz.Page): Página del documento
+        banda (float, optional): Alto de la banda superior como fracción de
+            la página (por defecto OCR_BANDA_CABECERA)
+            
+    Returns:
+        list: Rectángulos fitz.Rect, de arriba abajo (la banda primero)
+    """
+    import fitz
+    
+    banda = OCR_BANDA_CABECERA if banda is None else banda
+    pagina_rect = pagina.rect
+    cabecera = fitz.Rect(pagina_rect.x0, pagina_rect.y0, pagina_rect.x1,
+                         pagina_rect.y0 + pagina_rect.height * banda)
+    
+    imagenes = []
+    for info in pagina.get_image_info():
+        rect = fitz.Rect(info['bbox']) & pagina_rect
+        if rect.is_empty or min(rect.width, rect.height) < MIN_LADO_IMAGEN:
+            continue
+        if rect.get_area() > pagina_rect.get_area() * MAX_FRACCION_IMAGEN:
+            continue
+        imagenes.append(rect)
+    
+    # Los logos que cruzan el borde de la banda la amplían (para no cortarlos)
+    otras = []
+    for rect in imagenes:
+        if rect.intersects(cabecera):
+            cabecera |= rect
+        else:
+            otras.append(rect)
+    
+    return [cabecera] + sorted(otras, key=lambda r: (r.y0, r.x0))
+
+
+@contextmanager
+def pagina_como_imagen(pagina, dpi=None, gris=None, clip=None):
+    """
+    Renderiza una página de PDF y la expone como imagen PIL.
+    La imagen puede compartir memoria con el pixmap, así que solo es válida
+    dentro del bloque with (al salir se cierra).
+    
+    Args:
+        pagina (fitz.Page): Página del documento
+        dpi (int, optional): Resolución (por defecto OCR_DPI)
+        gris (bool, optional): Renderizar en escala de grises (por defecto OCR_GRIS)
+        clip (fitz.Rect, optional): Renderizar solo esta zona de la página
+    
+    Ejemplo:
+        with pagina_como_imagen(doc[0]) as imagen:
+            texto = reconocer(imagen)
+    """
+    import fitz
+    
+    dpi = dpi or OCR_DPI
+    gris = OCR_GRIS if gris is None else gris
+    
+    with medir("render"):
+        pix = pagina.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY if gris else fitz.csRGB, alpha=False, clip=clip)
+        imagen = _pixmap_a_imagen(pix)
+    try:
+        yield imagen
+    finally:
+        # Soltar la vista sobre los samples antes de que se libere el pixmap
+        imagen.close()
+        del pix
+
+
+MOTORES_OCR = ("tesserocr", "pytesseract")
+
+_motor = None
+_hilo = threading.local()
+
+
+def motor_ocr():
+    """
+    Motor de OCR del proceso según OCR_MOTOR ("auto": tesserocr si está
+    instalado, si no pytesseract).
+    
+    Returns:
+        str: "tesserocr" o "pytesseract"
+    """
+    global _motor
+    
+    if _motor is None:
+        import importlib.util
+        
+        motor = OCR_MOTOR
+        if motor not in MOTORES_OCR + ("auto",):
+            logger.warning(f"⚠️ Motor de OCR desconocido '{motor}', usando auto")
+            motor = "auto"
+        if motor != "pytesseract":
+            if importlib.util.find_spec("tesserocr") is not None:
+                motor = "tesserocr"
+            else:
+                if motor == "tesserocr":
+                    logger.warning("⚠️ tesserocr no está instalado, usando pytesseract")
+                motor = "pytesseract"
+        _motor = motor
+    return _motor
+
+
+def _ruta_tessdata():
+    """
+    Carpeta de los idiomas para tesserocr: TESSDATA_PREFIX o la carpeta
+    tessdata junto a TESSERACT_PATH (instalación de Windows), si existen.
+    
+    Returns:
+        str: Ruta o None para usar la de la compilación de tesserocr
+    """
+    
+    if os.getenv("TESSDATA_PREFIX"):
+        return os.getenv("TESSDATA_PREFIX")
+    carpeta = Path(TESSERACT_PATH).parent / "tessdata"
+    return str(carpeta) if carpeta.is_dir() else None
+
+
+def _api_tesserocr():
+    """
+    Motor tesserocr del hilo actual. Se crea la primera vez que el hilo hace
+    OCR y se reutiliza para todas sus imágenes (una instancia no se puede
+    usar desde dos hilos a la vez); un proceso hijo (fork) crea los suyos.
+    
+    Returns:
+        tesserocr.PyTessBaseAPI: Motor con TESSERACT_LANG cargado
+        
+    Raises:
+        RuntimeError: Si Tesseract no puede iniciarse (p.ej. falta el idioma)
+    """
+    if getattr(_hilo, "pid", None) != os.getpid():
+        if hilos_ocr() > 1:
+            # OpenMP lee el límite al cargar la librería (ver obtener_pool_ocr)
+            os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+        import tesserocr
+        
+        ruta = _ruta_tessdata()
+        _hilo.api = tesserocr.PyTessBaseAPI(lang=TESSERACT_LANG, **({"path": ruta} if ruta else {}))
+        _hilo.pid = os.getpid()
+    return _hilo.api
+
+
+def _reconocer_tesserocr(api, imagen, confianza):
+    """OCR en el proceso: los píxeles van a Tesseract sin codificar ni escribir archivos."""
+    if imagen.mode not in ("L", "RGB"):
+        imagen = imagen.convert("RGB")
+    
+    canales = len(imagen.getbands())
+    api.SetImageBytes(imagen.tobytes(), imagen.width, imagen.height, canales, imagen.width * canales)
+    try:
+        texto = api.GetUTF8Text()
+        return texto, api.MeanTextConf() if confianza else None
+    finally:
+        api.Clear()
+
+
+@lru_cache(maxsize=None)
+def _pytesseract():
+    """pytesseract apuntando a TESSERACT_PATH (si existe; si no, al tesseract del PATH)."""
+    import pytesseract
+    
+    if Path(TESSERACT_PATH).exists():
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+    return pytesseract
+
+
+def _confianza_tsv(tsv):
+    """Confianza media (0-100) de las palabras de la salida TSV de tesseract (0 si no hay)."""
+    confianzas = []
+    for linea in tsv.splitlines()[1:]:
+        columnas = linea.split("\t")
+        if len(columnas) == 12 and columnas[11].strip() and float(columnas[10]) >= 0:
+            confianzas.append(float(columnas[10]))
+    return round(sum(confianzas) / len(confianzas)) if confianzas else 0
+
+
+def _reconocer_pytesseract(imagen, confianza):
+    """OCR con el ejecutable de tesseract (texto y, si se pide, TSV en la misma ejecución)."""
+    
+    pytesseract = _pytesseract()
+    if not confianza:
+        return pytesseract.image_to_string(imagen, lang=TESSERACT_LANG), None
+    texto, tsv = pytesseract.run_and_get_multiple_output(imagen, ["txt", "tsv"], lang=TESSERACT_LANG)
+    return texto, _confianza_tsv(tsv)
+
+
+def _reconocer(imagen, motor, confianza):
+    global _motor
+    
+    motor = motor or motor_ocr()
+    if motor == "tesserocr":
+        try:
+            api = _api_tesserocr()
+        except RuntimeError as e:
+            logger.warning(f"⚠️ No se pudo iniciar tesserocr ({e}), usando pytesseract")
+            _motor = "pytesseract"
+        else:
+            return _reconocer_tesserocr(api, imagen, confianza)
+    
+    return _reconocer_pytesseract(imagen, confianza)
+
+
+def reconocer(imagen, motor=None):
+    """
+    Texto de una imagen con el motor de OCR. Si tesserocr no puede iniciarse,
+    el proceso pasa a usar pytesseract.
+    
+    Args:
+        imagen (PIL.Image.Image): Imagen a reconocer
+        motor (str, optional): "tesserocr" o "pytesseract" (por defecto motor_ocr())
+        
+    Returns:
+        str: Texto reconocido
+    """
+    return _reconocer(imagen, motor, False)[0]
+
+
+def reconocer_con_confianza(imagen, motor=None):
+    """
+    Como reconocer(), con la confianza media de Tesseract en las palabras.
+    
+    Returns:
+        tuple: (texto, confianza de 0 a 100; 0 si no reconoció ninguna palabra)
+    """
+    return _reconocer(imagen, motor, True)
+
+
+def reconocer_pagina(pagina, clip=None, adaptativo=None):
+    """
+    OCR de una página (o de una zona) con resolución adaptativa: primero a
+    OCR_DPI_RAPIDO y, solo si la confianza media no llega a
+    OCR_CONFIANZA_MINIMA, otra vez a OCR_DPI. A 200 DPI una página tiene
+    menos de la mitad de píxeles que a 300, y la mayoría se leen bien así.
+    
+    Args:
+        pagina (fitz.Page): Página del documento
+        clip (fitz.Rect, optional): Reconocer solo esta zona de la página
+        adaptativo (bool, optional): Por defecto OCR_ADAPTATIVO; False = una
+            sola pasada a OCR_DPI
+            
+    Returns:
+        dict: texto, dpi de la pasada que se usó y su confianza (None sin
+            OCR adaptativo)
+    """
+    
+    if not (OCR_ADAPTATIVO if adaptativo is None else adaptativo):
+        with pagina_como_imagen(pagina, dpi=OCR_DPI, clip=clip) as imagen, medir("tesseract"):
+            texto = reconocer(imagen)
+        contar("ocr_pasadas_total", dpi=OCR_DPI)
+        return {"texto": texto, "dpi": OCR_DPI, "confianza": None}
+    
+    for dpi in sorted({OCR_DPI_RAPIDO, OCR_DPI}):
+        with pagina_como_imagen(pagina, dpi=dpi, clip=clip) as imagen, medir("tesseract"):
+            texto, confianza = reconocer_con_confianza(imagen)
+        contar("ocr_pasadas_total", dpi=dpi)
+        if confianza >= OCR_CONFIANZA_MINIMA:
+            break
+    return {"texto": texto, "dpi": dpi, "confianza": confianza}
+
+
+_pool = None
+_pid_pool = None
+_lock_pool = threading.Lock()
+
+
+def hilos_ocr():
+    """
+    Hilos del pool de OCR: OCR_WORKERS o, si es 0, los núcleos repartidos
+    entre los procesos del pool de facturas (MAX_WORKERS).
+    
+    Returns:
+        int: Número de hilos (al menos 1)
+    """
+    
+    if OCR_WORKERS > 0:
+        return OCR_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, MAX_WORKERS))
+
+
+def obtener_pool_ocr():
+    """
+    Pool de hilos de OCR del proceso (se crea la primera vez).
+    
+    Returns:
+        ThreadPoolExecutor: Pool compartido
+    """
+    global _pool, _pid_pool
+    
+    with _lock_pool:
+        # Un proceso hijo (fork) no hereda los hilos: crear su propio pool
+        if _pool is None or _pid_pool != os.getpid():
+            hilos = hilos_ocr()
+            if hilos > 1:
+                # Cada Tesseract en un solo hilo: el paralelismo lo pone el pool
+                os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+            _pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="ocr")
+            _pid_pool = os.getpid()
+        return _pool
+
+
+def _ocr_pagina(origen, num_pagina, adaptativo=None):
+    """Renderiza y aplica OCR a una página (cada hilo abre su documento: fitz no es thread-safe)."""
+    
+    with abrir_pdf(origen) as doc:
+        resultado = reconocer_pagina(doc[num_pagina], adaptativo=adaptativo)
+    resultado["pagina"] = num_pagina
+    return resultado
+
+
+def en_pool_ocr(tarea, paginas):
+    """
+    Genera, en orden, los resultados de tarea(página) hechos en el pool de
+    hilos de OCR (páginas de PDF o de un TIFF). Como mucho hay tantas
+    páginas en curso como hilos (la memoria de los mapas de bits no crece
+    con el número de páginas); al cerrar el generador se cancelan las que
+    no han empezado.
+    
+    Args:
+        tarea (callable): Función número de página → dict con texto, dpi,
+            confianza y pagina
+        paginas (iterable): Números de página (desde 0)
+        
+    Yields:
+        dict: Resultado de cada página
+    """
+    pool = obtener_pool_ocr()
+    ventana = hilos_ocr()
+    pendientes = deque(paginas)
+    en_curso = deque()
+    
+    try:
+        while pendientes or en_curso:
+            while pendientes and len(en_curso) < ventana:
+                en_curso.append(pool.submit(tarea, pendientes.popleft()))
+            
+            resultado = en_curso.popleft().result()
+            detalles = [f"{resultado['dpi']} DPI"] if resultado['dpi'] else []
+            if resultado['confianza'] is not None:
+                detalles.append(f"confianza {resultado['confianza']}")
+            logger.debug(f"   📄 Página {resultado['pagina'] + 1}" + (f": {', '.join(detalles)}" if detalles else ""))
+            yield resultado
+    finally:
+        for futuro in en_curso:
+            futuro.cancel()
+
+
+def _unir(resultados):
+    return "\n".join(resultado["texto"] for resultado in resultados)
+
+
+def ocr_paginas(origen, num_paginas, completo=None, parada_temprana=True, adaptativo=None):
+    """
+    Aplica OCR a las páginas de un PDF en el pool de hilos, en orden.
+    
+    Con 'completo' y parada temprana, deja de procesar páginas en cuanto el
+    texto acumulado ya tiene todo lo necesario. Con OCR adaptativo, si al
+    terminar al texto aún le falta algo, las páginas leídas a
+    OCR_DPI_RAPIDO se repiten a OCR_DPI.
+    
+    Args:
+        origen (Path | DocumentoFactura): PDF (ruta o contenido ya leído)
+        num_paginas (int): Número de páginas del documento
+        completo (callable, optional): Función texto acumulado → bool
+        parada_temprana (bool): Parar en cuanto 'completo' devuelva True
+        adaptativo (bool, optional): Por defecto OCR_ADAPTATIVO
+        
+    Returns:
+        list: Por página procesada, en orden, dict con texto, dpi,
+            confianza y número de página (desde 0)
+    """
+    
+    resultados = []
+    paginas = en_pool_ocr(partial(_ocr_pagina, origen, adaptativo=adaptativo), range(num_paginas))
+    try:
+        for resultado in paginas:
+            resultados.append(resultado)
+            if (parada_temprana and completo and len(resultados) < num_paginas
+                    and completo(_unir(resultados))):
+                break
+    finally:
+        paginas.close()
+    
+    bajas = [resultado["pagina"] for resultado in resultados if resultado["dpi"] < OCR_DPI]
+    if not completo or not bajas or completo(_unir(resultados)):
+        return resultados
+    
+    logger.debug(f"   🔁 Faltan datos: repitiendo el OCR de {len(bajas)} páginas a {OCR_DPI} DPI")
+    posiciones = {resultado["pagina"]: i for i, resultado in enumerate(resultados)}
+    paginas = en_pool_ocr(partial(_ocr_pagina, origen, adaptativo=False), bajas)
+    try:
+        for resultado in paginas:
+            resultados[posiciones[resultado["pagina"]]] = resultado
+            if parada_temprana and completo(_unir(resultados)):
+                break
+    finally:
+        paginas.close()
+    
+    return resultados
@@ -0,0 +1,239 @@
+"""
+Pool de procesos para procesar facturas en paralelo
+Cada tarea tiene un timeout duro: si un worker se cuelga (p.ej. en el OCR)
+se termina el proceso, se reporta la tarea como timeout y se arranca un
+worker nuevo, sin bloquear el resto del lote.
+"""
+
+import time
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+
+
+def _bucle_worker(conexion, funcion, inicializador, initargs, finalizador, recolector):
+    """Bucle de un proceso worker: recibe tareas, las ejecuta y devuelve el resultado."""
+    if inicializador:
+        inicializador(*initargs)
+    
+    while True:
+        try:
+            tarea = conexion.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        
+        if tarea is None:
+            break
+        
+        try:
+            resultado = ("ok", funcion(tarea))
+        except Exception as e:
+            resultado = ("error", f"{type(e).__name__}: {e}")
+        
+        if recolector:
+            resultado += (recolector(),)
+        
+        try:
+            conexion.send(resultado)
+        except (BrokenPipeError, EOFError):
+            break
+    
+    # Los procesos hijos no ejecutan atexit: dar la oportunidad de guardar estado
+    if finalizador:
+        try:
+            finalizador()
+        except Exception:
+            pass
+    
+    conexion.close()
+
+
+class _Worker:
+    """Proceso worker con su canal de comunicación y la tarea en curso."""
+    
+    def __init__(self, contexto, funcion, inicializador, initargs, finalizador, recolector):
+        self.conexion, extremo_hijo = contexto.Pipe()
+        self.proceso = contexto.Process(
+            target=_bucle_worker,
+            args=(extremo_hijo, funcion, inicializador, initargs, finalizador, recolector),
+            daemon=True
+        )
+        self.proceso.start()
+        extremo_hijo.close()
+        self.tarea = None
+        self.inicio = None
+    
+    @property
+    def ocupado(self):
+        return self.tarea is not None
+    
+    def asignar(self, tarea):
+        self.tarea = tarea
+        self.inicio = time.monotonic()
+        self.conexion.send(tarea)
+    
+    def liberar(self):
+        tarea = self.tarea
+        self.tarea = None
+        self.inicio = None
+        return tarea
+    
+    def terminar(self):
+        self.proceso.terminate()
+        self.proceso.join(5)
+        if self.proceso.is_alive():
+            self.proceso.kill()
+            self.proceso.join()
+        self.conexion.close()
+
+
+class PoolFacturas:
+    """
+    Pool de procesos persistentes con timeout duro por tarea.
+    
+    Los resultados se devuelven como tuplas (tarea, estado, valor), donde
+    estado es 'ok', 'error' o 'timeout'.
+    
+    Args:
+        funcion (callable): Función a ejecutar por tarea (debe ser importable)
+        max_workers (int): Número de procesos
+        timeout (float): Segundos máximos por tarea (None = sin límite)
+        inicializador (callable, optional): Se ejecuta una vez en cada worker
+        initargs (tuple): Argumentos del inicializador
+        finalizador (callable, optional): Se ejecuta en cada worker al cerrarse
+            el pool de forma ordenada (no si se termina por timeout)
+        recolector (callable, optional): Se ejecuta en el worker tras cada
+            tarea; lo que devuelve (p.ej. métricas) se envía con el resultado
+        al_recolectar (callable, optional): Recibe en el proceso principal lo
+            que devolvió el recolector
+    """
+    
+    def __init__(self, funcion, max_workers, timeout=None, inicializador=None, initargs=(),
+                 finalizador=None, recolector=None, al_recolectar=None):
+        self._contexto = multiprocessing.get_context()
+        self._funcion = funcion
+        self._timeout = timeout
+        self._inicializador = inicializador
+        self._initargs = initargs
+        self._finalizador = finalizador
+        self._recolector = recolector
+        self._al_recolectar = al_recolectar
+        self._pendientes = deque()
+        self._workers = [self._nuevo_worker() for _ in range(max(1, max_workers))]
+    
+    def _nuevo_worker(self):
+        return _Worker(self._contexto, self._funcion, self._inicializador, self._initargs,
+                       self._finalizador, self._recolector)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+    
+    @property
+    def en_curso(self):
+        """Número de tareas enviadas que todavía no tienen resultado."""
+        return len(self._pendientes) + sum(1 for w in self._workers if w.ocupado)
+    
+    def enviar(self, tarea):
+        """Encola una tarea; se asigna al primer worker libre."""
+        self._pendientes.append(tarea)
+        self._repartir()
+    
+    def _repartir(self):
+        for indice, worker in enumerate(self._workers):
+            if not self._pendientes:
+                break
+            if worker.ocupado:
+                continue
+            tarea = self._pendientes.popleft()
+            try:
+                worker.asignar(tarea)
+            except (BrokenPipeError, OSError):
+                # El worker murió estando libre: reemplazarlo y reintentar la tarea
+                worker.terminar()
+                self._workers[indice] = worker = self._nuevo_worker()
+                worker.asignar(tarea)
+    
+    def recoger(self, espera=None):
+        """
+        Espera resultados de las tareas en curso.
+        
+        Args:
+            espera (float, optional): Segundos máximos de espera (None = hasta que
+                termine al menos una tarea)
+                
+        Returns:
+            list: Tuplas (tarea, estado, valor) de las tareas terminadas
+        """
+        ocupados = [w for w in self._workers if w.ocupado]
+        if not ocupados:
+            return []
+        
+        limite = None
+        if self._timeout:
+            ahora = time.monotonic()
+            limite = max(0.0, min(w.inicio + self._timeout - ahora for w in ocupados))
+        if espera is not None:
+            limite = espera if limite is None else min(limite, espera)
+        
+        listos = wait([w.conexion for w in ocupados], timeout=limite)
+        terminadas = []
+        
+        for indice, worker in enumerate(self._workers):
+            if not worker.ocupado:
+                continue
+            
+            if worker.conexion in listos:
+                try:
+                    estado, valor, *recogido = worker.conexion.recv()
+                    if recogido and self._al_recolectar:
+                        self._al_recolectar(recogido[0])
+                    terminadas.append((worker.liberar(), estado, valor))
+                    continue
+                except (EOFError, OSError):
+                    # El proceso murió (crash nativo, OOM...)
+                    codigo = worker.proceso.exitcode
+                    terminadas.append((worker.liberar(), "error", f"Worker terminado (exitcode={codigo})"))
+            elif self._timeout and time.monotonic() - worker.inicio >= self._timeout:
+                terminadas.append((worker.liberar(), "timeout", self._timeout))
+            else:
+                continue
+            
+            worker.terminar()
+            self._workers[indice] = self._nuevo_worker()
+        
+        self._repartir()
+        return terminadas
+    
+    def procesar(self, tareas):
+        """
+        Procesa todas las tareas y va devolviendo los resultados según terminan.
+        
+        Yields:
+            tuple: (tarea, estado, valor)
+        """
+        for tarea in tareas:
+            self.enviar(tarea)
+        
+        while self.en_curso:
+            yield from self.recoger()
+    
+    def cerrar(self):
+        """Detiene todos los workers (las tareas en curso se abandonan)."""
+        for worker in self._workers:
+            if worker.ocupado:
+                worker.terminar()
+                continue
+            try:
+                worker.conexion.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.proceso.join(5)
+            if worker.proceso.is_alive():
+                worker.terminar()
+        self._workers = []
+        self._pendientes.clear()
@@ -0,0 +1,167 @@
+"""
+Motor de extracción de campos por regex
+Compila una sola vez (al importar) la tabla de reglas de config/patrones.py
+y la aplica sobre el texto de la factura.
+"""
+
+import re
+from datetime import date
+
+from config.patrones import REGLAS
+
+# Fecha: día, separador, mes, mismo separador, año (2 o 4 dígitos)
+_FECHA = re.compile(r'(\d{1,2})([/-])(\d{1,2})\2(\d{4}|\d{2})')
+_ESPACIOS = re.compile(r'\s+')
+_NO_PALABRA = re.compile(r'[^\w\s-]')
+
+
+class _Regla:
+    """Regla compilada de config/patrones.py."""
+    
+    __slots__ = ('nombre', 'patron', 'grupo', 'todas', 'contexto_prohibido', 'ventana',
+                 'excluir_si_contiene', 'excluir_valores', 'ancla', 'patrones', 'max_longitud',
+                 'requiere', 'ignorar_mayusculas')
+    
+    def __init__(self, regla):
+        self.ignorar_mayusculas = bool(regla.get('ignorar_mayusculas'))
+        flags = re.IGNORECASE if self.ignorar_mayusculas else 0
+        self.nombre = regla['nombre']
+        self.patron = re.compile(regla['patron'], flags) if 'patron' in regla else None
+        self.grupo = regla.get('grupo', 1)
+        todas = regla.get('todas', False)
+        self.todas = None if todas is True else (todas or 1)
+        self.contexto_prohibido = [p.lower() for p in regla.get('contexto_prohibido', [])]
+        self.ventana = regla.get('ventana', 0)
+        self.excluir_si_contiene = [p.lower() for p in regla.get('excluir_si_contiene', [])]
+        self.excluir_valores = set(regla.get('excluir_valores', []))
+        self.ancla = re.compile(regla['ancla'], flags) if 'ancla' in regla else None
+        self.patrones = [re.compile(p) for p in regla.get('patrones', [])]
+        self.max_longitud = regla.get('max_longitud')
+        requiere = regla.get('requiere', [])
+        self.requiere = [r.lower() for r in requiere] if self.ignorar_mayusculas else requiere
+    
+    def aplicable(self, texto, texto_min):
+        """Filtro rápido: False si no aparece ninguno de los literales requeridos."""
+        if not self.requiere:
+            return True
+        donde = texto_min if self.ignorar_mayusculas else texto
+        return any(literal in donde for literal in self.requiere)
+    
+    def candidatos(self, texto):
+        """Genera los valores en bruto que propone la regla, en orden."""
+        if self.ancla:
+            match = self.ancla.search(texto)
+            if not match:
+                return
+            contexto = texto[max(0, match.start() - self.ventana):match.end() + self.ventana]
+            for patron in self.patrones:
+                match = patron.search(contexto)
+                if match:
+                    yield match.group(1)
+                    return
+            return
+        
+        for indice, match in enumerate(self.patron.finditer(texto)):
+            if self.todas is not None and indice >= self.todas:
+                return
+            
+            if self.contexto_prohibido:
+                contexto = texto[max(0, match.start() - self.ventana):match.end() + self.ventana].lower()
+                if not any(palabra in contexto for palabra in self.contexto_prohibido):
+                    yield match.group(self.grupo)
+            else:
+                yield match.group(self.grupo)
+
+
+def _compilar(reglas):
+    return {campo: [_Regla(regla) for regla in lista] for campo, lista in reglas.items()}
+
+
+REGLAS_COMPILADAS = _compilar(REGLAS)
+
+
+def normalizar_fecha(fecha_str):
+    """
+    Convierte dd/mm/aaaa, dd-mm-aaaa, dd/mm/aa o dd-mm-aa a AAAAMMDD.
+    Los años de 2 dígitos siguen la regla de strptime (69-99 → 19xx).
+    
+    Args:
+        fecha_str (str): Fecha en texto
+        
+    Returns:
+        str: Fecha en formato AAAAMMDD o None si no es válida
+    """
+    match = _FECHA.fullmatch(fecha_str)
+    if not match:
+        return None
+    
+    dia, _, mes, anio = match.groups()
+    anio_num = int(anio)
+    if len(anio) == 2:
+        anio_num += 1900 if anio_num >= 69 else 2000
+    
+    try:
+        fecha = date(anio_num, int(mes), int(dia))
+    except ValueError:
+        return None
+    return f"{fecha.year:04d}{fecha.month:02d}{fecha.day:02d}"
+
+
+def limpiar_cif(valor):
+    return valor.replace('-', '').replace('.', '').replace(' ', '')
+
+
+def limpiar_proveedor(valor):
+    proveedor = _ESPACIOS.sub('_', valor.strip())
+    return _NO_PALABRA.sub('', proveedor)
+
+
+def limpiar_numero(valor):
+    # Limpiar espacios extra dentro del número
+    return _ESPACIOS.sub('', valor.strip())
+
+
+_LIMPIEZA = {
+    'cif': limpiar_cif,
+    'fecha': normalizar_fecha,
+    'proveedor': limpiar_proveedor,
+    'numero': limpiar_numero,
+}
+
+
+def extraer_campo(campo, texto, texto_min=None):
+    """
+    Aplica las reglas de un campo y devuelve el primer valor válido.
+    
+    Args:
+        campo (str): 'cif', 'fecha', 'proveedor' o 'numero'
+        texto (str): Texto de la factura
+        texto_min (str, optional): texto.lower() ya calculado (para no
+            repetirlo en cada campo)
+        
+    Returns:
+        tuple: (valor, crudo, nombre de la regla) o (None, None, None)
+    """
+    limpiar = _LIMPIEZA[campo]
+    if texto_min is None:
+        texto_min = texto.lower()
+    
+    for regla in REGLAS_COMPILADAS[campo]:
+        if not regla.aplicable(texto, texto_min):
+            continue
+        
+        for crudo in regla.candidatos(texto):
+            if regla.excluir_si_contiene:
+                crudo_min = crudo.strip().lower()
+                if any(excluido in crudo_min for excluido in regla.excluir_si_contiene):
+                    continue
+            
+            valor = limpiar(crudo)
+            if not valor or valor.upper() in regla.excluir_valores:
+                continue
+            
+            if regla.max_longitud:
+                valor = valor[:regla.max_longitud]
+            return valor, crudo, regla.nombre
+    
+    return None, None, None
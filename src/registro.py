@@ -0,0 +1,207 @@
+"""
+Registro persistente de facturas procesadas (SQLite)
+Guarda cada factura procesada con su ruta, tamaño, mtime y hash, para que
+cada ejecución solo toque las facturas nuevas o modificadas aunque la
+carpeta de entrada tenga decenas de miles de archivos.
+
+El escaneo compara el os.scandir de la carpeta con el registro cargado de
+una sola consulta: una factura con la misma ruta, tamaño y mtime se salta
+sin abrirla. Si solo cambió el mtime (copiada otra vez, tocada...) se
+compara el hash antes de volver a procesarla.
+
+Cada factura se anota cuando ya se ha movido a OUTPUT_FOLDER (o se ha
+simulado el movimiento): si el proceso se corta antes, se vuelve a procesar.
+Las facturas procesadas en DRY RUN se registran aparte y no se saltan en
+una ejecución real.
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+
+from loguru import logger
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS procesadas (
+    ruta TEXT NOT NULL,
+    simulado INTEGER NOT NULL,
+    carpeta TEXT NOT NULL,
+    tamano INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT,
+    nombre_nuevo TEXT,
+    etapa TEXT,
+    fecha TEXT NOT NULL,
+    PRIMARY KEY (ruta, simulado)
+);
+CREATE INDEX IF NOT EXISTS idx_procesadas_carpeta ON procesadas (carpeta);
+"""
+
+
+def firma(stat):
+    """Tamaño y mtime (ns) de un os.stat_result."""
+    return stat.st_size, stat.st_mtime_ns
+
+
+class RegistroProcesadas:
+    """
+    Registro de facturas procesadas en una base de datos SQLite.
+    
+    Args:
+        ruta_db (Path): Archivo de la base de datos (en un disco local:
+            SQLite no es fiable sobre SMB)
+        simulado (bool): True en DRY RUN
+    """
+    
+    def __init__(self, ruta_db, simulado=False):
+        self.ruta_db = Path(ruta_db)
+        self.simulado = int(bool(simulado))
+        self.ruta_db.parent.mkdir(parents=True, exist_ok=True)
+        self._conexion = sqlite3.connect(self.ruta_db, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute("PRAGMA synchronous=NORMAL")
+            self._conexion.executescript(_ESQUEMA)
+    
+    def procesadas_en(self, carpeta):
+        """
+        Facturas de una carpeta que ya no hace falta procesar en este modo
+        (en DRY RUN también cuentan las procesadas de verdad).
+        
+        Args:
+            carpeta (Path): Carpeta de entrada
+            
+        Returns:
+            dict: ruta (str) → (tamaño, mtime_ns, hash)
+        """
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT ruta, tamano, mtime_ns, hash FROM procesadas"
+                " WHERE carpeta = ? AND simulado <= ? ORDER BY simulado DESC",
+                (str(carpeta), self.simulado)
+            ).fetchall()
+        # Si hay fila real y simulada, gana la real (va la última)
+        return {ruta: (tamano, mtime_ns, hash_) for ruta, tamano, mtime_ns, hash_ in filas}
+    
+    def registrar(self, ruta, firma_archivo, hash_contenido=None, nombre_nuevo=None, etapa=None):
+        """
+        Registra una factura procesada correctamente.
+        
+        Args:
+            ruta (Path): Ruta de la factura en la carpeta de entrada
+            firma_archivo (tuple): (tamaño, mtime_ns) de la factura procesada
+            hash_contenido (str, optional): SHA-256 del contenido
+            nombre_nuevo (str, optional): Nombre asignado
+            etapa (str, optional): Etapa del pipeline que la resolvió
+        """
+        ruta = Path(ruta)
+        tamano, mtime_ns = firma_archivo
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO procesadas"
+                " (ruta, simulado, carpeta, tamano, mtime_ns, hash, nombre_nuevo, etapa, fecha)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(ruta), self.simulado, str(ruta.parent), tamano, mtime_ns, hash_contenido,
+                 nombre_nuevo, etapa, datetime.now().isoformat(timespec="seconds"))
+            )
+    
+    def actualizar_firma(self, ruta, firma_archivo):
+        """Actualiza tamaño y mtime de una factura cuyo contenido no ha cambiado."""
+        tamano, mtime_ns = firma_archivo
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "UPDATE procesadas SET tamano = ?, mtime_ns = ? WHERE ruta = ? AND simulado <= ?",
+                (tamano, mtime_ns, str(ruta), self.simulado)
+            )
+    
+    def olvidar(self, rutas):
+        """Quita facturas del registro (p.ej. al deshacer un lote de movimientos)."""
+        with self._lock, self._conexion:
+            self._conexion.executemany(
+                "DELETE FROM procesadas WHERE ruta = ?", ((str(ruta),) for ruta in rutas)
+            )
+    
+    def es_procesada(self, ruta, firma_archivo, registrada):
+        """
+        Decide si una factura ya registrada puede saltarse.
+        
+        Args:
+            ruta (Path): Ruta de la factura
+            firma_archivo (tuple): (tamaño, mtime_ns) actuales
+            registrada (tuple): (tamaño, mtime_ns, hash) del registro
+            
+        Returns:
+            bool: True si el contenido es el mismo que se procesó
+        """
+        if firma_archivo == registrada[:2]:
+            return True
+        
+        # Mismo tamaño y otro mtime: comprobar el contenido antes de reprocesar
+        if firma_archivo[0] != registrada[0] or not registrada[2]:
+            return False
+        
+        from src.cache import hash_archivo
+        try:
+            if hash_archivo(ruta) != registrada[2]:
+                return False
+        except OSError:
+            return False
+        
+        self.actualizar_firma(ruta, firma_archivo)
+        return True
+    
+    def cerrar(self):
+        """Cierra la conexión, pasando antes el WAL a la base de datos."""
+        with self._lock:
+            try:
+                self._conexion.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass  # Otra conexión ocupada: el WAL se pasa al cerrar la última
+            self._conexion.close()
+
+
+_registro = None
+_pid_registro = None
+_heredado = None
+
+
+def obtener_registro():
+    """
+    Devuelve el registro configurado en settings (uno por proceso: las
+    conexiones SQLite no se comparten entre procesos).
+    
+    Returns:
+        RegistroProcesadas: Registro o None si está desactivado o no se puede abrir
+    """
+    global _registro, _pid_registro, _heredado
+    
+    from config.settings import REGISTRO_ACTIVO, REGISTRO_DB, DRY_RUN
+    
+    if not REGISTRO_ACTIVO:
+        return None
+    
+    if _pid_registro != os.getpid():
+        # La conexión heredada por fork no se usa ni se cierra en el hijo
+        # (cerrarla podría tocar el WAL del proceso padre): solo se conserva
+        if _registro is not None:
+            _heredado = _registro
+        try:
+            _registro = RegistroProcesadas(REGISTRO_DB, simulado=DRY_RUN)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"⚠️ Registro de procesadas no disponible ({REGISTRO_DB}): {e}")
+            _registro = None
+        _pid_registro = os.getpid()
+    return _registro
+
+
+def cerrar_registro():
+    """Cierra la conexión del registro de este proceso (si hay)."""
+    global _registro, _pid_registro
+    
+    if _registro is not None and _pid_registro == os.getpid():
+        _registro.cerrar()
+        _registro = None
+        _pid_registro = None
@@ -0,0 +1,139 @@
+"""
+Extracción del texto nativo (capa de texto) de los PDF
+Dos motores seleccionables con TEXTO_MOTOR en config/settings.py:
+
+- pymupdf: get_text de MuPDF (C), del orden de 15 veces más rápido que
+  pdfplumber. Las palabras se agrupan en líneas como lo hace pdfplumber
+  (por el borde superior, con la misma tolerancia) para que las regex del
+  parser vean el mismo orden de lectura.
+- pdfplumber: análisis de maquetación en Python puro, más lento; se conserva
+  para facturas con maquetaciones difíciles.
+
+El texto se extrae página a página y puede detenerse en cuanto el texto
+acumulado tiene lo necesario (fecha, proveedor y número suelen estar en la
+primera página) o al llegar a TEXTO_MAX_PAGINAS: el tiempo por factura deja
+de crecer con el número de páginas.
+"""
+
+from loguru import logger
+
+from config.settings import TEXTO_MOTOR, TEXTO_MAX_PAGINAS
+from src.documento import DocumentoFactura, abrir_pdf
+
+# Palabras cuyo borde superior difiere menos de esto (puntos) van en la
+# misma línea (y_tolerance por defecto de pdfplumber)
+TOLERANCIA_LINEA = 3
+
+
+def _texto_pagina_pymupdf(pagina):
+    """
+    Texto de una página de PyMuPDF, línea a línea de arriba abajo.
+    
+    Args:
+        pagina (fitz.Page): Página del documento
+        
+    Returns:
+        str: Texto de la página (vacío si no tiene capa de texto)
+    """
+    import fitz
+    
+    # Sin los espacios que MuPDF inserta entre fragmentos separados
+    # (partían palabras como "facturaci ón" en algunas facturas)
+    palabras = pagina.get_text("words", flags=fitz.TEXTFLAGS_WORDS | fitz.TEXT_INHIBIT_SPACES)
+    palabras.sort(key=lambda p: (p[1], p[0]))
+    
+    lineas = []
+    for palabra in palabras:
+        if lineas and palabra[1] - lineas[-1][0] <= TOLERANCIA_LINEA:
+            lineas[-1][1].append(palabra)
+        else:
+            lineas.append((palabra[1], [palabra]))
+    
+    return "\n".join(
+        " ".join(p[4] for p in sorted(linea, key=lambda p: p[0]))
+        for _, linea in lineas
+    )
+
+
+def paginas_pymupdf(origen):
+    """
+    Texto nativo página a página con PyMuPDF (las páginas se leen al pedirlas).
+    
+    Args:
+        origen (Path | DocumentoFactura): PDF (ruta o contenido ya leído)
+        
+    Yields:
+        str: Texto de cada página (vacío si no tiene capa de texto)
+    """
+    
+    with abrir_pdf(origen) as doc:
+        for pagina in doc:
+            yield _texto_pagina_pymupdf(pagina)
+
+
+def paginas_pdfplumber(origen):
+    """
+    Texto nativo página a página con pdfplumber (las páginas se leen al pedirlas).
+    
+    Args:
+        origen (Path | DocumentoFactura): PDF (ruta o contenido ya leído)
+        
+    Yields:
+        str: Texto de cada página (vacío si no tiene capa de texto)
+    """
+    import pdfplumber
+    
+    with pdfplumber.open(origen.flujo() if isinstance(origen, DocumentoFactura) else origen) as pdf:
+        for pagina in pdf.pages:
+            yield pagina.extract_text() or ""
+            pagina.close()  # Libera los objetos de la página ya procesada
+
+
+MOTORES = {
+    "pymupdf": paginas_pymupdf,
+    "pdfplumber": paginas_pdfplumber,
+}
+
+
+def extraer_texto_nativo(origen, motor=None, completo=None, max_paginas=None):
+    """
+    Extrae el texto nativo de un PDF con el motor configurado, página a
+    página, deteniéndose cuando ya no hacen falta más páginas.
+    
+    Args:
+        origen (Path | DocumentoFactura): PDF (ruta o contenido ya leído)
+        motor (str, optional): "pymupdf" o "pdfplumber" (por defecto TEXTO_MOTOR)
+        completo (callable, optional): Función texto acumulado → bool; se deja
+            de leer en cuanto devuelve True
+        max_paginas (int, optional): Páginas como máximo (por defecto
+            TEXTO_MAX_PAGINAS; 0 = todas)
+        
+    Returns:
+        str: Texto extraído (vacío si el PDF no tiene capa de texto)
+    """
+    
+    motor = motor or TEXTO_MOTOR
+    if motor not in MOTORES:
+        logger.warning(f"⚠️ Motor de texto desconocido '{motor}', usando pymupdf")
+        motor = "pymupdf"
+    
+    if max_paginas is None:
+        max_paginas = TEXTO_MAX_PAGINAS
+    
+    texto_nativo = ""
+    paginas = MOTORES[motor](origen)
+    try:
+        for num, texto_pagina in enumerate(paginas, 1):
+            if texto_pagina:
+                texto_nativo += texto_pagina + "\n"
+            
+            if max_paginas and num >= max_paginas:
+                logger.debug(f"   ⏭️ Leídas {num} páginas (TEXTO_MAX_PAGINAS)")
+                break
+            if completo and texto_nativo.strip() and completo(texto_nativo):
+                logger.debug(f"   ⏭️ Datos completos tras {num} páginas - extracción detenida")
+                break
+    finally:
+        paginas.close()  # Cierra el documento aunque queden páginas
+    
+    return texto_nativo
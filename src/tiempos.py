@@ -0,0 +1,65 @@
+"""
+Tiempos por etapa del pipeline de extracción
+medir() es el único punto de instrumentación de las etapas: cada bloque
+medido se añade al histograma de su etapa en src/metricas.py (si las
+métricas están activas) y, entre iniciar_medicion() y terminar_medicion(),
+a los tiempos de la factura en curso (texto nativo, OCR, parseo y Azure,
+las columnas de generar_reporte.py). Sin métricas ni medición en curso,
+medir() no hace nada.
+"""
+
+import time
+from contextlib import contextmanager
+
+from src.metricas import obtener_metricas
+
+ETAPAS = ("extraccion", "ocr", "parseo", "azure")
+
+_medicion = None
+
+
+def iniciar_medicion():
+    """Empieza a medir una factura (descarta lo que hubiera de la anterior)."""
+    global _medicion
+    _medicion = {"tiempos": dict.fromkeys(ETAPAS, 0.0), "cache": False}
+
+
+def terminar_medicion():
+    """
+    Termina la medición en curso.
+    
+    Returns:
+        dict: {"tiempos": segundos por etapa, "cache": True si el resultado
+            salió de la caché} o None si no se estaba midiendo
+    """
+    global _medicion
+    medicion, _medicion = _medicion, None
+    return medicion
+
+
+@contextmanager
+def medir(etapa):
+    """Mide el bloque como 'etapa' (histograma de métricas y medición en curso)."""
+    metricas = obtener_metricas()
+    if _medicion is None and metricas is None:
+        yield
+        return
+    
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        if metricas is not None:
+            metricas.observar("etapa_segundos", segundos, etapa=etapa)
+        if _medicion is not None and etapa in _medicion["tiempos"]:
+            _medicion["tiempos"][etapa] += segundos
+
+
+def anotar_cache():
+    """Anota que el resultado de la factura salió de la caché."""
+    metricas = obtener_metricas()
+    if metricas is not None:
+        metricas.incrementar("cache_aciertos_total")
+    if _medicion is not None:
+        _medicion["cache"] = True
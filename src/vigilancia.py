@@ -0,0 +1,174 @@
+"""
+Vigilancia de la carpeta de entrada (modo servicio)
+Detecta las facturas nuevas de INPUT_FOLDER y las entrega solo cuando han
+terminado de copiarse: su tamaño y fecha de modificación no han cambiado
+durante VIGILAR_ESTABILIDAD segundos.
+
+La fuente de verdad es un escaneo periódico de la carpeta (funciona igual
+en un disco local que en el NAS). Si watchdog está instalado, sus eventos
+(inotify, ReadDirectoryChangesW...) solo adelantan el siguiente escaneo:
+sobre SMB/NFS los eventos no siempre llegan.
+"""
+
+import os
+import time
+import threading
+from pathlib import Path
+
+from loguru import logger
+
+
+class VigilanteCarpeta:
+    """
+    Lleva el estado de los archivos de una carpeta entre escaneos.
+    
+    Cada archivo pasa por: visto (esperando a que deje de cambiar) →
+    entregado (en cola o procesándose) → procesado. Si un archivo procesado
+    cambia (otro tamaño o mtime) se vuelve a entregar.
+    
+    Args:
+        carpeta (Path): Carpeta a vigilar
+        extensiones (list): Extensiones admitidas (en minúsculas, con punto)
+        estabilidad (float): Segundos sin cambios antes de entregar un archivo
+        registro (RegistroProcesadas, optional): Registro de procesadas; los
+            archivos que ya están en él no se entregan (p.ej. tras reiniciar)
+    """
+    
+    def __init__(self, carpeta, extensiones, estabilidad, registro=None):
+        self.carpeta = Path(carpeta)
+        self._extensiones = {ext.lower() for ext in extensiones}
+        self._estabilidad = estabilidad
+        self._registro = registro
+        self._registradas = registro.procesadas_en(self.carpeta) if registro else {}
+        self._vistos = {}  # ruta → (firma, desde)
+        self._entregados = {}  # ruta → firma
+        self._procesados = {}  # ruta → firma
+    
+    def escanear(self, limite=None):
+        """
+        Recorre la carpeta y devuelve los archivos nuevos que ya son estables.
+        
+        Args:
+            limite (int, optional): Archivos como máximo; el resto se entrega
+                en escaneos posteriores
+                
+        Returns:
+            list: Rutas Path, de la más antigua a la más reciente
+        """
+        ahora = time.monotonic()
+        presentes = set()
+        listos = []
+        
+        with os.scandir(self.carpeta) as entradas:
+            for entrada in entradas:
+                if os.path.splitext(entrada.name)[1].lower() not in self._extensiones:
+                    continue
+                try:
+                    if not entrada.is_file():
+                        continue
+                    stat = entrada.stat()
+                except OSError:
+                    continue  # Borrado o movido durante el escaneo
+                
+                ruta = Path(entrada.path)
+                firma = (stat.st_size, stat.st_mtime_ns)
+                presentes.add(ruta)
+                
+                if ruta in self._entregados or self._procesados.get(ruta) == firma:
+                    continue
+                
+                # Primera vez que se ve: consultar el registro de una ejecución anterior
+                registrada = self._registradas.pop(entrada.path, None)
+                if registrada and self._registro.es_procesada(ruta, firma, registrada):
+                    self._procesados[ruta] = firma
+                    continue
+                
+                visto = self._vistos.get(ruta)
+                if visto is None or visto[0] != firma:
+                    self._vistos[ruta] = (firma, ahora)  # Nuevo o todavía copiándose
+                elif ahora - visto[1] >= self._estabilidad:
+                    listos.append((stat.st_mtime_ns, ruta))
+        
+        # Olvidar los archivos que ya no están (renombrados, movidos a errores...)
+        for estado in (self._vistos, self._procesados):
+            for ruta in [r for r in estado if r not in presentes]:
+                del estado[ruta]
+        
+        listos.sort()
+        entregados = [ruta for _, ruta in listos[:limite]]
+        for ruta in entregados:
+            self._entregados[ruta] = self._vistos.pop(ruta)[0]
+        return entregados
+    
+    def marcar_procesado(self, ruta):
+        """No volver a entregar el archivo mientras no cambie."""
+        firma = self._entregados.pop(ruta, None)
+        if firma is not None:
+            self._procesados[ruta] = firma
+    
+    def segundos_hasta_estable(self):
+        """
+        Segundos hasta que el primer archivo en espera cumpla el tiempo de
+        estabilidad (None si no hay ninguno).
+        """
+        if not self._vistos:
+            return None
+        ahora = time.monotonic()
+        return max(0.0, min(desde + self._estabilidad - ahora for _, desde in self._vistos.values()))
+
+
+def iniciar_eventos(carpeta, despertar):
+    """
+    Activa 'despertar' cuando cambia algo en la carpeta, si watchdog está
+    instalado.
+    
+    Args:
+        carpeta (Path): Carpeta a vigilar
+        despertar (threading.Event): Evento que adelanta el siguiente escaneo
+        
+    Returns:
+        Observer: Observador de watchdog en marcha (hay que pararlo) o None
+    """
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        logger.info("   ℹ️ watchdog no instalado - solo escaneo periódico")
+        return None
+    
+    class _Manejador(FileSystemEventHandler):
+        def on_any_event(self, evento):
+            despertar.set()
+    
+    try:
+        observador = Observer()
+        observador.schedule(_Manejador(), str(carpeta), recursive=False)
+        observador.daemon = True
+        observador.start()
+    except Exception as e:
+        logger.warning(f"   ⚠️ Eventos de carpeta no disponibles ({e}) - solo escaneo periódico")
+        return None
+    
+    logger.info(f"   👀 Eventos de carpeta activos ({type(observador).__name__})")
+    return observador
+
+
+def senal_de_parada():
+    """
+    Evento que se activa con SIGTERM/SIGINT (parada ordenada del servicio).
+    
+    Returns:
+        threading.Event: Evento de parada
+    """
+    import signal
+    
+    detener = threading.Event()
+    
+    def _parar(signum, frame):
+        logger.warning(f"\n🛑 Señal {signal.Signals(signum).name} recibida - deteniendo el servicio...")
+        detener.set()
+    
+    for nombre in ("SIGTERM", "SIGINT", "SIGBREAK"):
+        if hasattr(signal, nombre):
+            signal.signal(getattr(signal, nombre), _parar)
+    return detener